@@ -0,0 +1,118 @@
+"""
+Сравнение кодеков кэша (``ruzbot.codec``) на недельных расписаниях: размер
+payload и время encode/decode относительно текущего JSON-текста.
+
+Запуск::
+
+    python benchmarks/codec_bench.py
+    python benchmarks/codec_bench.py week1.json week2.json
+
+Файлы — JSON-список занятий недели, например выгрузка
+``redis-cli --raw GET ruzbot:group:<id>:schedule:week:<date>`` из старой версии
+бота. Без аргументов используется синтетическая неделя с типичными полями.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from ruzbot import codec  # noqa: E402
+
+_DISCIPLINES = [
+    "Математический анализ",
+    "Физика",
+    "Программирование на языке Python",
+    "Базы данных",
+    "Теория вероятностей и математическая статистика",
+    "Иностранный язык",
+    "Безопасность жизнедеятельности",
+]
+_LECTURERS = [
+    "доцент Иванов И.И.",
+    "профессор Петрова А.С.",
+    "ст. преподаватель Сидоров П.П.",
+    "ассистент Кузнецова Е.В.",
+]
+_KINDS = ["Лекция", "Практические занятия", "Лабораторные работы"]
+_SLOTS = [("08:30", "10:00"), ("10:10", "11:40"), ("12:40", "14:10"), ("14:20", "15:50")]
+
+
+def synthetic_week(lessons_per_day: int = 4, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    monday = date(2026, 3, 23)
+    lessons = []
+    for day in range(6):
+        for slot in range(lessons_per_day):
+            begin, end = _SLOTS[slot % len(_SLOTS)]
+            lessons.append(
+                {
+                    "lesson_id": rng.randint(100000, 999999),
+                    "date": (monday + timedelta(days=day)).isoformat(),
+                    "begin_lesson": f"{begin}:00",
+                    "end_lesson": f"{end}:00",
+                    "kind_of_work": rng.choice(_KINDS),
+                    "discipline_id": rng.randint(1, 500),
+                    "discipline_name": rng.choice(_DISCIPLINES),
+                    "lecturer_id": rng.randint(1, 300),
+                    "lecturer_short_name": rng.choice(_LECTURERS),
+                    "auditorium_name": f"{rng.randint(1, 4)}-{rng.randint(100, 450)}",
+                    "building": "Главный корпус",
+                    "sub_group": rng.choice([0, 0, 1, 2]),
+                }
+            )
+    return lessons
+
+
+def _variants() -> list[tuple[str, object, object]]:
+    variants = [
+        (
+            "json text (сейчас)",
+            lambda value: codec.json_dumps(value).encode("utf-8"),
+            codec.json_loads,
+        )
+    ]
+    for name, payload_codec in codec.CODECS.items():
+        for compress in (False, True):
+            min_bytes = 0 if compress else -1
+            label = f"{name}{' + zlib' if compress else ''}"
+
+            def encode(value, payload_codec=payload_codec, min_bytes=min_bytes):
+                return codec.encode(value, payload_codec, min_bytes)
+
+            variants.append((label, encode, codec.decode))
+    return variants
+
+
+def bench(payload: list[dict], number: int = 2000) -> None:
+    baseline = None
+    print(f"{'codec':<22}{'bytes':>8}{'ratio':>8}{'encode, µs':>13}{'decode, µs':>13}")
+    for label, encode, decode in _variants():
+        raw = encode(payload)
+        assert decode(raw) == payload, label
+        encode_us = timeit.timeit(lambda: encode(payload), number=number) / number * 1e6
+        decode_us = timeit.timeit(lambda: decode(raw), number=number) / number * 1e6
+        baseline = baseline or len(raw)
+        print(
+            f"{label:<22}{len(raw):>8}{len(raw) / baseline:>8.2f}"
+            f"{encode_us:>13.1f}{decode_us:>13.1f}"
+        )
+
+
+def main(paths: list[str]) -> None:
+    if not paths:
+        print("Синтетическая неделя (24 занятия):")
+        bench(synthetic_week())
+    for path in paths:
+        print(f"{path}:")
+        bench(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -9,7 +9,7 @@ from telebot.formatting import mlink
 from telebot.util import quick_markup
 
 from ruzbot import cache
-from ruzbot import markups
+from ruzbot import markups, resilience
 from ruzbot.utils import ruz_client
 
 from ruzclient.errors import RuzHttpError
@@ -20,6 +20,8 @@ __version__ = "28.03.26"
 # https://core.telegram.org/bots/api#sendmessage (тот же лимит у editMessageText)
 TELEGRAM_MAX_MESSAGE_CHARS = 4096
 _MESSAGE_TOO_LONG_MARKER = "\n\nMESSAGE TOO LONG"
+# Без символов, которые надо экранировать в MarkdownV2.
+_STALE_MARKER = "\n\n⚠️ Сервер расписания недоступен, данные могут быть устаревшими"
 
 
 def _truncate_with_too_long_marker(text: str) -> str:
@@ -39,6 +41,13 @@ def _is_message_too_long_error(exc: ApiTelegramException) -> bool:
     return "MESSAGE_TOO_LONG" in desc or "message is too long" in desc.lower()
 
 
+def _append_stale_marker(text: str) -> str:
+    """Ответ построен из последних известных данных, пока backend недоступен."""
+    if not resilience.served_stale():
+        return text
+    return text + _STALE_MARKER
+
+
 def _append_donation_footer(text: str, parse_mode: Optional[str]) -> str:
     """
     Для MarkdownV2 нельзя дописывать URL и скобки в «:)» без экранирования —
@@ -64,7 +73,7 @@ class RuzBot(AsyncTeleBot):
         **kwargs,
     ) -> types.Message:
         parse_mode = kwargs.get("parse_mode", self.parse_mode)
-        text = _append_donation_footer(text, parse_mode)
+        text = _append_donation_footer(_append_stale_marker(text), parse_mode)
         try:
             return await super().send_message(chat_id, text, **kwargs)
         except ApiTelegramException as e:
@@ -78,7 +87,7 @@ class RuzBot(AsyncTeleBot):
         self, text: str, **kwargs
     ) -> Union[types.Message, bool]:
         parse_mode = kwargs.get("parse_mode", self.parse_mode)
-        text = _append_donation_footer(text, parse_mode)
+        text = _append_donation_footer(_append_stale_marker(text), parse_mode)
         try:
             return await super().edit_message_text(text, **kwargs)
         except ApiTelegramException as e:
@@ -93,6 +102,7 @@ bot = RuzBot(__version__)
 
 
 @bot.message_handler(commands=["start"])
+@resilience.handler_scope
 async def startCommand(message):
     """
     /start: главное меню или подсказки по регистрации (группа / незавершённая регистрация).
@@ -104,7 +114,9 @@ async def startCommand(message):
 
         async def loader():
             try:
-                return await client.users.get_by_id(message.from_user.id)
+                return await resilience.call(
+                    "profile", lambda: client.users.get_by_id(message.from_user.id)
+                )
             except RuzHttpError as e:
                 if e.status_code == 404:
                     return None
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
-from dataclasses import asdict, dataclass
+import math
+import random
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
 from datetime import date, datetime, timedelta
 from typing import Any, Awaitable, Callable, Optional
 
 from telebot import types
 
+from ruzbot import metrics, resilience
+from ruzbot.circuit import CircuitBreaker
+from ruzbot.codec import PayloadCodec, codec_named, encode
+from ruzbot.codec import decode as _decode_payload
+from ruzbot.codec import json_dumps as _json_dumps
 from ruzbot.settings import settings
 
 try:
@@ -20,6 +32,54 @@ logger = logging.getLogger(__name__)
 
 _redis_client = None
 _redis_lock = asyncio.Lock()
+_redis_breaker = CircuitBreaker(
+    "redis",
+    settings.redis_breaker_failures,
+    settings.redis_breaker_cooldown_s,
+)
+_redis_probe_task: Optional[asyncio.Task] = None
+
+# Семейства ключей: по ним выбирается L1 и размечаются метрики.
+FAMILY_PROFILE = "profile"
+FAMILY_GROUP_META = "group"
+FAMILY_GROUP_WEEK = "group_week"
+FAMILY_SUBGROUP_WEEK = "subgroup_week"
+FAMILY_LECTURER = "lecturer"
+FAMILY_DISCIPLINE = "discipline"
+FAMILY_LECTURER_WEEK = "lecturer_week"
+FAMILY_DISCIPLINE_WEEK = "discipline_week"
+FAMILY_DIRECTORY = "directory"
+FAMILY_SCREEN = "screen"
+FAMILY_RENDER = "render"
+FAMILY_GENERATION = "generation"
+FAMILY_OTHER = "other"
+
+# Отрицательная запись: backend ответил «не найдено». Отличается от промаха
+# (ключа нет) и отдаётся из ``get_or_load_*`` как ``None`` без запроса в backend.
+_NEGATIVE_ENTRY = {"__ruzbot_missing__": 1}
+# Данные из backend, последняя копия которых хранится ``REDIS_TTL_STALE_S`` и
+# отдаётся, пока backend недоступен. Производные (неделя подгруппы, рендеры,
+# экраны) строятся заново из этих.
+_STALE_FAMILIES = frozenset(
+    {
+        FAMILY_PROFILE,
+        FAMILY_GROUP_META,
+        FAMILY_GROUP_WEEK,
+        FAMILY_LECTURER,
+        FAMILY_DISCIPLINE,
+        FAMILY_LECTURER_WEEK,
+        FAMILY_DISCIPLINE_WEEK,
+    }
+)
+
+# Загрузки, которые сейчас идут в backend, по ключу Redis (single-flight).
+_inflight: dict[str, asyncio.Task] = {}
+
+# Ключи, отданные из устаревшего слоя внутри текущей загрузки: значение,
+# построенное из них, не записывается как свежее (см. :func:`_single_flight`).
+_stale_sources: ContextVar[Optional[set[str]]] = ContextVar(
+    "ruzbot_cache_stale_sources", default=None
+)
 
 
 @dataclass(slots=True)
@@ -29,6 +89,8 @@ class ScreenSnapshot:
     reply_markup: Optional[list[list[dict[str, Any]]]]
     source: Optional[str] = None
     created_at: str = ""
+    # Из каких данных построен экран, см. :func:`group_week_deps`, :func:`profile_deps`.
+    deps: list[list[Any]] = field(default_factory=list)
 
 
 def _key_prefix() -> str:
@@ -39,28 +101,93 @@ def user_prefix(user_id: int) -> str:
     return f"{_key_prefix()}:user:{user_id}"
 
 
+def user_index_key(user_id: int) -> str:
+    """ZSET всех ключей пользователя (score — время истечения), см. :func:`invalidate_user`."""
+    return f"{user_prefix(user_id)}:keys"
+
+
 def profile_key(user_id: int) -> str:
     return f"{user_prefix(user_id)}:profile"
 
 
-def week_key(user_id: int, week_date: date | datetime) -> str:
+def group_prefix(group_id: int) -> str:
+    return f"{_key_prefix()}:group:{group_id}"
+
+
+def group_generation_key(group_id: int) -> str:
+    return f"{group_prefix(group_id)}:gen"
+
+
+def group_week_key(
+    group_id: int, week_date: date | datetime, generation: int = 0
+) -> str:
     anchor = week_anchor_date(week_date)
-    return f"{user_prefix(user_id)}:schedule:week:{anchor.isoformat()}"
+    return (
+        f"{group_prefix(group_id)}:g{generation}:schedule:week:{anchor.isoformat()}"
+    )
 
 
-def day_key(user_id: int, day_date: date | datetime) -> str:
-    if isinstance(day_date, datetime):
-        day_date = day_date.date()
-    return f"{user_prefix(user_id)}:schedule:day:{day_date.isoformat()}"
+def subgroup_week_key(
+    group_id: int, subgroup: int, week_date: date | datetime, generation: int = 0
+) -> str:
+    """Неделя группы, отфильтрованная по подгруппе и разложенная по дням."""
+    anchor = week_anchor_date(week_date)
+    return (
+        f"{group_prefix(group_id)}:g{generation}:sub:{subgroup}:week:"
+        f"{anchor.isoformat()}"
+    )
 
 
-def group_prefix(group_id: int) -> str:
-    return f"{_key_prefix()}:group:{group_id}"
+def render_key(
+    group_id: int,
+    subgroup: int,
+    view: str,
+    view_date: date | datetime,
+    variant: str = "default",
+    generation: int = 0,
+) -> str:
+    """Готовый текст экрана ``view`` (``week``/``day``), общий для всей подгруппы."""
+    if isinstance(view_date, datetime):
+        view_date = view_date.date()
+    if view == "week":
+        view_date = week_anchor_date(view_date)
+    return (
+        f"{group_prefix(group_id)}:g{generation}:render:{variant}:{subgroup}:"
+        f"{view}:{view_date.isoformat()}"
+    )
+
+
+def group_meta_key(group_id: int) -> str:
+    return f"{group_prefix(group_id)}:meta"
+
+
+def lecturer_key(lecturer_id: int) -> str:
+    return f"{_key_prefix()}:lecturer:{lecturer_id}"
 
 
-def group_week_key(group_id: int, week_date: date | datetime) -> str:
+def discipline_key(discipline_id: int) -> str:
+    return f"{_key_prefix()}:discipline:{discipline_id}"
+
+
+def lecturer_week_key(lecturer_id: int, week_date: date | datetime) -> str:
+    anchor = week_anchor_date(week_date)
+    return f"{lecturer_key(lecturer_id)}:schedule:week:{anchor.isoformat()}"
+
+
+def discipline_week_key(discipline_id: int, week_date: date | datetime) -> str:
     anchor = week_anchor_date(week_date)
-    return f"{group_prefix(group_id)}:schedule:week:{anchor.isoformat()}"
+    return f"{discipline_key(discipline_id)}:schedule:week:{anchor.isoformat()}"
+
+
+def directory_key(name: str) -> str:
+    """LIST всего справочника (``lecturers``, ``disciplines``) в порядке backend."""
+    return f"{_key_prefix()}:directory:{name}"
+
+
+def stale_key(key: str) -> str:
+    """Копия значения ``key`` в устаревшем слое: ``<prefix>:stale:<ключ без префикса>``."""
+    prefix = _key_prefix()
+    return f"{prefix}:stale:{key[len(prefix) + 1 :]}"
 
 
 def screen_key(user_id: int, screen_name: str) -> str:
@@ -79,18 +206,90 @@ def week_anchor_date(value: date | datetime) -> date:
     return value - timedelta(days=value.weekday())
 
 
-def _json_loads(value: str | None) -> Any:
-    if not value:
-        return None
-    try:
-        return json.loads(value)
-    except json.JSONDecodeError:
-        logger.warning("Failed to decode Redis JSON payload")
+class _LocalCache:
+    """
+    In-process LRU с TTL поверх Redis: хранит уже декодированные значения,
+    чтобы горячие ключи не ходили в сеть и не проходили ``json.loads``.
+
+    Значения отдаются как есть (без копирования) — вызывающий код не должен
+    их изменять.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(0, max_entries)
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_s: float) -> None:
+        if self.max_entries == 0 or ttl_s <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def discard_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_local_caches: dict[str, _LocalCache] = {
+    FAMILY_PROFILE: _LocalCache(settings.local_cache_max_profiles),
+    FAMILY_GROUP_WEEK: _LocalCache(settings.local_cache_max_group_weeks),
+    FAMILY_SUBGROUP_WEEK: _LocalCache(settings.local_cache_max_subgroup_weeks),
+    FAMILY_LECTURER: _LocalCache(settings.local_cache_max_entities),
+    FAMILY_DISCIPLINE: _LocalCache(settings.local_cache_max_entities),
+    FAMILY_LECTURER_WEEK: _LocalCache(settings.local_cache_max_group_weeks),
+    FAMILY_DISCIPLINE_WEEK: _LocalCache(settings.local_cache_max_group_weeks),
+    FAMILY_SCREEN: _LocalCache(settings.local_cache_max_screens),
+    FAMILY_RENDER: _LocalCache(settings.local_cache_max_renders),
+    FAMILY_GENERATION: _LocalCache(settings.local_cache_max_group_weeks),
+}
+
+
+def _local_cache(family: Optional[str]) -> Optional[_LocalCache]:
+    if family is None:
         return None
+    return _local_caches.get(family)
+
+
+def _local_ttl_s(redis_ttl_s: float) -> float:
+    """Локальный TTL никогда не переживает TTL ключа в Redis."""
+    return min(float(settings.local_cache_ttl_s), redis_ttl_s)
 
 
-def _json_dumps(value: Any) -> str:
-    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+def clear_local_cache() -> None:
+    for local in _local_caches.values():
+        local.clear()
+
+
+def _encode_payload(value: Any, codec: Optional[PayloadCodec] = None) -> bytes:
+    """Payload в формате :mod:`ruzbot.codec` с кодеком и порогом сжатия из настроек."""
+    return encode(
+        value,
+        codec or codec_named(settings.redis_codec),
+        settings.redis_compress_min_bytes,
+    )
 
 
 def _serialize_markup(markup: Any) -> Optional[list[list[dict[str, Any]]]]:
@@ -142,121 +341,1198 @@ def _deserialize_markup(
     return markup
 
 
+def _create_redis_client():
+    # Явный размер пула и короткие таймауты: медленный Redis не должен добавлять
+    # десятки секунд к каждому шагу обработчика.
+    return redis.from_url(
+        settings.redis_url,
+        decode_responses=False,
+        health_check_interval=30,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout_s,
+        socket_connect_timeout=settings.redis_connect_timeout_s,
+    )
+
+
 async def get_redis_client():
+    """
+    Общий клиент Redis или ``None``: если Redis не настроен или автомат
+    :data:`_redis_breaker` открыт после серии ошибок — тогда обработчики идут
+    мимо кэша, а доступность проверяет фоновая проба.
+    """
     if redis is None or not settings.redis_url:
         return None
 
+    if not _redis_breaker.allows_requests():
+        if _redis_breaker.try_begin_probe():
+            _start_redis_probe()
+        return None
+
     global _redis_client
     if _redis_client is not None:
         return _redis_client
 
     async with _redis_lock:
         if _redis_client is None:
-            _redis_client = redis.from_url(
-                settings.redis_url,
-                decode_responses=True,
-                health_check_interval=30,
-            )
+            _redis_client = _create_redis_client()
     return _redis_client
 
 
-async def _read_json_key(key: str) -> Any:
+def _start_redis_probe() -> None:
+    global _redis_probe_task
+    _redis_probe_task = asyncio.ensure_future(_probe_redis())
+
+
+async def _probe_redis() -> None:
+    global _redis_client
+    try:
+        if _redis_client is None:
+            _redis_client = _create_redis_client()
+        await _redis_client.ping()
+    except Exception as exc:
+        _redis_breaker.record_failure()
+        logger.warning("Redis probe failed: %s", exc)
+        return
+    _redis_breaker.record_success()
+    logger.info("Redis is reachable again, cache re-enabled")
+
+
+def _redis_succeeded() -> None:
+    _redis_breaker.record_success()
+
+
+def _redis_failed(exc: Exception, message: str, *args: Any) -> None:
+    """
+    Короткое предупреждение вместо stack trace на каждый вызов; при открытии
+    автомата — одна ошибка о том, что Redis пропускается.
+    """
+    if _redis_breaker.record_failure():
+        logger.error(
+            "Redis failed %s times in a row (%s), skipping it for %.0fs",
+            _redis_breaker.failures,
+            exc,
+            _redis_breaker.cooldown_s,
+        )
+        return
+    logger.warning(message + ": %s", *args, exc)
+
+
+@dataclass(slots=True)
+class _RedisBatch:
+    """
+    Состояние одного обработчика: значения, прочитанные одним pipeline
+    (``None`` — ключа в Redis нет), и отложенные записи, которые уходят
+    одним pipeline при выходе из :func:`batch`.
+    """
+
+    reads: dict[str, Any] = field(default_factory=dict)
+    writes: dict[str, tuple[Any, int, Optional[str]]] = field(default_factory=dict)
+    closed: bool = False
+
+
+_batch: ContextVar[Optional[_RedisBatch]] = ContextVar("ruzbot_cache_batch", default=None)
+
+
+@asynccontextmanager
+async def batch():
+    """
+    Группирует обращения к Redis внутри обработчика: чтения, подготовленные
+    :func:`_prefetch`, и все записи уходят одним round trip.
+    Вложенный ``batch()`` присоединяется к внешнему.
+    """
+    current = _batch.get()
+    if current is not None and not current.closed:
+        yield current
+        return
+
+    current = _RedisBatch()
+    token = _batch.set(current)
+    try:
+        yield current
+    finally:
+        _batch.reset(token)
+        current.closed = True
+        await _flush_writes(current.writes)
+
+
+def _user_index_ttl_s() -> int:
+    # Индекс живёт не меньше любого своего ключа: каждая запись продлевает его до максимума.
+    return max(
+        settings.redis_ttl_profile_s,
+        settings.redis_ttl_user_schedule_s,
+        settings.redis_ttl_message_s,
+    )
+
+
+def _queue_set(pipe, key: str, raw: bytes, ttl_s: int, index: Optional[str]) -> None:
+    pipe.set(key, raw, ex=ttl_s)
+    if index is None:
+        return
+    now = time.time()
+    pipe.zadd(index, {key: now + ttl_s})
+    # Заодно выбрасываем из индекса уже истёкшие ключи, чтобы он не рос.
+    pipe.zremrangebyscore(index, "-inf", now)
+    pipe.expire(index, _user_index_ttl_s())
+
+
+async def _flush_writes(writes: dict[str, tuple[Any, int, Optional[str]]]) -> None:
+    if not writes:
+        return
+    client = await get_redis_client()
+    if client is None:
+        return
+
+    # Кодирование — до pipeline: ошибка сериализации не означает, что Redis недоступен.
+    encoded = []
+    for key, (value, ttl_s, index) in writes.items():
+        try:
+            encoded.append((key, _encode_payload(value), ttl_s, index))
+        except Exception:
+            logger.exception("Failed to encode cache value for %s", key)
+    if not encoded:
+        return
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, raw, ttl_s, index in encoded:
+            _queue_set(pipe, key, raw, ttl_s, index)
+        with metrics.timer(metrics.REDIS_SECONDS, op="flush"):
+            await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="flush")
+        _redis_failed(exc, "Failed to store %s batched Redis keys", len(writes))
+        return
+    _redis_succeeded()
+
+
+async def _prefetch(keys: dict[str, Optional[str]]) -> None:
+    """Читает ``{key: family}`` одним pipeline в текущий :func:`batch`."""
+    current = _batch.get()
+    if current is None or current.closed:
+        return
+
+    pending: list[tuple[str, Optional[_LocalCache]]] = []
+    for key, family in keys.items():
+        local = _local_cache(family)
+        if key in current.reads or (local is not None and local.get(key) is not None):
+            continue
+        pending.append((key, local))
+    if not pending:
+        return
+
+    client = await get_redis_client()
+    if client is None:
+        return
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, _ in pending:
+            pipe.get(key)
+            pipe.pttl(key)
+        with metrics.timer(metrics.REDIS_SECONDS, op="prefetch"):
+            results = await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="prefetch")
+        _redis_failed(exc, "Failed to prefetch %s Redis keys", len(pending))
+        return
+    _redis_succeeded()
+
+    for position, (key, local) in enumerate(pending):
+        raw, pttl_ms = results[2 * position], results[2 * position + 1]
+        value = _decode_payload(raw)
+        current.reads[key] = value
+        if local is not None and value is not None and pttl_ms and pttl_ms > 0:
+            local.set(key, value, _local_ttl_s(pttl_ms / 1000))
+
+
+def _record_read(family: Optional[str], source: str, value: Any) -> None:
+    metrics.inc(
+        metrics.CACHE_READS,
+        family=family or FAMILY_OTHER,
+        source=source,
+        result="miss" if value is None else "hit",
+    )
+
+
+async def _read_json_key(key: str, *, family: Optional[str] = None) -> Any:
+    local = _local_cache(family)
+    if local is not None:
+        cached = local.get(key)
+        if cached is not None:
+            _record_read(family, "local", cached)
+            return cached
+
+    current = _batch.get()
+    if current is not None and key in current.reads:
+        _record_read(family, "batch", current.reads[key])
+        return current.reads[key]
+
     client = await get_redis_client()
     if client is None:
+        _record_read(family, "disabled", None)
         return None
 
     try:
-        raw = await client.get(key)
-    except Exception:
-        logger.exception("Failed to read Redis key %s", key)
+        with metrics.timer(metrics.REDIS_SECONDS, op="read"):
+            if local is None:
+                raw = await client.get(key)
+            else:
+                pipe = client.pipeline(transaction=False)
+                pipe.get(key)
+                pipe.pttl(key)
+                raw, pttl_ms = await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="read")
+        _redis_failed(exc, "Failed to read Redis key %s", key)
         return None
-    return _json_loads(raw)
+    _redis_succeeded()
+
+    value = _decode_payload(raw)
+    _record_read(family, "redis", value)
+    # PTTL < 0: ключа нет или он бессрочный — в L1 такие значения не кладём.
+    if local is not None and value is not None and pttl_ms and pttl_ms > 0:
+        local.set(key, value, _local_ttl_s(pttl_ms / 1000))
+    return value
+
+
+async def _store_json_key(
+    key: str,
+    value: Any,
+    ttl_s: int,
+    *,
+    family: Optional[str] = None,
+    index: Optional[str] = None,
+) -> None:
+    metrics.inc(metrics.CACHE_WRITES, family=family or FAMILY_OTHER)
+    local = _local_cache(family)
+    if local is not None:
+        local.set(key, value, _local_ttl_s(ttl_s))
+
+    stale_ttl_s = settings.redis_ttl_stale_s
+    keep_stale = (
+        family in _STALE_FAMILIES and stale_ttl_s > 0 and not is_negative_entry(value)
+    )
 
+    current = _batch.get()
+    if current is not None and not current.closed:
+        current.reads[key] = value
+        current.writes[key] = (value, ttl_s, index)
+        if keep_stale:
+            current.writes[stale_key(key)] = (value, stale_ttl_s, None)
+        return
 
-async def _store_json_key(key: str, value: Any, ttl_s: int) -> None:
     client = await get_redis_client()
     if client is None:
         return
 
+    # Кодирование — до обращения к Redis: ошибка сериализации не означает,
+    # что Redis недоступен, и не должна открывать его автомат.
     try:
-        await client.set(key, _json_dumps(value), ex=ttl_s)
+        raw = _encode_payload(value)
     except Exception:
-        logger.exception("Failed to store Redis key %s", key)
-
+        logger.exception("Failed to encode cache value for %s", key)
+        return
 
-async def get_or_load_profile(
-    user_id: int, loader: Callable[[], Awaitable[Any]]
+    try:
+        with metrics.timer(metrics.REDIS_SECONDS, op="write"):
+            if index is None and not keep_stale:
+                await client.set(key, raw, ex=ttl_s)
+            else:
+                pipe = client.pipeline(transaction=False)
+                _queue_set(pipe, key, raw, ttl_s, index)
+                if keep_stale:
+                    _queue_set(pipe, stale_key(key), raw, stale_ttl_s, None)
+                await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="write")
+        _redis_failed(exc, "Failed to store Redis key %s", key)
+        return
+    _redis_succeeded()
+
+
+def _forget_inflight(key: str, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Если все ожидающие отменены, исключение иначе попадёт в лог как «never retrieved».
+    if not task.cancelled():
+        task.exception()
+
+
+def _note_stale_sources(keys: set[str]) -> None:
+    sources = _stale_sources.get()
+    if sources is not None:
+        sources.update(keys)
+
+
+def _built_from_stale() -> bool:
+    """Текущая загрузка получила хотя бы одно значение из устаревшего слоя."""
+    return bool(_stale_sources.get())
+
+
+async def _run_flight(load: Callable[[], Awaitable[Any]]) -> tuple[Any, set[str]]:
+    # Загрузка общая для всех ожидающих: дедлайн запустившего обработчика к
+    # ней не относится, её ограничивают таймауты и повторы эндпоинтов.
+    resilience.detach()
+    # Свой учёт на каждую загрузку: задача уже работает в копии контекста.
+    sources: set[str] = set()
+    _stale_sources.set(sources)
+    return await load(), sources
+
+
+def _start_flight(key: str, load: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_run_flight(load))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _forget_inflight(key, done))
+    return task
+
+
+async def _single_flight(key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Одновременные загрузки одного ключа ждут одну и ту же задачу: результат
+    или исключение получают все ожидающие, а backend видит один запрос.
+    Если результат построен из устаревших данных, это узнают и загрузки, в
+    которые он войдёт, и сам обработчик — даже если задачу запустил другой.
+    """
+    # Загрузку ждём в пределах своего дедлайна, как пачку в GroupWeekBatcher.
+    left = resilience.remaining()
+    if left is not None and left <= 0:
+        raise resilience.DeadlineExceeded("backend deadline exceeded")
+    # shield: отмена одного ожидающего не должна обрывать загрузку для остальных.
+    flight = asyncio.shield(_start_flight(key, load))
+    if left is None:
+        value, stale = await flight
+    else:
+        value, stale = await asyncio.wait_for(flight, left)
+    _note_stale_sources(stale)
+    for stale_read in stale:
+        resilience.note_stale(stale_read)
+    return value
+
+
+def _jittered_ttl(ttl_s: int) -> int:
+    """Разносит истечение ключей, записанных одной пачкой, на ±ratio от TTL."""
+    ratio = max(0.0, settings.redis_ttl_jitter_ratio)
+    return max(1, round(ttl_s * (1 + random.uniform(-ratio, ratio))))
+
+
+async def _load_or_stale(
+    key: str, load: Callable[[], Awaitable[Any]], family: Optional[str]
 ) -> Any:
-    key = profile_key(user_id)
-    cached = await _read_json_key(key)
+    """
+    ``load()``; если backend недоступен (автомат открыт, таймаут, 5xx) —
+    последнее известное значение из устаревшего слоя, с отметкой для ответа.
+    """
+    try:
+        return await load()
+    except Exception as exc:
+        if family not in _STALE_FAMILIES or not resilience.is_unavailable(exc):
+            raise
+        stale = await _read_json_key(stale_key(key))
+        if isinstance(stale, dict) and "soft_expires_at" in stale:
+            stale = stale.get("value")
+        if stale is None:
+            raise
+        metrics.inc(metrics.CACHE_LOOKUPS, family=family, result="stale_fallback")
+        logger.warning("Backend unavailable (%s), serving stale %s", exc, key)
+        resilience.note_stale(key)
+        _note_stale_sources({key})
+        return stale
+
+
+async def _get_or_load(
+    key: str,
+    load: Callable[[], Awaitable[Any]],
+    ttl_s: int,
+    *,
+    family: Optional[str] = None,
+    index: Optional[str] = None,
+    negative_ttl_s: Optional[int] = None,
+) -> Any:
+    label = family or FAMILY_OTHER
+    cached = await _read_json_key(key, family=family)
+    if is_negative_entry(cached):
+        metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="negative")
+        return None
     if cached is not None:
+        metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="hit")
         return cached
+    metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="miss")
+
+    async def load_and_store() -> Any:
+        with metrics.timer(metrics.LOADER_SECONDS, family=label):
+            value = await load()
+        if _built_from_stale():
+            # Построено из устаревших данных: в кэш как свежее не кладём.
+            return value
+        if value is None:
+            if negative_ttl_s:
+                await _store_json_key(
+                    key, _NEGATIVE_ENTRY, negative_ttl_s, family=family, index=index
+                )
+            return None
+        await _store_json_key(key, value, ttl_s, family=family, index=index)
+        return value
 
-    profile = await loader()
-    if profile is None:
-        return None
+    return await _load_or_stale(
+        key, lambda: _single_flight(key, load_and_store), family
+    )
 
-    await _store_json_key(key, profile, settings.redis_ttl_profile_s)
-    return profile
 
+def is_negative_entry(value: Any) -> bool:
+    return isinstance(value, dict) and value == _NEGATIVE_ENTRY
 
-async def get_or_load_week_lessons(
-    user_id: int,
-    anchor_date: date | datetime,
-    loader: Callable[[date], Awaitable[Any]],
+
+def payload_version(value: Any) -> int:
+    """
+    Отпечаток содержимого: не меняется, если обновление вернуло те же данные.
+    Для недели группы совпадает с ``version`` её конверта.
+    """
+    return zlib.crc32(_json_dumps(value).encode("utf-8"))
+
+
+async def _load_envelope(
+    key: str,
+    source: Callable[[], Awaitable[Any]],
+    ttl_s: int,
+    stale_s: int,
+    *,
+    family: Optional[str] = None,
 ) -> Any:
-    key = week_key(user_id, anchor_date)
-    cached = await _read_json_key(key)
+    """Загружает значение и кладёт его в конверт с мягким сроком (см. ниже)."""
+    with metrics.timer(metrics.LOADER_SECONDS, family=family or FAMILY_OTHER):
+        value = await source()
+    if value is None or _built_from_stale():
+        return value
+    soft_ttl_s = _jittered_ttl(ttl_s)
+    envelope = {
+        "value": value,
+        "soft_expires_at": time.time() + soft_ttl_s,
+        "version": payload_version(value),
+    }
+    await _store_json_key(key, envelope, soft_ttl_s + stale_s, family=family)
+    return value
+
+
+async def _get_or_load_with_soft_expiry(
+    key: str,
+    load: Callable[[], Awaitable[Any]],
+    ttl_s: int,
+    stale_s: int,
+    *,
+    family: Optional[str] = None,
+    refresh: Optional[Callable[[], Awaitable[Any]]] = None,
+) -> Any:
+    """
+    Stale-while-revalidate: значение хранится в конверте с мягким сроком
+    ``soft_expires_at`` (TTL с джиттером), а ключ в Redis живёт ещё ``stale_s``
+    секунд сверх него. После мягкого срока устаревшее значение отдаётся сразу,
+    а обновление уходит в фоновую задачу через ``refresh`` (или ``load``) —
+    если автомат backend не открыт.
+    """
+    label = family or FAMILY_OTHER
+
+    def load_and_store(source: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        return _load_envelope(key, source, ttl_s, stale_s, family=family)
+
+    async def background_refresh() -> Any:
+        # Задача переживёт обработчик: его batch и дедлайн к ней не относятся.
+        _batch.set(None)
+        resilience.detach()
+        try:
+            return await load_and_store(refresh or load)
+        except Exception as exc:
+            logger.warning("Background refresh of %s failed: %s", key, exc)
+            raise
+
+    cached = await _read_json_key(key, family=family)
+    if isinstance(cached, dict) and "soft_expires_at" in cached:
+        if cached["soft_expires_at"] <= time.time():
+            metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="stale")
+            if resilience.backend_available():
+                _start_flight(key, background_refresh)
+        else:
+            metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="hit")
+        return cached.get("value")
+
+    metrics.inc(metrics.CACHE_LOOKUPS, family=label, result="miss")
+    return await _load_or_stale(
+        key, lambda: _single_flight(key, lambda: load_and_store(load)), family
+    )
+
+
+async def group_generation(group_id: int) -> int:
+    """
+    Поколение расписания группы: входит в ключи недель группы, её подгрупп и
+    рендеров, поэтому :func:`bump_group_generation` за O(1) делает
+    все производные ключи недостижимыми. Локально кэшируется на
+    ``group_generation_local_ttl_s`` секунд; без Redis всегда ``0``.
+    """
+    key = group_generation_key(group_id)
+    local = _local_caches[FAMILY_GENERATION]
+    cached = local.get(key)
     if cached is not None:
         return cached
 
-    anchor = week_anchor_date(anchor_date)
-    lessons = await loader(anchor)
-    if lessons is None:
+    client = await get_redis_client()
+    if client is None:
+        return 0
+
+    try:
+        with metrics.timer(metrics.REDIS_SECONDS, op="read"):
+            raw = await client.get(key)
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="read")
+        _redis_failed(exc, "Failed to read generation of group %s", group_id)
+        return 0
+    _redis_succeeded()
+
+    try:
+        generation = int(raw) if raw else 0
+    except (TypeError, ValueError):
+        logger.warning("Invalid generation for group %s: %r", group_id, raw)
+        generation = 0
+    local.set(key, generation, settings.group_generation_local_ttl_s)
+    return generation
+
+
+async def bump_group_generation(group_id: int) -> Optional[int]:
+    """
+    Увеличивает поколение группы (INCR без TTL). Старые ключи больше не читаются
+    и истекают сами; другие процессы увидят новое поколение не позже чем через
+    ``group_generation_local_ttl_s``. ``None``, если Redis недоступен.
+    """
+    for local in _local_caches.values():
+        local.discard_prefix(f"{group_prefix(group_id)}:")
+
+    client = await get_redis_client()
+    if client is None:
         return None
 
-    await _store_json_key(key, lessons, settings.redis_ttl_user_schedule_s)
-    return lessons
+    try:
+        generation = int(await client.incr(group_generation_key(group_id)))
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="incr")
+        _redis_failed(exc, "Failed to bump generation of group %s", group_id)
+        return None
+    _redis_succeeded()
+    _local_caches[FAMILY_GENERATION].set(
+        group_generation_key(group_id),
+        generation,
+        settings.group_generation_local_ttl_s,
+    )
+    logger.info("Group %s schedule generation bumped to %s", group_id, generation)
+    return generation
 
 
-async def get_or_load_day_lessons(
-    user_id: int,
-    day_date: date | datetime,
-    loader: Callable[[date], Awaitable[Any]],
+async def get_or_load_profile(
+    user_id: int, loader: Callable[[], Awaitable[Any]]
 ) -> Any:
-    key = day_key(user_id, day_date)
-    cached = await _read_json_key(key)
-    if cached is not None:
-        return cached
+    return await _get_or_load(
+        profile_key(user_id),
+        loader,
+        settings.redis_ttl_profile_s,
+        family=FAMILY_PROFILE,
+        index=user_index_key(user_id),
+        negative_ttl_s=settings.redis_ttl_negative_s,
+    )
 
-    if isinstance(day_date, datetime):
-        day_date = day_date.date()
 
-    lessons = await loader(day_date)
-    if lessons is None:
-        return None
+async def get_or_load_group(
+    group_id: int, loader: Callable[[], Awaitable[Any]]
+) -> Any:
+    """Метаданные группы; ``None`` от ``loader`` (404) кэшируется ненадолго."""
+    return await _get_or_load(
+        group_meta_key(group_id),
+        loader,
+        settings.redis_ttl_group_schedule_s,
+        family=FAMILY_GROUP_META,
+        negative_ttl_s=settings.redis_ttl_negative_s,
+    )
+
+
+async def get_or_load_lecturer(
+    lecturer_id: int, loader: Callable[[], Awaitable[Any]]
+) -> Any:
+    return await _get_or_load(
+        lecturer_key(lecturer_id),
+        loader,
+        settings.redis_ttl_entity_s,
+        family=FAMILY_LECTURER,
+        negative_ttl_s=settings.redis_ttl_negative_s,
+    )
 
-    await _store_json_key(key, lessons, settings.redis_ttl_user_schedule_s)
-    return lessons
+
+async def get_or_load_discipline(
+    discipline_id: int, loader: Callable[[], Awaitable[Any]]
+) -> Any:
+    return await _get_or_load(
+        discipline_key(discipline_id),
+        loader,
+        settings.redis_ttl_entity_s,
+        family=FAMILY_DISCIPLINE,
+        negative_ttl_s=settings.redis_ttl_negative_s,
+    )
+
+
+async def _get_or_load_many(
+    keys: dict[int, str],
+    loader: Callable[[int], Awaitable[Any]],
+    ttl_s: int,
+    *,
+    family: str,
+) -> dict[int, Any]:
+    """
+    ``{id: значение}`` для найденных сущностей: все ключи читаются одним
+    pipeline, промахи грузятся параллельно, а их записи уходят одним flush.
+    """
+    async with batch():
+        await _prefetch({key: family for key in keys.values()})
+        values = await asyncio.gather(
+            *(
+                _get_or_load(
+                    key,
+                    lambda entity_id=entity_id: loader(entity_id),
+                    ttl_s,
+                    family=family,
+                    negative_ttl_s=settings.redis_ttl_negative_s,
+                )
+                for entity_id, key in keys.items()
+            )
+        )
+    return {
+        entity_id: value
+        for entity_id, value in zip(keys, values)
+        if value is not None
+    }
+
+
+async def get_or_load_lecturers(
+    lecturer_ids: list[int], loader: Callable[[int], Awaitable[Any]]
+) -> dict[int, Any]:
+    return await _get_or_load_many(
+        {lecturer_id: lecturer_key(lecturer_id) for lecturer_id in lecturer_ids},
+        loader,
+        settings.redis_ttl_entity_s,
+        family=FAMILY_LECTURER,
+    )
+
+
+async def get_or_load_disciplines(
+    discipline_ids: list[int], loader: Callable[[int], Awaitable[Any]]
+) -> dict[int, Any]:
+    return await _get_or_load_many(
+        {
+            discipline_id: discipline_key(discipline_id)
+            for discipline_id in discipline_ids
+        },
+        loader,
+        settings.redis_ttl_entity_s,
+        family=FAMILY_DISCIPLINE,
+    )
 
 
 async def get_or_load_group_week_lessons(
     group_id: int,
     anchor_date: date | datetime,
     loader: Callable[[date], Awaitable[Any]],
+    *,
+    refresh_loader: Optional[Callable[[date], Awaitable[Any]]] = None,
+    generation: int = 0,
+) -> Any:
+    """
+    Неделя группы с мягким сроком ``redis_ttl_group_schedule_s`` (± джиттер):
+    после него ещё ``redis_group_schedule_stale_s`` отдаётся старая копия, пока
+    фоновая задача перезагружает неделю. ``refresh_loader`` нужен, если
+    ``loader`` привязан к клиенту, который закроется после ответа пользователю.
+    """
+    anchor = week_anchor_date(anchor_date)
+    return await _get_or_load_with_soft_expiry(
+        group_week_key(group_id, anchor, generation),
+        lambda: loader(anchor),
+        settings.redis_ttl_group_schedule_s,
+        settings.redis_group_schedule_stale_s,
+        family=FAMILY_GROUP_WEEK,
+        refresh=lambda: (refresh_loader or loader)(anchor),
+    )
+
+
+async def get_or_load_lecturer_week(
+    lecturer_id: int,
+    anchor_date: date | datetime,
+    loader: Callable[[date], Awaitable[Any]],
 ) -> Any:
-    key = group_week_key(group_id, anchor_date)
-    cached = await _read_json_key(key)
-    if cached is not None:
-        return cached
+    """
+    Неделя преподавателя с теми же мягким сроком, stale-окном и single-flight,
+    что у недели группы; экраны дня фильтруют её, а не ходят в backend за днём.
+    ``loader`` должен открывать свой клиент — он же обновляет неделю в фоне.
+    """
+    anchor = week_anchor_date(anchor_date)
+    return await _get_or_load_with_soft_expiry(
+        lecturer_week_key(lecturer_id, anchor),
+        lambda: loader(anchor),
+        settings.redis_ttl_group_schedule_s,
+        settings.redis_group_schedule_stale_s,
+        family=FAMILY_LECTURER_WEEK,
+    )
+
 
+async def get_or_load_discipline_week(
+    discipline_id: int,
+    anchor_date: date | datetime,
+    loader: Callable[[date], Awaitable[Any]],
+) -> Any:
     anchor = week_anchor_date(anchor_date)
-    lessons = await loader(anchor)
-    if lessons is None:
+    return await _get_or_load_with_soft_expiry(
+        discipline_week_key(discipline_id, anchor),
+        lambda: loader(anchor),
+        settings.redis_ttl_group_schedule_s,
+        settings.redis_group_schedule_stale_s,
+        family=FAMILY_DISCIPLINE_WEEK,
+    )
+
+
+async def _load_directory(
+    key: str, loader: Callable[[], Awaitable[Any]]
+) -> list[Any]:
+    """
+    Загружает справочник и подменяет LIST целиком: элементы пишутся во
+    временный ключ, а ``RENAME`` в одной транзакции делает замену атомарной —
+    читатель видит либо старый список, либо новый.
+    """
+    with metrics.timer(metrics.LOADER_SECONDS, family=FAMILY_DIRECTORY):
+        items = list(await loader() or [])
+
+    client = await get_redis_client()
+    if client is None:
+        return items
+
+    try:
+        encoded = [_encode_payload(item) for item in items]
+    except Exception:
+        logger.exception("Failed to encode directory %s", key)
+        return items
+
+    metrics.inc(metrics.CACHE_WRITES, family=FAMILY_DIRECTORY)
+    empty_key = _directory_empty_key(key)
+    try:
+        with metrics.timer(metrics.REDIS_SECONDS, op="write"):
+            pipe = client.pipeline(transaction=True)
+            if encoded:
+                tmp_key = f"{key}:tmp:{uuid.uuid4().hex}"
+                for start in range(0, len(encoded), 1000):
+                    pipe.rpush(tmp_key, *encoded[start : start + 1000])
+                pipe.expire(tmp_key, settings.redis_ttl_directory_s)
+                pipe.rename(tmp_key, key)
+                pipe.delete(empty_key)
+            else:
+                # Пустой LIST в Redis не хранится — пустоту помечает отдельный ключ.
+                pipe.delete(key)
+                pipe.set(empty_key, 1, ex=settings.redis_ttl_directory_s)
+            await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="write")
+        _redis_failed(exc, "Failed to store directory %s", key)
+        return items
+    _redis_succeeded()
+    return items
+
+
+def _directory_empty_key(key: str) -> str:
+    return f"{key}:empty"
+
+
+async def get_directory_page(
+    name: str,
+    page: int,
+    page_size: int,
+    loader: Callable[[], Awaitable[Any]],
+) -> tuple[list[Any], int, int]:
+    """
+    Страница справочника ``(элементы, всего, номер страницы)``; номер
+    берётся по модулю числа страниц. При попадании — один ``LRANGE`` без
+    backend. Справочник живёт ``redis_ttl_directory_s``, а старше
+    ``directory_refresh_s`` перезагружается в фоне, пока отдаётся текущий.
+    ``loader`` должен открывать свой клиент — он же используется для фонового
+    обновления. Пустой справочник тоже кэшируется (ключ ``<key>:empty``), а
+    список без TTL считается устаревшим.
+    """
+    key = directory_key(name)
+    page_size = max(1, page_size)
+
+    def page_of(total: int, wanted: int) -> tuple[int, int]:
+        pages = max(1, math.ceil(total / page_size))
+        wanted = wanted % pages
+        return wanted, wanted * page_size
+
+    def from_items(items: list[Any]) -> tuple[list[Any], int, int]:
+        number, start = page_of(len(items), page)
+        return items[start : start + page_size], len(items), number
+
+    client = await get_redis_client()
+    if client is None:
+        metrics.inc(metrics.CACHE_LOOKUPS, family=FAMILY_DIRECTORY, result="miss")
+        return from_items(await _load_directory(key, loader))
+
+    start = max(0, page) * page_size
+    try:
+        with metrics.timer(metrics.REDIS_SECONDS, op="read"):
+            pipe = client.pipeline(transaction=False)
+            pipe.llen(key)
+            pipe.lrange(key, start, start + page_size - 1)
+            pipe.pttl(key)
+            pipe.exists(_directory_empty_key(key))
+            total, raw_items, pttl_ms, known_empty = await pipe.execute()
+            number, wanted_start = page_of(total, page) if total else (0, 0)
+            if total and wanted_start != start:
+                # Страница за концом списка (справочник сократился) — ещё один LRANGE.
+                raw_items = await client.lrange(
+                    key, wanted_start, wanted_start + page_size - 1
+                )
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="read")
+        _redis_failed(exc, "Failed to read directory %s", key)
+        return from_items(await loader() or [])
+    _redis_succeeded()
+
+    if not total:
+        if known_empty:
+            metrics.inc(metrics.CACHE_LOOKUPS, family=FAMILY_DIRECTORY, result="hit")
+            return [], 0, 0
+        metrics.inc(metrics.CACHE_LOOKUPS, family=FAMILY_DIRECTORY, result="miss")
+        return from_items(await _single_flight(key, lambda: _load_directory(key, loader)))
+
+    # Без TTL (-1) список сам не истечёт — обновляем его, как устаревший.
+    age_s = settings.redis_ttl_directory_s - (pttl_ms or 0) / 1000
+    if not pttl_ms or pttl_ms < 0 or age_s >= settings.directory_refresh_s:
+        metrics.inc(metrics.CACHE_LOOKUPS, family=FAMILY_DIRECTORY, result="stale")
+        if resilience.backend_available():
+            _start_flight(key, lambda: _refresh_directory(key, loader))
+    else:
+        metrics.inc(metrics.CACHE_LOOKUPS, family=FAMILY_DIRECTORY, result="hit")
+    items = [_decode_payload(raw) for raw in raw_items]
+    return [item for item in items if item is not None], total, number
+
+
+async def _refresh_directory(
+    key: str, loader: Callable[[], Awaitable[Any]]
+) -> list[Any]:
+    _batch.set(None)
+    resilience.detach()
+    try:
+        return await _load_directory(key, loader)
+    except Exception as exc:
+        logger.warning("Background refresh of %s failed: %s", key, exc)
+        raise
+
+
+async def get_or_load_subgroup_week(
+    group_id: int,
+    subgroup: int,
+    anchor_date: date | datetime,
+    loader: Callable[[date], Awaitable[Any]],
+    *,
+    generation: int = 0,
+) -> Any:
+    """
+    Неделя подгруппы ``{дата: [пары]}`` — одна копия на (группа, подгруппа,
+    неделя) вместо копии на каждого пользователя; экраны недели и дня берут
+    данные отсюда. ``loader`` фильтрует неделю группы при промахе и возвращает
+    ``(дни, версия недели группы)``; результат — та же пара, версия хранится
+    вместе с днями (см. :func:`group_week_deps`).
+    """
+    anchor = week_anchor_date(anchor_date)
+
+    async def load() -> Any:
+        loaded = await loader(anchor)
+        if loaded is None:
+            return None
+        days, version = loaded
+        return {"days": days, "group_week_version": version}
+
+    payload = await _get_or_load(
+        subgroup_week_key(group_id, subgroup, anchor, generation),
+        load,
+        settings.redis_ttl_user_schedule_s,
+        family=FAMILY_SUBGROUP_WEEK,
+    )
+    if payload is None:
         return None
+    return payload["days"], payload["group_week_version"]
+
+
+async def refresh_group_week_lessons(
+    group_id: int,
+    anchor_date: date | datetime,
+    loader: Callable[[date], Awaitable[Any]],
+    *,
+    generation: int = 0,
+) -> Any:
+    """Загружает неделю группы из backend в обход кэша и записывает свежий конверт."""
+    anchor = week_anchor_date(anchor_date)
+    key = group_week_key(group_id, anchor, generation)
+    return await _single_flight(
+        key,
+        lambda: _load_envelope(
+            key,
+            lambda: loader(anchor),
+            settings.redis_ttl_group_schedule_s,
+            settings.redis_group_schedule_stale_s,
+            family=FAMILY_GROUP_WEEK,
+        ),
+    )
+
+
+def active_groups_key() -> str:
+    """ZSET групп, расписание которых смотрели (score — время последнего просмотра)."""
+    return f"{_key_prefix()}:groups:active"
+
 
-    await _store_json_key(key, lessons, settings.redis_ttl_group_schedule_s)
-    return lessons
+# Когда группа последний раз записывалась в active_groups_key этим процессом.
+_active_touched: dict[int, float] = {}
+_ACTIVE_TOUCH_INTERVAL_S = 3600
+
+
+async def touch_active_group(group_id: int) -> None:
+    """Отмечает группу активной; не чаще раза в час на группу, чтобы не тратить round trip."""
+    now = time.monotonic()
+    touched_at = _active_touched.get(group_id)
+    if touched_at is not None and now - touched_at < _ACTIVE_TOUCH_INTERVAL_S:
+        return
+
+    client = await get_redis_client()
+    if client is None:
+        return
+
+    try:
+        await client.zadd(active_groups_key(), {str(group_id): time.time()})
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="touch")
+        _redis_failed(exc, "Failed to mark group %s active", group_id)
+        return
+    _redis_succeeded()
+    _active_touched[group_id] = now
+
+
+async def active_group_ids(since_s: float) -> list[int]:
+    """Группы, которые смотрели за последние ``since_s`` секунд; старые удаляются из ZSET."""
+    client = await get_redis_client()
+    if client is None:
+        return []
+
+    cutoff = time.time() - since_s
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zremrangebyscore(active_groups_key(), "-inf", cutoff)
+        pipe.zrangebyscore(active_groups_key(), cutoff, "+inf")
+        _, members = await pipe.execute()
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="active_groups")
+        _redis_failed(exc, "Failed to read active groups")
+        return []
+    _redis_succeeded()
+
+    group_ids: list[int] = []
+    for member in members:
+        try:
+            group_ids.append(int(member))
+        except (TypeError, ValueError):
+            continue
+    return group_ids
+
+
+_prefetch_tasks: dict[str, asyncio.Task] = {}
+_prefetch_slots: Optional[tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+
+def _prefetch_semaphore() -> asyncio.Semaphore:
+    global _prefetch_slots
+    loop = asyncio.get_running_loop()
+    if _prefetch_slots is None or _prefetch_slots[0] is not loop:
+        _prefetch_slots = (
+            loop,
+            asyncio.Semaphore(max(1, settings.prefetch_concurrency)),
+        )
+    return _prefetch_slots[1]
+
+
+def _forget_prefetch(key: str, task: asyncio.Task) -> None:
+    if _prefetch_tasks.get(key) is task:
+        del _prefetch_tasks[key]
+
+
+async def _prefetch_group_week(
+    group_id: int,
+    anchor: date,
+    loader: Callable[[date], Awaitable[Any]],
+    generation: int,
+) -> None:
+    # Задача унаследовала контекст обработчика: его batch и дедлайн к фоновой
+    # загрузке не относятся.
+    _batch.set(None)
+    resilience.detach()
+    async with _prefetch_semaphore():
+        try:
+            await get_or_load_group_week_lessons(
+                group_id, anchor, loader, generation=generation
+            )
+        except Exception as exc:
+            metrics.inc(metrics.PREFETCHES, result="failed")
+            logger.warning(
+                "Prefetch of group %s week %s failed: %s", group_id, anchor, exc
+            )
+
+
+def prefetch_group_weeks(
+    group_id: int,
+    anchor_dates: list[date | datetime],
+    loader: Callable[[date], Awaitable[Any]],
+    *,
+    generation: int = 0,
+) -> None:
+    """
+    Фоново прогревает недели группы. Не больше ``prefetch_concurrency`` загрузок
+    одновременно и ``prefetch_max_pending`` в очереди — лишние отбрасываются;
+    уже закэшированные и уже загружаемые недели пропускаются. ``loader`` должен
+    открывать свой клиент: обработчик к моменту загрузки уже завершится.
+    Пока автомат backend открыт, ничего не планируется.
+    """
+    if not resilience.backend_available():
+        metrics.inc(metrics.PREFETCHES, result="dropped", amount=len(anchor_dates))
+        return
+    local = _local_caches[FAMILY_GROUP_WEEK]
+    for anchor_date in anchor_dates:
+        anchor = week_anchor_date(anchor_date)
+        key = group_week_key(group_id, anchor, generation)
+        if key in _prefetch_tasks or key in _inflight or local.get(key) is not None:
+            metrics.inc(metrics.PREFETCHES, result="cached")
+            continue
+        if len(_prefetch_tasks) >= settings.prefetch_max_pending:
+            metrics.inc(metrics.PREFETCHES, result="dropped")
+            continue
+        metrics.inc(metrics.PREFETCHES, result="scheduled")
+        task = asyncio.ensure_future(
+            _prefetch_group_week(group_id, anchor, loader, generation)
+        )
+        _prefetch_tasks[key] = task
+        task.add_done_callback(lambda done, key=key: _forget_prefetch(key, done))
+
+
+async def _prefetch_entities(
+    name: str,
+    load_many: Callable[[list[int], Callable[[int], Awaitable[Any]]], Awaitable[Any]],
+    entity_ids: list[int],
+    loader: Callable[[int], Awaitable[Any]],
+) -> None:
+    _batch.set(None)
+    resilience.detach()
+    async with _prefetch_semaphore():
+        try:
+            await load_many(entity_ids, loader)
+        except Exception as exc:
+            metrics.inc(metrics.PREFETCHES, result="failed")
+            logger.warning("Prefetch of %s %s failed: %s", name, entity_ids, exc)
+
+
+def _schedule_entity_prefetch(
+    name: str,
+    keys: dict[int, str],
+    family: str,
+    load_many: Callable[[list[int], Callable[[int], Awaitable[Any]]], Awaitable[Any]],
+    loader: Callable[[int], Awaitable[Any]],
+) -> None:
+    local = _local_caches[family]
+    missing = [
+        entity_id
+        for entity_id, key in keys.items()
+        if key not in _inflight and local.get(key) is None
+    ]
+    if not missing:
+        metrics.inc(metrics.PREFETCHES, result="cached")
+        return
+    task_key = f"{name}:{','.join(map(str, missing))}"
+    if task_key in _prefetch_tasks:
+        metrics.inc(metrics.PREFETCHES, result="cached")
+        return
+    if len(_prefetch_tasks) >= settings.prefetch_max_pending or (
+        not resilience.backend_available()
+    ):
+        metrics.inc(metrics.PREFETCHES, result="dropped")
+        return
+    metrics.inc(metrics.PREFETCHES, result="scheduled")
+    task = asyncio.ensure_future(_prefetch_entities(name, load_many, missing, loader))
+    _prefetch_tasks[task_key] = task
+    task.add_done_callback(lambda done: _forget_prefetch(task_key, done))
+
+
+def prefetch_lecturers(
+    lecturer_ids: list[int], loader: Callable[[int], Awaitable[Any]]
+) -> None:
+    """
+    Фоново прогревает карточки преподавателей со страницы списка — следующий
+    экран — одной пачкой :func:`get_or_load_lecturers`. Уже закэшированные
+    пропускаются; ошибки только пишутся в лог. ``loader`` открывает свой клиент.
+    """
+    _schedule_entity_prefetch(
+        "lecturers",
+        {lecturer_id: lecturer_key(lecturer_id) for lecturer_id in lecturer_ids},
+        FAMILY_LECTURER,
+        get_or_load_lecturers,
+        loader,
+    )
+
+
+def prefetch_disciplines(
+    discipline_ids: list[int], loader: Callable[[int], Awaitable[Any]]
+) -> None:
+    """То же, что :func:`prefetch_lecturers`, для карточек дисциплин."""
+    _schedule_entity_prefetch(
+        "disciplines",
+        {
+            discipline_id: discipline_key(discipline_id)
+            for discipline_id in discipline_ids
+        },
+        FAMILY_DISCIPLINE,
+        get_or_load_disciplines,
+        loader,
+    )
+
+
+async def get_or_render(
+    group_id: int,
+    subgroup: int,
+    view: str,
+    view_date: date | datetime,
+    render: Callable[[], Awaitable[Optional[tuple[str, Optional[int]]]]],
+    *,
+    variant: str = "default",
+    generation: int = 0,
+) -> Optional[tuple[str, Optional[int]]]:
+    """
+    Отрендеренный текст недели/дня для (группа, подгруппа, дата, вариант):
+    при попадании фильтрация, сортировка, форматирование и экранирование не
+    выполняются. Живёт столько же, сколько недели/дни пользователей.
+    ``render`` и результат — ``(текст, версия недели группы, из которой он
+    построен)``.
+    """
+
+    async def load() -> Any:
+        rendered = await render()
+        if rendered is None:
+            return None
+        text, version = rendered
+        return {"text": text, "group_week_version": version}
+
+    payload = await _get_or_load(
+        render_key(group_id, subgroup, view, view_date, variant, generation),
+        load,
+        settings.redis_ttl_user_schedule_s,
+        family=FAMILY_RENDER,
+    )
+    if payload is None:
+        return None
+    return payload["text"], payload["group_week_version"]
 
 
 async def store_screen_snapshot(
@@ -267,23 +1543,36 @@ async def store_screen_snapshot(
     reply_markup: Any = None,
     parse_mode: Optional[str] = None,
     source: Optional[str] = None,
+    deps: Optional[list[list[Any]]] = None,
 ) -> None:
+    """``deps``: данные, из которых построен экран; при их изменении replay пропускается."""
+    if resilience.served_stale():
+        # Экран — весь ответ обработчика: если в нём есть устаревшие данные,
+        # повторять его из snapshot нельзя.
+        return
     payload = ScreenSnapshot(
         text=text,
         parse_mode=parse_mode,
         reply_markup=_serialize_markup(reply_markup),
         source=source,
         created_at=datetime.utcnow().isoformat(timespec="seconds"),
+        deps=deps or [],
     )
     await _store_json_key(
-        screen_key(user_id, screen_name), asdict(payload), settings.redis_ttl_message_s
+        screen_key(user_id, screen_name),
+        asdict(payload),
+        settings.redis_ttl_message_s,
+        family=FAMILY_SCREEN,
+        index=user_index_key(user_id),
     )
 
 
 async def get_screen_snapshot(
     user_id: int, screen_name: str
 ) -> Optional[ScreenSnapshot]:
-    payload = await _read_json_key(screen_key(user_id, screen_name))
+    payload = await _read_json_key(
+        screen_key(user_id, screen_name), family=FAMILY_SCREEN
+    )
     if payload is None:
         return None
     try:
@@ -293,10 +1582,100 @@ async def get_screen_snapshot(
         return None
 
 
+async def _group_week_version(
+    group_id: int, generation: int, anchor_date: date | datetime
+) -> Optional[int]:
+    envelope = await _read_json_key(
+        group_week_key(group_id, anchor_date, generation), family=FAMILY_GROUP_WEEK
+    )
+    if not isinstance(envelope, dict):
+        return None
+    return envelope.get("version")
+
+
+def group_week_deps(
+    group_id: int,
+    generation: int,
+    anchor_date: date | datetime,
+    version: Optional[int],
+) -> list[list[Any]]:
+    """
+    Зависимости экрана недели/дня: поколение группы и отпечаток недели группы.
+    ``version`` — та, из которой построен текст (её возвращают
+    :func:`get_or_render` и :func:`get_or_load_subgroup_week`), а не текущая:
+    неделя могла обновиться, пока рендер лежал в кэше.
+    """
+    anchor = week_anchor_date(anchor_date)
+    return [
+        ["group", group_id, generation],
+        ["group_week", group_id, generation, anchor.isoformat(), version],
+    ]
+
+
+def relative_date_dep(view: str, delta: int, resolved: date | datetime) -> list[Any]:
+    """
+    Зависимость экрана с относительным именем (``parseDay 0``, ``parseWeek 1``):
+    дата, на которую указывал сдвиг при построении. После полуночи (для
+    ``"day"``) или смены недели (для ``"week"``) она уже другая, и replay
+    пропускается.
+    """
+    if isinstance(resolved, datetime):
+        resolved = resolved.date()
+    if view == "week":
+        resolved = week_anchor_date(resolved)
+    return [view, delta, resolved.isoformat()]
+
+
+def _resolve_relative_date(view: str, delta: int) -> Optional[date]:
+    today = date.today()
+    if view == "day":
+        return today + timedelta(days=delta)
+    if view == "week":
+        return week_anchor_date(today + timedelta(weeks=delta))
+    return None
+
+
+async def profile_deps(user_id: int) -> list[list[Any]]:
+    profile = await _read_json_key(profile_key(user_id), family=FAMILY_PROFILE)
+    if profile is None or is_negative_entry(profile):
+        return []
+    return [["profile", user_id, payload_version(profile)]]
+
+
+async def _dep_unchanged(dep: list[Any]) -> bool:
+    match dep:
+        case ["day" | "week" as view, delta, resolved]:
+            current = _resolve_relative_date(view, delta)
+            return current is not None and current.isoformat() == resolved
+        case ["group", group_id, generation]:
+            return await group_generation(group_id) == generation
+        case ["group_week", group_id, generation, anchor, version]:
+            current = await _group_week_version(
+                group_id, generation, date.fromisoformat(anchor)
+            )
+            return current == version
+        case ["profile", user_id, version]:
+            profile = await _read_json_key(profile_key(user_id), family=FAMILY_PROFILE)
+            return profile is not None and payload_version(profile) == version
+    logger.warning("Unknown screen snapshot dependency %r", dep)
+    return False
+
+
+async def _deps_unchanged(deps: list[list[Any]]) -> bool:
+    # По порядку: дата не требует Redis, поколение группы дешевле недели и
+    # задаёт её ключ.
+    for dep in deps:
+        if not await _dep_unchanged(list(dep)):
+            return False
+    return True
+
+
 async def replay_screen_snapshot(bot, message, user_id: int, screen_name: str) -> bool:
     snapshot = await get_screen_snapshot(user_id, screen_name)
     if snapshot is None:
         return False
+    if not await _deps_unchanged(snapshot.deps):
+        return False
 
     kwargs: dict[str, Any] = {}
     markup = _deserialize_markup(snapshot.reply_markup)
@@ -318,15 +1697,38 @@ async def replay_screen_snapshot(bot, message, user_id: int, screen_name: str) -
     return True
 
 
+_INVALIDATE_USER_LUA = """
+local keys = redis.call('ZRANGE', KEYS[1], 0, -1)
+for i = 1, #keys, 512 do
+    redis.call('DEL', unpack(keys, i, math.min(i + 511, #keys)))
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+return #keys
+"""
+
+
 async def invalidate_user(user_id: int) -> None:
+    """
+    Удаляет все ключи пользователя одним EVAL по индексу :func:`user_index_key`:
+    стоимость зависит только от числа ключей этого пользователя, а не от размера
+    keyspace. Профиль удаляется явно — на случай ключа, записанного до индекса,
+    — вместе с его копией в устаревшем слое: иначе при недоступном backend
+    пользователю вернулись бы прежние группа и подгруппа.
+    """
+    for local in _local_caches.values():
+        local.discard_prefix(f"{user_prefix(user_id)}:")
+
     client = await get_redis_client()
     if client is None:
         return
 
     try:
-        pattern = f"{user_prefix(user_id)}:*"
-        keys = [key async for key in client.scan_iter(match=pattern)]
-        if keys:
-            await client.delete(*keys)
-    except Exception:
-        logger.exception("Failed to invalidate Redis keys for user %s", user_id)
+        # register_script только считает SHA: сам скрипт уходит через EVALSHA.
+        script = client.register_script(_INVALIDATE_USER_LUA)
+        profile = profile_key(user_id)
+        await script(keys=[user_index_key(user_id), profile, stale_key(profile)])
+    except Exception as exc:
+        metrics.inc(metrics.REDIS_ERRORS, op="invalidate")
+        _redis_failed(exc, "Failed to invalidate Redis keys for user %s", user_id)
+        return
+    _redis_succeeded()
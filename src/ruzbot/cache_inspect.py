@@ -0,0 +1,283 @@
+"""
+Что лежит в Redis: число ключей, оценка памяти, распределение TTL и самые
+большие ключи по каждому семейству, которое создаёт :mod:`ruzbot.cache`.
+
+Запуск: ``python -m ruzbot.cache_inspect``. Keyspace обходится через ``SCAN``
+небольшими порциями с паузами, ``MEMORY USAGE`` запрашивается для выборки
+ключей и экстраполируется на семейство — Redis при этом не блокируется.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import random
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ruzbot import cache
+from ruzbot.settings import settings
+
+# Верхние границы корзин TTL в секундах; ключи без TTL и просроченные отдельно.
+TTL_BUCKETS: tuple[tuple[str, float], ...] = (
+    ("<1m", 60),
+    ("<10m", 600),
+    ("<1h", 3600),
+    ("<1d", 86400),
+    (">=1d", float("inf")),
+)
+NO_TTL = "no ttl"
+
+# (семейство, шаблон ключа после префикса) — в порядке проверки.
+_FAMILY_PATTERNS: tuple[tuple[str, str], ...] = (
+    ("profile", r"user:\d+:profile"),
+    ("user_index", r"user:\d+:keys"),
+    ("screen", r"user:\d+:screen:.*"),
+    # Недели и дни пользователей из прежнего формата, доживают свой TTL.
+    ("legacy_user_week", r"user:\d+:schedule:week:.*"),
+    ("legacy_user_day", r"user:\d+:schedule:day:.*"),
+    ("group_meta", r"group:\d+:meta"),
+    ("generation", r"group:\d+:gen"),
+    ("group_week", r"group:\d+:(g\d+:)?schedule:week:.*"),
+    ("subgroup_week", r"group:\d+:g\d+:sub:.*"),
+    ("render", r"group:\d+:(g\d+:)?render:.*"),
+    ("lecturer", r"lecturer:\d+"),
+    ("discipline", r"discipline:\d+"),
+    ("lecturer_week", r"lecturer:\d+:schedule:week:.*"),
+    ("discipline_week", r"discipline:\d+:schedule:week:.*"),
+    ("directory", r"directory:[^:]+(:tmp:.*|:empty)?"),
+    ("active_groups", r"groups:active"),
+    # Последние известные значения на время недоступности backend.
+    ("stale", r"stale:.*"),
+)
+_compiled: Optional[tuple[str, list[tuple[str, re.Pattern[str]]]]] = None
+
+
+def classify_key(key: str) -> str:
+    """Семейство ключа по его формату; незнакомые ключи — ``other``."""
+    global _compiled
+    prefix = cache._key_prefix()
+    if _compiled is None or _compiled[0] != prefix:
+        _compiled = (
+            prefix,
+            [
+                (family, re.compile(re.escape(prefix) + ":" + pattern))
+                for family, pattern in _FAMILY_PATTERNS
+            ],
+        )
+    for family, pattern in _compiled[1]:
+        if pattern.fullmatch(key):
+            return family
+    return "other"
+
+
+def ttl_bucket(pttl_ms: Optional[int]) -> str:
+    if pttl_ms is None or pttl_ms < 0:
+        return NO_TTL
+    ttl_s = pttl_ms / 1000
+    for name, bound in TTL_BUCKETS:
+        if ttl_s < bound:
+            return name
+    return TTL_BUCKETS[-1][0]
+
+
+@dataclass(slots=True)
+class FamilyStats:
+    keys: int = 0
+    sampled: int = 0
+    sampled_bytes: int = 0
+    ttls: dict[str, int] = field(default_factory=dict)
+    # Куча (байты, ключ) размера ``top`` — самые большие из измеренных.
+    largest: list[tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def avg_bytes(self) -> float:
+        return self.sampled_bytes / self.sampled if self.sampled else 0.0
+
+    @property
+    def estimated_bytes(self) -> int:
+        """Оценка памяти всего семейства по выборке ``MEMORY USAGE``."""
+        return round(self.avg_bytes * self.keys)
+
+
+@dataclass(slots=True)
+class KeyspaceReport:
+    families: dict[str, FamilyStats] = field(default_factory=dict)
+    scanned: int = 0
+    truncated: bool = False
+
+    @property
+    def estimated_bytes(self) -> int:
+        return sum(stats.estimated_bytes for stats in self.families.values())
+
+
+async def inspect_keyspace(
+    client,
+    *,
+    count: int = 500,
+    pause_s: float = 0.01,
+    sample_ratio: float = 1.0,
+    max_keys: Optional[int] = None,
+    top: int = 5,
+    rng: Optional[random.Random] = None,
+) -> KeyspaceReport:
+    """
+    Обходит ключи префикса через ``SCAN ... COUNT count``; на каждую порцию —
+    один pipeline с ``PTTL`` и ``MEMORY USAGE`` (последнее — для доли
+    ``sample_ratio`` ключей). Между порциями ``pause_s``, чтобы не занимать Redis.
+    """
+    rng = rng or random.Random()
+    report = KeyspaceReport()
+    cursor = 0
+    match = f"{cache._key_prefix()}:*"
+
+    while True:
+        cursor, raw_keys = await client.scan(cursor=cursor, match=match, count=count)
+        keys = [
+            raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+            for raw in raw_keys
+        ]
+        if max_keys is not None:
+            keys = keys[: max(0, max_keys - report.scanned)]
+        if keys:
+            await _inspect_batch(client, keys, report, sample_ratio, top, rng)
+        if int(cursor) == 0:
+            break
+        if max_keys is not None and report.scanned >= max_keys:
+            report.truncated = True
+            break
+        await asyncio.sleep(pause_s)
+    return report
+
+
+async def _inspect_batch(
+    client,
+    keys: list[str],
+    report: KeyspaceReport,
+    sample_ratio: float,
+    top: int,
+    rng: random.Random,
+) -> None:
+    sampled = [rng.random() < sample_ratio for _ in keys]
+    pipe = client.pipeline(transaction=False)
+    for key, measure in zip(keys, sampled):
+        pipe.pttl(key)
+        if measure:
+            pipe.memory_usage(key, samples=0)
+    results = iter(await pipe.execute())
+
+    for key, measure in zip(keys, sampled):
+        pttl_ms = next(results)
+        size = next(results) if measure else None
+        if pttl_ms == -2:
+            # Ключ истёк между SCAN и PTTL.
+            continue
+        stats = report.families.setdefault(classify_key(key), FamilyStats())
+        report.scanned += 1
+        stats.keys += 1
+        bucket = ttl_bucket(pttl_ms)
+        stats.ttls[bucket] = stats.ttls.get(bucket, 0) + 1
+        if size is None:
+            continue
+        stats.sampled += 1
+        stats.sampled_bytes += size
+        if len(stats.largest) < top:
+            heapq.heappush(stats.largest, (size, key))
+        elif top and size > stats.largest[0][0]:
+            heapq.heapreplace(stats.largest, (size, key))
+
+
+def _human_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def format_report(report: KeyspaceReport) -> str:
+    lines = [
+        f"Scanned {report.scanned} keys under '{cache._key_prefix()}:'"
+        + (" (truncated)" if report.truncated else "")
+        + f", ~{_human_bytes(report.estimated_bytes)}",
+        "",
+        f"{'family':<18} {'keys':>8} {'sampled':>8} {'avg':>10} {'total':>10}  ttl",
+    ]
+    ordered = sorted(
+        report.families.items(), key=lambda item: item[1].estimated_bytes, reverse=True
+    )
+    bucket_order = [NO_TTL] + [name for name, _ in TTL_BUCKETS]
+    for family, stats in ordered:
+        ttls = " ".join(
+            f"{name}:{stats.ttls[name]}" for name in bucket_order if name in stats.ttls
+        )
+        lines.append(
+            f"{family:<18} {stats.keys:>8} {stats.sampled:>8} "
+            f"{_human_bytes(stats.avg_bytes):>10} "
+            f"{_human_bytes(stats.estimated_bytes):>10}  {ttls}"
+        )
+    for family, stats in ordered:
+        if not stats.largest:
+            continue
+        lines.append("")
+        lines.append(f"Largest {family} keys:")
+        for size, key in sorted(stats.largest, reverse=True):
+            lines.append(f"  {_human_bytes(size):>10}  {key}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ruzbot.cache_inspect",
+        description="Отчёт по ключам ruzbot в Redis: память, TTL, крупнейшие ключи.",
+    )
+    parser.add_argument(
+        "--count", type=int, default=500, help="подсказка COUNT для одного SCAN"
+    )
+    parser.add_argument(
+        "--pause-ms", type=float, default=10, help="пауза между порциями SCAN"
+    )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        default=1.0,
+        help="доля ключей, для которых запрашивается MEMORY USAGE (0..1)",
+    )
+    parser.add_argument(
+        "--max-keys", type=int, default=None, help="остановиться после N ключей"
+    )
+    parser.add_argument(
+        "--top", type=int, default=5, help="сколько крупнейших ключей показать"
+    )
+    args = parser.parse_args(argv)
+
+    if not settings.redis_url:
+        print("Задайте REDIS_URL.", file=sys.stderr)
+        return 1
+
+    async def run() -> Optional[KeyspaceReport]:
+        client = await cache.get_redis_client()
+        if client is None:
+            return None
+        return await inspect_keyspace(
+            client,
+            count=args.count,
+            pause_s=args.pause_ms / 1000,
+            sample_ratio=args.sample,
+            max_keys=args.max_keys,
+            top=args.top,
+        )
+
+    report = asyncio.run(run())
+    if report is None:
+        print("Redis недоступен.", file=sys.stderr)
+        return 1
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
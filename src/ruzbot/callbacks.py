@@ -2,10 +2,9 @@ import logging
 import re
 
 from telebot.async_telebot import AsyncTeleBot
-from telebot.util import quick_markup
 
 from ruzbot import cache
-from ruzbot import commands, search_handlers
+from ruzbot import commands, group_catalog, resilience, search_handlers
 from ruzbot.utils import getRandomGroup, ruz_client
 from ruzclient.errors import RuzHttpError
 
@@ -45,8 +44,7 @@ async def textCallbackHandler(callback, bot: AsyncTeleBot):
         case (0,) | (1,):
             group_name = callback.text
             logger.debug(f"Group selection text detected: {group_name}")
-            async with ruz_client() as client:
-                groups_list = await client.groups.search_groups_by_name(group_name)
+            groups_list = await group_catalog.search_groups(group_name)
             if not groups_list:
                 logger.warning(f"No groups found for '{group_name}'")
                 await bot.reply_to(
@@ -55,16 +53,8 @@ async def textCallbackHandler(callback, bot: AsyncTeleBot):
                 )
                 return
 
-            markup = quick_markup(
-                {
-                    g["name"]: {"callback_data": f"setGroup {g['oid']} {g['name']}"}
-                    for g in groups_list
-                },
-                row_width=1,
-            )
-
             logger.debug(f"Replying with {len(groups_list)} group options")
-            await bot.reply_to(callback, "Выбери группу", reply_markup=markup)
+            await commands.sendGroupChoices(bot, callback, group_name, groups_list)
 
         case (2,):
             sub_group_number = int(callback.text)
@@ -77,7 +67,9 @@ async def textCallbackHandler(callback, bot: AsyncTeleBot):
             uid = callback.from_user.id
             async with ruz_client() as client:
                 try:
-                    u = await client.users.get_by_id(uid)
+                    u = await resilience.call(
+                        "profile", lambda: client.users.get_by_id(uid)
+                    )
                 except RuzHttpError as e:
                     if e.status_code == 404:
                         u = None
@@ -100,6 +92,13 @@ async def textCallbackHandler(callback, bot: AsyncTeleBot):
             logger.warning(f"Wrong case in textCallbackHandler: {callback.text!r}")
 
 
+async def purgeCommandHandler(message, bot: AsyncTeleBot):
+    _, _, group_arg = (message.text or "").partition(" ")
+    await commands.purgeGroupCommand(
+        bot, message, group_arg.strip() or None, user_id=message.from_user.id
+    )
+
+
 async def buttonsCallback(callback, bot: AsyncTeleBot):
     logger.info(
         f"buttonsCallback invoked: user_id={callback.from_user.id}, data={callback.data!r}"
@@ -154,6 +153,19 @@ async def buttonsCallback(callback, bot: AsyncTeleBot):
             if saved:
                 await commands.setSubGroupCommand(bot, callback.message, user_id=uid)
 
+        case ["groupPage", page_s, query]:
+            try:
+                page = int(page_s)
+            except ValueError:
+                logger.error(f"Invalid groupPage: {callback.data!r}")
+                return
+            groups_list = await group_catalog.search_groups(query)
+            await bot.answer_callback_query(callback.id)
+            if groups_list:
+                await commands.sendGroupChoices(
+                    bot, callback.message, query, groups_list, page=page, edit=True
+                )
+
         case ["searchTeacher"]:
             # await search_handlers.search_teacher_list_command(bot, callback.message, 0, user_id=uid)
             await commands.search_menu_stub_command(
@@ -366,8 +378,19 @@ async def buttonsCallback(callback, bot: AsyncTeleBot):
 
 def register_handlers(bot: AsyncTeleBot):
     logger.info("Registering handlers with the bot")
-    bot.register_message_handler(textCallbackHandler, pass_bot=True)
+    # До textCallbackHandler: тот принимает любой текст.
+    # Каждый обработчик укладывает все свои запросы в backend в HANDLER_DEADLINE_S.
+    bot.register_message_handler(
+        resilience.handler_scope(purgeCommandHandler),
+        commands=["purge"],
+        pass_bot=True,
+    )
+    bot.register_message_handler(
+        resilience.handler_scope(textCallbackHandler), pass_bot=True
+    )
     bot.register_callback_query_handler(
-        callback=buttonsCallback, func=callbackFilter, pass_bot=True
+        callback=resilience.handler_scope(buttonsCallback),
+        func=callbackFilter,
+        pass_bot=True,
     )
     logger.info("Handlers registered successfully")
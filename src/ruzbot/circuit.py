@@ -0,0 +1,72 @@
+"""Автомат «circuit breaker» для внешних зависимостей (Redis, backend API)."""
+
+from __future__ import annotations
+
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    ``closed``: запросы идут как обычно, ошибки подряд считаются.
+    ``open``: после ``failure_threshold`` ошибок подряд зависимость пропускается
+    на ``cooldown_s`` секунд.
+    ``half_open``: по истечении паузы ровно одна проба (:meth:`try_begin_probe`)
+    решает, закрыть автомат или открыть его на следующую паузу.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_s: float) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.cooldown_s:
+            return HALF_OPEN
+        return OPEN
+
+    def allows_requests(self) -> bool:
+        return self._opened_at is None
+
+    def try_begin_probe(self) -> bool:
+        """Разрешает одну пробу после паузы; остальные вызовы получают ``False``."""
+        if self.state != HALF_OPEN or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def abandon_probe(self) -> None:
+        """
+        Проба не дала ответа о зависимости (её оборвал вызывающий): автомат
+        остаётся открытым, следующий вызов может пробовать сразу.
+        """
+        self._probing = False
+
+    def record_failure(self) -> bool:
+        """Учитывает ошибку; ``True``, если автомат только что открылся."""
+        self.failures += 1
+        if self._probing:
+            self._probing = False
+            self._opened_at = time.monotonic()
+            return False
+        if self._opened_at is None and self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def reset(self) -> None:
+        self.record_success()
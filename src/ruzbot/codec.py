@@ -0,0 +1,105 @@
+"""
+Формат значений кэша: ``<байт формата><тело>``. Байт задаёт кодек (JSON или
+msgpack) и флаг zlib-сжатия, поэтому старые и новые payload читаются
+одновременно во время выкладки. Модуль без зависимостей бота — его можно
+импортировать отдельно (например, из ``benchmarks/codec_bench.py``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - falls back to JSON payloads
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Флаг в байте формата: тело после него сжато zlib.
+COMPRESSED_FLAG = 0x10
+_COMPRESS_LEVEL = 3
+
+
+def json_loads(value: str | bytes | None) -> Any:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        logger.warning("Failed to decode Redis JSON payload")
+        return None
+
+
+def json_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@dataclass(frozen=True, slots=True)
+class PayloadCodec:
+    """Сериализатор значений кэша; ``tag`` — байт формата в начале payload."""
+
+    name: str
+    tag: int
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+
+
+CODECS: dict[str, PayloadCodec] = {
+    "json": PayloadCodec(
+        name="json",
+        tag=0x01,
+        dumps=lambda value: json_dumps(value).encode("utf-8"),
+        loads=json.loads,
+    ),
+}
+if msgpack is not None:
+    CODECS["msgpack"] = PayloadCodec(
+        name="msgpack",
+        tag=0x02,
+        dumps=lambda value: msgpack.packb(value, use_bin_type=True),
+        loads=lambda body: msgpack.unpackb(body, raw=False),
+    )
+_CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values()}
+
+
+def codec_named(name: str) -> PayloadCodec:
+    # msgpack не установлен или имя опечатано — пишем JSON, читать умеем оба.
+    return CODECS.get(name) or CODECS["json"]
+
+
+def encode(value: Any, codec: PayloadCodec, compress_min_bytes: int) -> bytes:
+    """Тело сжимается, если оно не короче ``compress_min_bytes`` (``-1`` — никогда)."""
+    body = codec.dumps(value)
+    tag = codec.tag
+    if compress_min_bytes >= 0 and len(body) >= compress_min_bytes:
+        compressed = zlib.compress(body, _COMPRESS_LEVEL)
+        if len(compressed) < len(body):
+            body = compressed
+            tag |= COMPRESSED_FLAG
+    return bytes((tag,)) + body
+
+
+def decode(raw: str | bytes | None) -> Any:
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        return json_loads(raw)
+
+    tag = raw[0]
+    codec = _CODECS_BY_TAG.get(tag & ~COMPRESSED_FLAG)
+    if codec is None:
+        # Первый байт — не наш тег: значение записано старой версией как JSON-текст.
+        return json_loads(raw)
+    try:
+        body = raw[1:]
+        if tag & COMPRESSED_FLAG:
+            body = zlib.decompress(body)
+        return codec.loads(body)
+    except Exception:
+        logger.warning("Failed to decode Redis %s payload", codec.name)
+        return None
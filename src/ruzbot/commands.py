@@ -1,12 +1,15 @@
+import asyncio
 import logging
+import math
 from collections import defaultdict
 from datetime import datetime, timedelta
 
 from telebot import types
 from telebot.util import quick_markup
 
-from ruzbot import cache, markups
+from ruzbot import cache, group_catalog, markups, resilience, week_batcher
 from ruzbot.bot import __version__ as BOT_VERSION
+from ruzbot.settings import settings
 from ruzbot.utils import ruz_client, remove_position
 from ruzclient import UserCreate, UserScheduleLesson, UserUpdate
 from ruzclient.errors import RuzHttpError
@@ -176,17 +179,12 @@ def _format_week_message(anchor: datetime, lessons: list[UserScheduleLesson]) ->
     return _escape_like_prototype("\n".join(lines))
 
 
-def _lessons_for_date(
-    lessons: list[UserScheduleLesson], target_date: datetime
-) -> list[UserScheduleLesson]:
-    target_iso = target_date.strftime("%Y-%m-%d")
-    return [lesson for lesson in lessons if lesson["date"] == target_iso]
-
-
 async def _fetch_user(client, user_id: int):
     async def loader():
         try:
-            return await client.users.get_by_id(user_id)
+            return await resilience.call(
+                "profile", lambda: client.users.get_by_id(user_id)
+            )
         except RuzHttpError as e:
             if e.status_code == 404:
                 return None
@@ -196,14 +194,19 @@ async def _fetch_user(client, user_id: int):
 
 
 async def _fetch_group(client, group_oid: int):
-    try:
-        return await client.groups.get_group(group_oid)
-    except RuzHttpError as e:
-        if e.status_code == 404:
+    async def loader():
+        try:
+            return await resilience.call(
+                "group", lambda: client.groups.get_group(group_oid)
+            )
+        except RuzHttpError as e:
+            if e.status_code == 404:
+                return None
+            raise
+        except ValueError:
             return None
-        raise
-    except ValueError:
-        return None
+
+    return await cache.get_or_load_group(group_oid, loader)
 
 
 def _normalize_optional_str(value: str | None) -> str | None:
@@ -241,39 +244,111 @@ def _filter_lessons_for_subgroup(
     return filtered_lessons
 
 
-async def get_user_week_lessons(client, user_id: int, anchor_date):
-    user = await _fetch_user(client, user_id)
-    if user is None:
-        return None, None
-
+def _user_group(user) -> tuple[int, int] | None:
+    """(group_oid, подгруппа) из профиля или ``None``, если регистрация не завершена."""
     group_oid = user.get("group_oid")
     subgroup_raw = user.get("subgroup")
     if not group_oid or subgroup_raw is None:
-        return user, None
+        return None
     try:
         subgroup = int(subgroup_raw)
     except (TypeError, ValueError):
         subgroup = 0
+    return group_oid, subgroup
+
+
+def _render_variant(user_id: int) -> str:
+    return "criminal" if is_dangerous_criminal(user_id) else "default"
 
-    lessons = await cache.get_or_load_group_week_lessons(
+
+async def _load_group_week_detached(group_oid: int, anchor):
+    """Неделя группы без клиента обработчика — для фонового обновления кэша."""
+    async with ruz_client() as client:
+        return await week_batcher.fetch_group_week(client, group_oid, anchor)
+
+
+def _prefetch_adjacent_weeks(group_oid: int, generation: int, around) -> None:
+    """Соседние недели — следующее, что обычно открывают после недели или дня."""
+    cache.prefetch_group_weeks(
+        group_oid,
+        [around - timedelta(weeks=1), around + timedelta(weeks=1)],
+        lambda anchor: _load_group_week_detached(group_oid, anchor),
+        generation=generation,
+    )
+
+
+async def _warm_group_weeks(group_oid: int) -> None:
+    """Текущая и следующая неделя новой группы, пока пользователь выбирает подгруппу."""
+    today = datetime.today().date()
+    cache.prefetch_group_weeks(
         group_oid,
-        anchor_date,
-        lambda group_anchor: client.schedule.get_group_week(group_oid, group_anchor),
+        [today, today + timedelta(weeks=1)],
+        lambda anchor: _load_group_week_detached(group_oid, anchor),
+        generation=await cache.group_generation(group_oid),
     )
-    if lessons is None:
-        return user, []
 
-    filtered_lessons = _filter_lessons_for_subgroup(lessons, subgroup)
 
-    async def user_week_loader(_anchor):
-        return filtered_lessons
+def _lessons_by_day(lessons: list[UserScheduleLesson]) -> dict[str, list]:
+    by_day: dict[str, list[UserScheduleLesson]] = defaultdict(list)
+    for lesson in lessons:
+        by_day[lesson["date"]].append(lesson)
+    return dict(by_day)
 
-    cached_lessons = await cache.get_or_load_week_lessons(
-        user_id,
-        anchor_date,
-        user_week_loader,
+
+def _week_lessons(view: dict[str, list]) -> list[UserScheduleLesson]:
+    return [lesson for day in sorted(view) for lesson in view[day]]
+
+
+async def _subgroup_week_view(
+    client, group_oid: int, subgroup: int, anchor_date, generation: int
+) -> tuple[dict[str, list], int | None]:
+    """
+    Неделя подгруппы по дням и версия недели группы, из которой она построена.
+    Фильтрация по подгруппе идёт один раз на загрузку недели группы, а не на
+    каждый запрос: результат общий для всех её студентов.
+    """
+
+    async def loader(anchor):
+        lessons = await cache.get_or_load_group_week_lessons(
+            group_oid,
+            anchor,
+            # Промахи разных групп в одном окне уходят в backend одной пачкой.
+            lambda group_anchor: week_batcher.fetch_group_week(
+                client, group_oid, group_anchor
+            ),
+            refresh_loader=lambda group_anchor: _load_group_week_detached(
+                group_oid, group_anchor
+            ),
+            generation=generation,
+        )
+        if lessons is None:
+            return None
+        days = _lessons_by_day(_filter_lessons_for_subgroup(lessons, subgroup))
+        return days, cache.payload_version(lessons)
+
+    loaded = await cache.get_or_load_subgroup_week(
+        group_oid, subgroup, anchor_date, loader, generation=generation
     )
-    return user, cached_lessons
+    return loaded if loaded is not None else ({}, None)
+
+
+async def get_user_week_lessons(client, user_id: int, anchor_date):
+    """``(пользователь, пары недели, зависимости snapshot-экрана из этих пар)``."""
+    async with cache.batch():
+        user = await _fetch_user(client, user_id)
+        if user is None:
+            return None, None, []
+
+        group = _user_group(user)
+        if group is None:
+            return user, None, []
+        group_oid, subgroup = group
+        generation = await cache.group_generation(group_oid)
+        view, version = await _subgroup_week_view(
+            client, group_oid, subgroup, anchor_date, generation
+        )
+        deps = cache.group_week_deps(group_oid, generation, anchor_date, version)
+        return user, _week_lessons(view), deps
 
 
 def _normalize_parse_day_delta(date_arg) -> int:
@@ -308,56 +383,72 @@ async def dateCommand(bot, message, date_arg, *, user_id: int):
         f"dateCommand called: user={user_id}, date_arg={date_arg!r} -> delta_days={delta_days}"
     )
 
-    async with ruz_client() as client:
-        target_date = datetime.today() + timedelta(days=delta_days)
-        _, week_lessons = await get_user_week_lessons(
-            client, user_id, target_date.date()
-        )
-
-    if week_lessons is None:
-        await backCommand(bot, message, user_id=user_id)
-        return
-
-    async def day_loader(_day_date):
-        return _lessons_for_date(week_lessons, target_date)
-
-    day_lessons = await cache.get_or_load_day_lessons(
-        user_id,
-        target_date.date(),
-        day_loader,
-    )
-
-    if is_dangerous_criminal(user_id):
-        reply_message = criminal_format_day_message(day_lessons, target_date)
-    else:
-        reply_message = _format_day_message(day_lessons, target_date)
+    target_date = datetime.today() + timedelta(days=delta_days)
+    # Записи (рендер, snapshot) уходят одним pipeline при выходе из batch.
+    async with cache.batch():
+        async with ruz_client() as client:
+            user = await _fetch_user(client, user_id)
+            group = _user_group(user) if user is not None else None
+            rendered = None
+            if group is not None:
+                generation = await cache.group_generation(group[0])
+
+                async def render_day():
+                    view, version = await _subgroup_week_view(
+                        client, *group, target_date.date(), generation
+                    )
+                    day_lessons = view.get(target_date.strftime("%Y-%m-%d"), [])
+                    if is_dangerous_criminal(user_id):
+                        text = criminal_format_day_message(day_lessons, target_date)
+                    else:
+                        text = _format_day_message(day_lessons, target_date)
+                    return text.replace("преподавател", "преподаватель"), version
+
+                # Один рендер на всю подгруппу: остальные берут готовый текст.
+                rendered = await cache.get_or_render(
+                    *group,
+                    "day",
+                    target_date,
+                    render_day,
+                    variant=_render_variant(user_id),
+                    generation=generation,
+                )
 
-    reply_message = reply_message.replace("преподавател", "преподаватель")
+        if rendered is None:
+            await backCommand(bot, message, user_id=user_id)
+            return
+        reply_message, week_version = rendered
 
-    markup = quick_markup(
-        {
-            "Пред. день": {"callback_data": f"parseDay {delta_days - 1}"},
-            "Назад": {"callback_data": "start"},
-            "След. день": {"callback_data": f"parseDay {delta_days + 1}"},
-        },
-        row_width=3,
-    )
+        markup = quick_markup(
+            {
+                "Пред. день": {"callback_data": f"parseDay {delta_days - 1}"},
+                "Назад": {"callback_data": "start"},
+                "След. день": {"callback_data": f"parseDay {delta_days + 1}"},
+            },
+            row_width=3,
+        )
 
-    await bot.edit_message_text(
-        text=reply_message,
-        chat_id=message.chat.id,
-        message_id=message.message_id,
-        reply_markup=markup,
-        parse_mode="MarkdownV2",
-    )
-    await cache.store_screen_snapshot(
-        user_id,
-        cache.normalize_screen_key(f"parseDay {delta_days}"),
-        text=reply_message,
-        reply_markup=markup,
-        parse_mode="MarkdownV2",
-        source=f"parseDay {delta_days}",
-    )
+        await bot.edit_message_text(
+            text=reply_message,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            reply_markup=markup,
+            parse_mode="MarkdownV2",
+        )
+        await cache.store_screen_snapshot(
+            user_id,
+            cache.normalize_screen_key(f"parseDay {delta_days}"),
+            text=reply_message,
+            reply_markup=markup,
+            parse_mode="MarkdownV2",
+            source=f"parseDay {delta_days}",
+            deps=[
+                cache.relative_date_dep("day", delta_days, target_date),
+                *cache.group_week_deps(group[0], generation, target_date, week_version),
+            ],
+        )
+    await cache.touch_active_group(group[0])
+    _prefetch_adjacent_weeks(group[0], generation, target_date.date())
     logger.info(f"dateCommand completed: user={user_id}")
 
 
@@ -367,72 +458,143 @@ async def weekCommand(bot, message, _timedelta, *, user_id: int):
     """
     logger.info(f"weekCommand called: user={user_id}, _timedelta={_timedelta!r}")
 
-    async with ruz_client() as client:
-        try:
-            delta_weeks = int(_timedelta)
-        except (TypeError, ValueError):
-            delta_weeks = 0
-            logger.error(f"Invalid _timedelta '{_timedelta}', defaulting to 0")
+    try:
+        delta_weeks = int(_timedelta)
+    except (TypeError, ValueError):
+        delta_weeks = 0
+        logger.error(f"Invalid _timedelta '{_timedelta}', defaulting to 0")
+
+    base = datetime.today() + timedelta(weeks=delta_weeks)
+    async with cache.batch():
+        async with ruz_client() as client:
+            user = await _fetch_user(client, user_id)
+            group = _user_group(user) if user is not None else None
+            rendered = None
+            if group is not None:
+                generation = await cache.group_generation(group[0])
+
+                async def render_week():
+                    view, version = await _subgroup_week_view(
+                        client, *group, base.date(), generation
+                    )
+                    lessons = _week_lessons(view)
+                    if is_dangerous_criminal(user_id):
+                        return criminal_format_week_message(base, lessons), version
+                    return _format_week_message(base, lessons), version
+
+                rendered = await cache.get_or_render(
+                    *group,
+                    "week",
+                    base,
+                    render_week,
+                    variant=_render_variant(user_id),
+                    generation=generation,
+                )
+            last_update = datetime.now().strftime("%d.%m %H:%M:%S")
 
-        base = datetime.today() + timedelta(weeks=delta_weeks)
-        _, lessons = await get_user_week_lessons(client, user_id, base.date())
-        last_update = datetime.now().strftime("%d.%m %H:%M:%S")
+        if rendered is None:
+            await backCommand(bot, message, user_id=user_id)
+            return
+        temp_message, week_version = rendered
 
-    if lessons is None:
-        await backCommand(bot, message, user_id=user_id)
-        return
+        reply_message = (
+            temp_message
+            + "\n\n"
+            + _escape_like_prototype(f"Последнее обновление: {last_update}")
+        )
+        reply_message = reply_message.replace("преподавател", "преподаватель")
+
+        prev_week = delta_weeks - 1
+        next_week = delta_weeks + 1
+        markup = types.InlineKeyboardMarkup()
+        markup.row(
+            types.InlineKeyboardButton(
+                "Пред. нед.", callback_data=f"parseWeek {prev_week}"
+            ),
+            types.InlineKeyboardButton("Назад", callback_data="start"),
+            types.InlineKeyboardButton(
+                "След. нед.", callback_data=f"parseWeek {next_week}"
+            ),
+        )
+        markup.row(
+            types.InlineKeyboardButton(
+                "👤 На неделе",
+                callback_data=f"weekTeachersList {delta_weeks} 0",
+            ),
+            types.InlineKeyboardButton(
+                "📚 На неделе",
+                callback_data=f"weekSubjectsList {delta_weeks} 0",
+            ),
+        )
 
-    if is_dangerous_criminal(user_id):
-        temp_message = criminal_format_week_message(base, lessons)
-    else:
-        temp_message = _format_week_message(base, lessons)
+        await bot.edit_message_text(
+            text=reply_message,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            reply_markup=markup,
+            parse_mode="MarkdownV2",
+        )
+        await cache.store_screen_snapshot(
+            user_id,
+            cache.normalize_screen_key(f"parseWeek {delta_weeks}"),
+            text=reply_message,
+            reply_markup=markup,
+            parse_mode="MarkdownV2",
+            source=f"parseWeek {delta_weeks}",
+            deps=[
+                cache.relative_date_dep("week", delta_weeks, base),
+                *cache.group_week_deps(group[0], generation, base, week_version),
+            ],
+        )
+    await cache.touch_active_group(group[0])
+    _prefetch_adjacent_weeks(group[0], generation, base.date())
+    logger.info(f"weekCommand completed: user={user_id}")
 
-    reply_message = (
-        temp_message
-        + "\n\n"
-        + _escape_like_prototype(f"Последнее обновление: {last_update}")
-    )
-    reply_message = reply_message.replace("преподавател", "преподаватель")
 
-    prev_week = delta_weeks - 1
-    next_week = delta_weeks + 1
+_GROUP_PAGE_SIZE = 8
+
+
+async def sendGroupChoices(
+    bot, message, query: str, groups: list, *, page: int = 0, edit: bool = False
+):
+    """
+    Кнопки выбора группы по ``_GROUP_PAGE_SIZE`` на страницу. ``edit`` — листание
+    (``groupPage``): редактируем сообщение, а не отвечаем новым.
+    """
+    pages = max(1, math.ceil(len(groups) / _GROUP_PAGE_SIZE))
+    page = page % pages
+    start = page * _GROUP_PAGE_SIZE
+
     markup = types.InlineKeyboardMarkup()
-    markup.row(
-        types.InlineKeyboardButton(
-            "Пред. нед.", callback_data=f"parseWeek {prev_week}"
-        ),
-        types.InlineKeyboardButton("Назад", callback_data="start"),
-        types.InlineKeyboardButton(
-            "След. нед.", callback_data=f"parseWeek {next_week}"
-        ),
-    )
-    markup.row(
-        types.InlineKeyboardButton(
-            "👤 На неделе",
-            callback_data=f"weekTeachersList {delta_weeks} 0",
-        ),
-        types.InlineKeyboardButton(
-            "📚 На неделе",
-            callback_data=f"weekSubjectsList {delta_weeks} 0",
-        ),
-    )
+    for g in groups[start : start + _GROUP_PAGE_SIZE]:
+        markup.row(
+            types.InlineKeyboardButton(
+                g["name"], callback_data=f"setGroup {g['oid']} {g['name']}"
+            )
+        )
+    text = "Выбери группу"
+    # callback_data в Telegram не длиннее 64 байт — длинный запрос не листаем.
+    key = group_catalog.normalize_group_name(query)
+    if pages > 1 and len(f"groupPage {pages} {key}".encode()) <= 64:
+        text = f"Выбери группу (стр. {page + 1} из {pages})"
+        markup.row(
+            types.InlineKeyboardButton(
+                "⬅️ Пред. стр.", callback_data=f"groupPage {(page - 1) % pages} {key}"
+            ),
+            types.InlineKeyboardButton(
+                "➡️ След. стр.", callback_data=f"groupPage {(page + 1) % pages} {key}"
+            ),
+        )
 
-    await bot.edit_message_text(
-        text=reply_message,
-        chat_id=message.chat.id,
-        message_id=message.message_id,
-        reply_markup=markup,
-        parse_mode="MarkdownV2",
-    )
-    await cache.store_screen_snapshot(
-        user_id,
-        cache.normalize_screen_key(f"parseWeek {delta_weeks}"),
-        text=reply_message,
-        reply_markup=markup,
-        parse_mode="MarkdownV2",
-        source=f"parseWeek {delta_weeks}",
-    )
-    logger.info(f"weekCommand completed: user={user_id}")
+    if edit:
+        await bot.edit_message_text(
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            text=text,
+            reply_markup=markup,
+        )
+    else:
+        await bot.reply_to(message, text, reply_markup=markup)
 
 
 async def setGroupCommand(bot, message, *, user_id: int):
@@ -501,6 +663,7 @@ async def sendProfileCommand(bot, message, *, user_id: int):
         reply_markup=markup,
         parse_mode="MarkdownV2",
         source="showProfile",
+        deps=await cache.profile_deps(user_id),
     )
     logger.info(f"sendProfileCommand completed: user={user_id}")
 
@@ -522,7 +685,14 @@ async def setGroup(bot, callback, group_oid: int, group_label: str) -> bool:
     uname = callback.from_user.username or str(user_id)
 
     async with ruz_client() as client:
-        server_group = await _fetch_group(client, group_oid)
+        # Группа и пользователь независимы: ждём самый медленный запрос, а не оба подряд.
+        server_group, existing = await asyncio.gather(
+            _fetch_group(client, group_oid),
+            _fetch_user(client, user_id),
+            return_exceptions=True,
+        )
+        if isinstance(server_group, BaseException):
+            raise server_group
         group_guid = _normalize_optional_str(
             server_group.get("guid") if server_group else None
         )
@@ -531,7 +701,8 @@ async def setGroup(bot, callback, group_oid: int, group_label: str) -> bool:
         )
 
         if server_group is None:
-            hits = await client.groups.search_groups_by_name(group_label)
+            # Из каталога групп в памяти; backend — только пока каталог не загружен.
+            hits = await group_catalog.search_groups(group_label)
             hit = _group_hit_for_oid(hits, group_oid)
             if hit is None and hits:
                 logger.warning(
@@ -571,7 +742,8 @@ async def setGroup(bot, callback, group_oid: int, group_label: str) -> bool:
                 )
                 return False
 
-        existing = await _fetch_user(client, user_id)
+        if isinstance(existing, BaseException):
+            raise existing
 
         if existing is None:
             await client.users.create_user(
@@ -588,6 +760,8 @@ async def setGroup(bot, callback, group_oid: int, group_label: str) -> bool:
                 f"User {user_id} created with group_oid={group_oid}, subgroup=null"
             )
             await cache.invalidate_user(user_id)
+            await cache.touch_active_group(group_oid)
+            await _warm_group_weeks(group_oid)
             return True
 
         await client.users.update_user(
@@ -600,6 +774,8 @@ async def setGroup(bot, callback, group_oid: int, group_label: str) -> bool:
         )
         await cache.invalidate_user(user_id)
         logger.info(f"User {user_id} updated group_oid={group_oid}")
+        await cache.touch_active_group(group_oid)
+        await _warm_group_weeks(group_oid)
         return True
 
 
@@ -609,6 +785,41 @@ async def updateUserSubGroup(user_id: int, sub_group: int) -> None:
     await cache.invalidate_user(user_id)
 
 
+async def purgeGroupCommand(bot, message, group_arg, *, user_id: int) -> None:
+    """/purge <group_oid>: новое поколение расписания группы (только ``ADMIN_IDS``)."""
+    logger.info(f"purgeGroupCommand called: user={user_id}, group_arg={group_arg!r}")
+    if user_id not in settings.admin_ids:
+        logger.warning(f"purgeGroupCommand denied for user={user_id}")
+        return
+
+    try:
+        group_oid = int(group_arg)
+    except (TypeError, ValueError):
+        await bot.reply_to(message, "Использование: /purge <oid группы>")
+        return
+
+    generation = await cache.bump_group_generation(group_oid)
+    if generation is None:
+        await bot.reply_to(message, "Redis недоступен — кэш группы не сброшен.")
+        return
+    await bot.reply_to(
+        message,
+        f"Кэш расписания группы {group_oid} сброшен (поколение {generation}).",
+    )
+
+
+async def purge_group_hook(group_arg: str) -> tuple[int, str]:
+    """``POST /purge/group/<oid>`` на сервере метрик — то же, что ``/purge``."""
+    try:
+        group_oid = int(group_arg.strip("/"))
+    except ValueError:
+        return 400, "expected /purge/group/<oid>\n"
+    generation = await cache.bump_group_generation(group_oid)
+    if generation is None:
+        return 503, "redis unavailable\n"
+    return 200, f"group {group_oid} generation {generation}\n"
+
+
 async def search_menu_stub_command(
     bot, message, *, user_id: int, screen_name: str = "searchStub"
 ) -> None:
@@ -0,0 +1,171 @@
+"""
+Каталог всех групп в памяти процесса: поиск группы по имени из
+``textCallbackHandler`` отвечается локально, а backend
+(``search_groups_by_name``) нужен, только пока каталог ещё не загружен.
+
+Имена нормализуются (:func:`normalize_group_name`): регистр, дефисы и
+пробелы не важны, латинские буквы-двойники считаются кириллическими.
+Поиск по префиксу — двоичный поиск в отсортированном списке ключей.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ruzbot import resilience
+from ruzbot.settings import settings
+from ruzbot.utils import ruz_client
+
+logger = logging.getLogger(__name__)
+
+# Латиница, которую путают с кириллицей в именах групп (после casefold).
+_LOOKALIKES = str.maketrans(
+    {
+        "a": "а",
+        "b": "в",
+        "c": "с",
+        "e": "е",
+        "h": "н",
+        "k": "к",
+        "m": "м",
+        "o": "о",
+        "p": "р",
+        "t": "т",
+        "x": "х",
+        "y": "у",
+        "ё": "е",
+        "-": None,
+        "–": None,
+        "_": None,
+        ".": None,
+        " ": None,
+    }
+)
+
+
+def normalize_group_name(name: str) -> str:
+    """``"мс-221"``, ``"MC 221"`` и ``"МС221"`` дают один ключ."""
+    return (name or "").casefold().translate(_LOOKALIKES)
+
+
+@dataclass(slots=True)
+class GroupCatalog:
+    # Отсортированы по ключу; ``keys[i]`` — ключ ``groups[i]``.
+    keys: list[str]
+    groups: list[dict[str, Any]]
+    loaded_at: float
+
+    @classmethod
+    def build(cls, groups: list[dict[str, Any]]) -> "GroupCatalog":
+        entries = sorted(
+            (
+                (normalize_group_name(group["name"]), group)
+                for group in groups
+                if group.get("name") and group.get("oid") is not None
+            ),
+            key=lambda entry: (entry[0], entry[1]["name"]),
+        )
+        return cls(
+            keys=[key for key, _ in entries],
+            groups=[group for _, group in entries],
+            loaded_at=time.monotonic(),
+        )
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def search(self, query: str) -> list[dict[str, Any]]:
+        """Группы, чьё нормализованное имя начинается с запроса; точное совпадение первым."""
+        prefix = normalize_group_name(query)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        # Любой ключ с этим префиксом меньше, чем префикс + максимальный символ.
+        end = bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+        return self.groups[start:end]
+
+
+_catalog: Optional[GroupCatalog] = None
+_refresh_task: Optional[asyncio.Task] = None
+# Когда (monotonic) последняя загрузка каталога завершилась ошибкой.
+_failed_at: Optional[float] = None
+
+
+def current() -> Optional[GroupCatalog]:
+    return _catalog
+
+
+async def refresh() -> GroupCatalog:
+    """Загружает все группы заново и атомарно подменяет каталог."""
+    global _catalog
+    resilience.detach()
+    async with ruz_client() as client:
+        groups = await resilience.call("group_catalog", client.groups.list_groups)
+    catalog = GroupCatalog.build(list(groups or []))
+    _catalog = catalog
+    logger.info("Group catalog loaded: %s groups", len(catalog))
+    return catalog
+
+
+def _forget_refresh(task: asyncio.Task) -> None:
+    global _refresh_task, _failed_at
+    if _refresh_task is task:
+        _refresh_task = None
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        _failed_at = time.monotonic()
+        logger.warning("Group catalog refresh failed: %s", task.exception())
+    else:
+        _failed_at = None
+
+
+def _schedule_refresh() -> None:
+    """
+    Фоновая загрузка каталога. После неудачи следующая — не раньше чем через
+    ``GROUP_CATALOG_RETRY_S``, и не пока автомат backend открыт: полный список
+    групп — самый тяжёлый запрос, его не стоит повторять на каждый поиск.
+    """
+    global _refresh_task
+    if _refresh_task is not None or not resilience.backend_available():
+        return
+    if (
+        _failed_at is not None
+        and time.monotonic() - _failed_at < settings.group_catalog_retry_s
+    ):
+        return
+    _refresh_task = asyncio.ensure_future(refresh())
+    _refresh_task.add_done_callback(_forget_refresh)
+
+
+async def search_groups(name: str) -> list[dict[str, Any]]:
+    """
+    Группы по имени из каталога. Устаревший каталог отвечает сразу и
+    перезагружается в фоне; пока каталога нет — запрос в backend.
+    """
+    catalog = _catalog
+    if catalog is None:
+        _schedule_refresh()
+        async with ruz_client() as client:
+            groups = await resilience.call(
+                "group_search", lambda: client.groups.search_groups_by_name(name)
+            )
+            return list(groups or [])
+    if time.monotonic() - catalog.loaded_at >= settings.group_catalog_refresh_s:
+        _schedule_refresh()
+    return catalog.search(name)
+
+
+async def run_refresh_loop() -> None:
+    """Держит каталог свежим: загрузка при старте и каждые ``GROUP_CATALOG_REFRESH_S``."""
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.exception("Group catalog refresh failed")
+        await asyncio.sleep(settings.group_catalog_refresh_s)
@@ -37,8 +37,18 @@ def main() -> None:
         sys.exit(1)
 
     # Импорт после проверки токена: иначе AsyncTeleBot падает на пустом токене.
+    from ruzbot import commands, group_catalog, metrics, warmer
     from ruzbot.bot import bot
     from ruzbot.callbacks import register_handlers
+    from ruzbot.utils import close_ruz_client, start_ruz_client
+
+    if settings.warmer_at:
+        # Иначе ошибка всплыла бы только в фоновой задаче, и прогрев тихо не шёл бы.
+        try:
+            warmer.parse_at(settings.warmer_at)
+        except ValueError as ex:
+            print("Неверный WARMER_AT: %s" % ex, file=sys.stderr)
+            sys.exit(1)
 
     logging.basicConfig(
         level=logging.INFO,
@@ -47,7 +57,21 @@ def main() -> None:
 
     async def _run() -> None:
         register_handlers(bot)
-        await bot.infinity_polling()
+        await start_ruz_client()
+        # Ссылки на фоновые задачи держатся до конца polling, иначе их соберёт GC.
+        background: list[asyncio.Task] = []
+        if settings.metrics_enabled:
+            metrics.add_post_hook("/purge/group/", commands.purge_group_hook)
+            await metrics.start_http_server(settings.metrics_host, settings.port)
+        background.append(asyncio.create_task(group_catalog.run_refresh_loop()))
+        if settings.warmer_at:
+            background.append(asyncio.create_task(warmer.run_daily(settings.warmer_at)))
+        try:
+            await bot.infinity_polling()
+        finally:
+            for task in background:
+                task.cancel()
+            await close_ruz_client()
 
     asyncio.run(_run())
 
@@ -0,0 +1,237 @@
+"""
+Счётчики и гистограммы задержек в памяти процесса и их выдача в текстовом
+формате Prometheus по HTTP (``GET /metrics`` на ``settings.port``).
+
+На том же сервере можно зарегистрировать служебные ``POST``-хуки
+(:func:`add_post_hook`); они принимают запросы только с loopback-адресов.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Awaitable, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = "ruzbot_cache_lookups_total"
+CACHE_READS = "ruzbot_cache_reads_total"
+CACHE_WRITES = "ruzbot_cache_writes_total"
+REDIS_SECONDS = "ruzbot_redis_seconds"
+REDIS_ERRORS = "ruzbot_redis_errors_total"
+LOADER_SECONDS = "ruzbot_loader_seconds"
+PREFETCHES = "ruzbot_prefetch_total"
+BACKEND_SECONDS = "ruzbot_backend_seconds"
+BACKEND_EVENTS = "ruzbot_backend_events_total"
+
+_HELP = {
+    CACHE_LOOKUPS: "get_or_load_* results by key family (hit, miss, negative, stale).",
+    CACHE_READS: "Cache reads by key family and source (local, batch, redis) and result.",
+    CACHE_WRITES: "Cache writes by key family.",
+    REDIS_SECONDS: "Redis round trip latency by operation.",
+    REDIS_ERRORS: "Failed Redis operations by operation.",
+    LOADER_SECONDS: "Backend loader latency on cache miss by key family.",
+    PREFETCHES: "Background prefetches by result (scheduled, cached, dropped, failed).",
+    BACKEND_SECONDS: "Successful backend read latency by endpoint.",
+    BACKEND_EVENTS: "Backend read retries, hedges and deadline hits by endpoint.",
+}
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+_Labels = tuple[tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+# Путь без префикса -> (HTTP-статус, текст ответа).
+PostHook = Callable[[str], Awaitable[tuple[int, str]]]
+
+# Сколько ждать строку запроса и заголовки, прежде чем закрыть соединение.
+_REQUEST_READ_TIMEOUT_S = 5.0
+
+_post_hooks: dict[str, PostHook] = {}
+_counters: dict[str, dict[_Labels, float]] = {}
+_histograms: dict[str, dict[_Labels, _Histogram]] = {}
+
+
+def _labels(labels: dict[str, object]) -> _Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, amount: float = 1.0, **labels: object) -> None:
+    series = _counters.setdefault(name, {})
+    key = _labels(labels)
+    series[key] = series.get(key, 0.0) + amount
+
+
+def observe(name: str, value: float, **labels: object) -> None:
+    series = _histograms.setdefault(name, {})
+    key = _labels(labels)
+    histogram = series.get(key)
+    if histogram is None:
+        histogram = series[key] = _Histogram(DEFAULT_BUCKETS)
+    histogram.observe(value)
+
+
+@contextmanager
+def timer(name: str, **labels: object) -> Iterator[None]:
+    """Записывает длительность блока в гистограмму ``name`` (и при исключении)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def counter_value(name: str, **labels: object) -> float:
+    return _counters.get(name, {}).get(_labels(labels), 0.0)
+
+
+def histogram_count(name: str, **labels: object) -> int:
+    histogram = _histograms.get(name, {}).get(_labels(labels))
+    return histogram.count if histogram is not None else 0
+
+
+def reset() -> None:
+    _counters.clear()
+    _histograms.clear()
+
+
+def _format_labels(labels: _Labels, extra: _Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def render_latest() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    lines: list[str] = []
+    for name in sorted(_counters):
+        lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(_counters[name].items()):
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for name in sorted(_histograms):
+        lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(_histograms[name].items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                le = (("le", f"{bound:g}"),)
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {count}")
+            inf = (("le", "+Inf"),)
+            lines.append(f"{name}_bucket{_format_labels(labels, inf)} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def add_post_hook(prefix: str, hook: PostHook) -> None:
+    """``POST <prefix><rest>`` вызывает ``hook(rest)``; только с loopback."""
+    _post_hooks[prefix] = hook
+
+
+def _is_loopback(writer: asyncio.StreamWriter) -> bool:
+    peer = writer.get_extra_info("peername")
+    if not peer:
+        return False
+    try:
+        return ipaddress.ip_address(peer[0]).is_loopback
+    except ValueError:
+        return False
+
+
+async def _dispatch(method: str, path: str, writer: asyncio.StreamWriter) -> tuple[int, str]:
+    if method == "GET" and path == "/metrics":
+        return 200, render_latest()
+    if method == "POST":
+        for prefix, hook in _post_hooks.items():
+            if path.startswith(prefix):
+                if not _is_loopback(writer):
+                    return 403, "forbidden\n"
+                return await hook(path[len(prefix) :])
+    return 404, "not found\n"
+
+
+async def _read_request_line(reader: asyncio.StreamReader) -> bytes:
+    request_line = await reader.readline()
+    # Заголовки и тело не нужны, но заголовки надо дочитать до пустой строки.
+    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+        pass
+    return request_line
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        try:
+            # Клиент, который подключился и молчит, не должен держать обработчик.
+            request_line = await asyncio.wait_for(
+                _read_request_line(reader), _REQUEST_READ_TIMEOUT_S
+            )
+        except asyncio.TimeoutError:
+            logger.debug("Metrics request was not received in time")
+            return
+        parts = request_line.decode("latin-1").split()
+        method, path = (parts[0], parts[1]) if len(parts) >= 2 else ("", "")
+
+        code, body = await _dispatch(method, path.split("?", 1)[0], writer)
+        status = f"{code} {HTTPStatus(code).phrase}"
+
+        payload = body.encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + payload
+        )
+        await writer.drain()
+    except Exception:
+        logger.exception("Failed to serve metrics request")
+    finally:
+        writer.close()
+
+
+async def start_http_server(host: str, port: int) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info("Metrics endpoint listening on http://%s:%s/metrics", host, port)
+    return server
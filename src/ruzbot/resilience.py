@@ -0,0 +1,399 @@
+"""
+Запросы в backend с дедлайном, повторами и hedging.
+
+* Дедлайн (:func:`deadline`, :func:`handler_scope`) — общий бюджет времени
+  на все запросы одного обработчика: каждая попытка получает
+  ``min(timeout эндпоинта, остаток бюджета)``.
+* Повторы — только для идемпотентных чтений и только на временных ошибках
+  (таймаут, обрыв соединения, HTTP 408/429/5xx), с паузой «full jitter».
+* Hedging — если ответа нет дольше наблюдаемого p95 эндпоинта, уходит второй
+  такой же запрос; побеждает первый успешный, второй отменяется.
+* Автомат backend — после ``BACKEND_BREAKER_FAILURES`` неудачных чтений подряд
+  запросы не отправляются (:class:`BackendUnavailable`) до пробы после паузы;
+  исчерпанный бюджет обработчика неудачей backend не считается;
+  :mod:`ruzbot.cache` в это время отдаёт последние известные значения и
+  отмечает это (:func:`note_stale`), а бот дописывает к ответу предупреждение.
+
+Настройки по умолчанию — ``BACKEND_*``, переопределения по эндпоинтам —
+``BACKEND_ENDPOINTS="group_week:timeout=5,retries=1;lecturer:hedge=0"``.
+Запись (создание и обновление пользователя) сюда не заворачивается.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from ruzbot import metrics
+from ruzbot.circuit import OPEN, CircuitBreaker
+from ruzbot.settings import settings
+
+try:
+    from aiohttp import ClientError
+except ImportError:  # pragma: no cover - aiohttp приходит вместе с ruz-client
+    ClientError = OSError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP-статусы, после которых тот же запрос имеет смысл повторить.
+_TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Сколько последних задержек эндпоинта хранится и сколько нужно для p95.
+_LATENCY_WINDOW = 256
+_HEDGE_MIN_SAMPLES = 20
+
+_deadline: ContextVar[Optional[float]] = ContextVar(
+    "ruzbot_backend_deadline", default=None
+)
+
+
+# Ключи, отданные обработчику из устаревшего слоя кэша. Список общий для всех
+# задач обработчика (они копируют контекст, но не сам список).
+_stale_reads: ContextVar[Optional[list[str]]] = ContextVar(
+    "ruzbot_stale_reads", default=None
+)
+
+_breaker = CircuitBreaker(
+    "backend",
+    failure_threshold=settings.backend_breaker_failures,
+    cooldown_s=settings.backend_breaker_cooldown_s,
+)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Бюджет обработчика исчерпан раньше, чем backend ответил."""
+
+
+class BackendUnavailable(Exception):
+    """Автомат backend открыт: запрос не отправлялся."""
+
+
+@dataclass(frozen=True, slots=True)
+class EndpointPolicy:
+    timeout_s: float
+    retries: int
+    backoff_s: float
+    backoff_max_s: float
+    hedge: bool
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() not in ("0", "false", "no", "")
+
+
+# Ключ в BACKEND_ENDPOINTS -> (поле EndpointPolicy, разбор значения).
+_OVERRIDE_FIELDS: dict[str, tuple[str, Callable[[str], Any]]] = {
+    "timeout": ("timeout_s", float),
+    "retries": ("retries", int),
+    "backoff": ("backoff_s", float),
+    "backoff_max": ("backoff_max_s", float),
+    "hedge": ("hedge", _parse_bool),
+}
+
+# Полные списки (преподаватели, дисциплины, группы) тяжелее точечных чтений и
+# грузятся в фоне: дольше ждём и не дублируем запрос.
+_BUILTIN_OVERRIDES: dict[str, dict[str, Any]] = {
+    "directory": {"timeout_s": 10.0, "hedge": False},
+    "group_catalog": {"timeout_s": 10.0, "hedge": False},
+}
+
+_policies: dict[str, EndpointPolicy] = {}
+_latencies: dict[str, deque[float]] = {}
+
+
+def _default_policy() -> EndpointPolicy:
+    return EndpointPolicy(
+        timeout_s=settings.backend_timeout_s,
+        retries=max(0, settings.backend_retries),
+        backoff_s=settings.backend_backoff_s,
+        backoff_max_s=settings.backend_backoff_max_s,
+        hedge=settings.backend_hedge,
+    )
+
+
+def _parse_overrides(spec: str) -> dict[str, dict[str, Any]]:
+    """``"a:timeout=5,retries=1;b:hedge=0"`` -> ``{"a": {...}, "b": {...}}``."""
+    overrides: dict[str, dict[str, Any]] = {}
+    for part in filter(None, (chunk.strip() for chunk in spec.split(";"))):
+        endpoint, _, options = part.partition(":")
+        fields = overrides.setdefault(endpoint.strip(), {})
+        for option in filter(None, (item.strip() for item in options.split(","))):
+            name, _, value = option.partition("=")
+            field = _OVERRIDE_FIELDS.get(name.strip())
+            try:
+                if field is None:
+                    raise ValueError(f"unknown option {name!r}")
+                fields[field[0]] = field[1](value)
+            except ValueError as exc:
+                logger.warning(
+                    "BACKEND_ENDPOINTS: ignoring %r for %s: %s", option, endpoint, exc
+                )
+    return overrides
+
+
+def policy(endpoint: str) -> EndpointPolicy:
+    conf = _policies.get(endpoint)
+    if conf is None:
+        overrides = _parse_overrides(settings.backend_endpoints)
+        conf = replace(
+            _default_policy(),
+            **{**_BUILTIN_OVERRIDES.get(endpoint, {}), **overrides.get(endpoint, {})},
+        )
+        _policies[endpoint] = conf
+    return conf
+
+
+def reset() -> None:
+    """Забывает настройки, задержки и состояние автомата (для тестов)."""
+    _policies.clear()
+    _latencies.clear()
+    _breaker.reset()
+
+
+# --- Дедлайн ---
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Бюджет на все запросы в backend внутри блока. Вложенный блок не продлевает
+    внешний бюджет, только сужает его.
+    """
+    expires_at = time.monotonic() + seconds if seconds is not None else None
+    current = _deadline.get()
+    if current is not None and (expires_at is None or current < expires_at):
+        expires_at = current
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def detach() -> None:
+    """
+    Для фоновых задач: они наследуют контекст обработчика, но его бюджет и
+    отметки об устаревших данных к ним не относятся.
+    """
+    _deadline.set(None)
+    _stale_reads.set(None)
+
+
+def remaining() -> Optional[float]:
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+def handler_scope(handler: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Оборачивает обработчик Telegram: ``deadline(HANDLER_DEADLINE_S)`` и свой
+    учёт устаревших данных (:func:`served_stale`).
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        token = _stale_reads.set([])
+        try:
+            with deadline(settings.handler_deadline_s or None):
+                return await handler(*args, **kwargs)
+        finally:
+            _stale_reads.reset(token)
+
+    return wrapper
+
+
+# --- Устаревшие данные ---
+
+
+def note_stale(key: str) -> None:
+    reads = _stale_reads.get()
+    if reads is not None:
+        reads.append(key)
+
+
+def served_stale() -> bool:
+    """Обработчик получил хотя бы одно значение из устаревшего слоя кэша."""
+    return bool(_stale_reads.get())
+
+
+# --- Запросы ---
+
+
+def backend_available() -> bool:
+    """
+    Запрос в backend сейчас имеет смысл: автомат закрыт или пауза истекла и
+    пора пробовать. Фоновые обновления при открытом автомате не запускаются.
+    """
+    return _breaker.state != OPEN
+
+
+def _is_transient(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _TRANSIENT_STATUSES
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError, ClientError))
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Backend не ответил по существу: автомат открыт, таймаут, обрыв или 5xx."""
+    return isinstance(exc, BackendUnavailable) or _is_transient(exc)
+
+
+def _attempt_budget(conf: EndpointPolicy) -> float:
+    left = remaining()
+    if left is None:
+        return conf.timeout_s
+    if left <= 0:
+        raise DeadlineExceeded("backend deadline exceeded")
+    return min(conf.timeout_s, left)
+
+
+def _backoff_s(conf: EndpointPolicy, attempt: int) -> float:
+    # «Full jitter»: повторы разных обработчиков не приходят в backend пачкой.
+    return random.uniform(0, min(conf.backoff_max_s, conf.backoff_s * 2**attempt))
+
+
+def latency_p95(endpoint: str) -> Optional[float]:
+    samples = _latencies.get(endpoint)
+    if not samples or len(samples) < _HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+async def _timed(endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+    started = time.monotonic()
+    result = await request()
+    elapsed = time.monotonic() - started
+    samples = _latencies.get(endpoint)
+    if samples is None:
+        samples = _latencies[endpoint] = deque(maxlen=_LATENCY_WINDOW)
+    samples.append(elapsed)
+    metrics.observe(metrics.BACKEND_SECONDS, elapsed, endpoint=endpoint)
+    return result
+
+
+async def _hedged(
+    endpoint: str, request: Callable[[], Awaitable[T]], conf: EndpointPolicy
+) -> T:
+    p95 = latency_p95(endpoint) if conf.hedge else None
+    if p95 is None:
+        return await _timed(endpoint, request)
+
+    first = asyncio.ensure_future(_timed(endpoint, request))
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(
+            pending, timeout=max(p95, settings.backend_hedge_min_s)
+        )
+        if done:
+            return first.result()
+
+        metrics.inc(metrics.BACKEND_EVENTS, endpoint=endpoint, event="hedge")
+        second = asyncio.ensure_future(_timed(endpoint, request))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        metrics.inc(
+                            metrics.BACKEND_EVENTS, endpoint=endpoint, event="hedge_won"
+                        )
+                    return task.result()
+                error = error or task.exception()
+        assert error is not None
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call(endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+    """
+    Идемпотентное чтение из backend по политике ``endpoint``. ``request``
+    вызывается заново на каждую попытку и на hedge-запрос. Пока автомат
+    открыт — :class:`BackendUnavailable`; после паузы одна проба без повторов.
+    """
+    conf = policy(endpoint)
+    # Бюджет кончился до запроса — это не отказ backend, автомат не трогаем.
+    _attempt_budget(conf)
+    probe = False
+    if not _breaker.allows_requests():
+        if not _breaker.try_begin_probe():
+            metrics.inc(metrics.BACKEND_EVENTS, endpoint=endpoint, event="rejected")
+            raise BackendUnavailable(f"backend circuit is open ({endpoint})")
+        probe = True
+        conf = replace(conf, retries=0, hedge=False)
+
+    try:
+        result = await _call_with_retries(endpoint, request, conf)
+    except BaseException as exc:
+        # DeadlineExceeded без причины — попытку оборвал бюджет обработчика, а
+        # не таймаут эндпоинта: о здоровье backend это ничего не говорит.
+        failure = exc.__cause__ if isinstance(exc, DeadlineExceeded) else exc
+        if failure is None:
+            if probe:
+                _breaker.abandon_probe()
+        # Отменённая проба тоже должна вернуть автомат в «открыт», иначе он
+        # навсегда застрянет в ожидании её результата.
+        elif _is_transient(failure) or (probe and not isinstance(exc, Exception)):
+            if _breaker.record_failure():
+                logger.warning(
+                    "Backend circuit opened after %s failures; pausing for %ss",
+                    _breaker.failures,
+                    _breaker.cooldown_s,
+                )
+        elif isinstance(exc, Exception):
+            # 404 и ошибки разбора — backend ответил.
+            _breaker.record_success()
+        raise
+    if probe:
+        logger.info("Backend probe succeeded, circuit closed")
+    _breaker.record_success()
+    return result
+
+
+async def _call_with_retries(
+    endpoint: str, request: Callable[[], Awaitable[T]], conf: EndpointPolicy
+) -> T:
+    attempt = 0
+    while True:
+        budget = _attempt_budget(conf)
+        try:
+            return await asyncio.wait_for(_hedged(endpoint, request, conf), budget)
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError) and budget < conf.timeout_s:
+                # Таймаут урезан остатком бюджета обработчика — это его дедлайн.
+                metrics.inc(metrics.BACKEND_EVENTS, endpoint=endpoint, event="deadline")
+                raise DeadlineExceeded("backend deadline exceeded")
+            if attempt >= conf.retries or not _is_transient(exc):
+                raise
+            delay = _backoff_s(conf, attempt)
+            left = remaining()
+            if left is not None and left <= delay:
+                metrics.inc(metrics.BACKEND_EVENTS, endpoint=endpoint, event="deadline")
+                raise DeadlineExceeded("backend deadline exceeded") from exc
+            metrics.inc(metrics.BACKEND_EVENTS, endpoint=endpoint, event="retry")
+            logger.info(
+                "Retrying %s after %s (attempt %s)",
+                endpoint,
+                type(exc).__name__,
+                attempt + 1,
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -5,6 +5,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import math
 from datetime import datetime, timedelta
@@ -13,7 +14,7 @@ from telebot import types
 from telebot.util import quick_markup
 
 from ruzbot import cache
-from ruzbot import commands
+from ruzbot import commands, resilience
 from ruzbot.deathnote import (
     criminal_format_day_message,
     criminal_format_week_message,
@@ -27,6 +28,17 @@ logger = logging.getLogger(__name__)
 
 _PAGE_SIZE = 6
 
+# Отказы backend, после которых экран показывает ошибку так же, как на HTTP 5xx:
+# таймаут и исчерпанный дедлайн (DeadlineExceeded — подкласс TimeoutError),
+# обрыв соединения, открытый автомат.
+_BACKEND_ERRORS = (
+    RuzHttpError,
+    asyncio.TimeoutError,
+    ConnectionError,
+    resilience.ClientError,
+    resilience.BackendUnavailable,
+)
+
 
 def _chunk_list(lst: list, chunk_size: int) -> list:
     return [lst[i : i + chunk_size] for i in range(0, len(lst), chunk_size)]
@@ -41,6 +53,12 @@ def _commands_escape(s: str) -> str:
     return commands._escape_like_prototype(s)
 
 
+def _load_error_text(e: Exception) -> str:
+    if isinstance(e, RuzHttpError):
+        return f"Не удалось загрузить расписание: HTTP {e.status_code}"
+    return "Не удалось загрузить расписание: сервер не отвечает, попробуйте позже"
+
+
 async def _edit_and_cache(
     bot,
     message,
@@ -50,6 +68,7 @@ async def _edit_and_cache(
     text: str,
     reply_markup=None,
     parse_mode: str | None = None,
+    deps: list | None = None,
 ) -> None:
     await bot.edit_message_text(
         chat_id=message.chat.id,
@@ -65,9 +84,113 @@ async def _edit_and_cache(
         reply_markup=reply_markup,
         parse_mode=parse_mode,
         source=screen_name,
+        deps=deps,
+    )
+
+
+async def _load_lecturer(lecturer_id: int):
+    try:
+        async with ruz_client() as client:
+            return await resilience.call(
+                "lecturer", lambda: client.lecturers.get_lecturer(lecturer_id)
+            )
+    except RuzHttpError as e:
+        if e.status_code == 404:
+            return None
+        raise
+    except ValueError:
+        return None
+
+
+async def _load_discipline(discipline_id: int):
+    try:
+        async with ruz_client() as client:
+            return await resilience.call(
+                "discipline", lambda: client.disciplines.get_discipline(discipline_id)
+            )
+    except RuzHttpError as e:
+        if e.status_code == 404:
+            return None
+        raise
+    except ValueError:
+        return None
+
+
+async def _fetch_lecturer(lecturer_id: int):
+    """Карточка из кэша; клиент к backend открывается только при промахе."""
+    return await cache.get_or_load_lecturer(
+        lecturer_id, lambda: _load_lecturer(lecturer_id)
+    )
+
+
+async def _fetch_discipline(discipline_id: int):
+    return await cache.get_or_load_discipline(
+        discipline_id, lambda: _load_discipline(discipline_id)
     )
 
 
+async def _load_lecturer_week(lecturer_id: int, anchor):
+    async with ruz_client() as client:
+        # Без group_id/sub_group: как CLI и документация — иначе часто пусто из‑за фильтра по чужой группе.
+        return await resilience.call(
+            "lecturer_week", lambda: client.search.lecturer_week(lecturer_id, anchor)
+        )
+
+
+async def _load_discipline_week(discipline_id: int, anchor):
+    async with ruz_client() as client:
+        return await resilience.call(
+            "discipline_week",
+            lambda: client.search.discipline_week(discipline_id, anchor),
+        )
+
+
+async def _lecturer_week(lecturer_id: int, anchor_date) -> list:
+    """Неделя преподавателя из кэша (SWR как у недель групп); день берётся из неё."""
+    lessons = await cache.get_or_load_lecturer_week(
+        lecturer_id,
+        anchor_date,
+        lambda anchor: _load_lecturer_week(lecturer_id, anchor),
+    )
+    return lessons or []
+
+
+async def _discipline_week(discipline_id: int, anchor_date) -> list:
+    lessons = await cache.get_or_load_discipline_week(
+        discipline_id,
+        anchor_date,
+        lambda anchor: _load_discipline_week(discipline_id, anchor),
+    )
+    return lessons or []
+
+
+def _lessons_on(lessons: list, target: datetime) -> list:
+    target_iso = target.strftime("%Y-%m-%d")
+    return [lesson for lesson in lessons if lesson.get("date") == target_iso]
+
+
+async def _card_or_none(fetch, what: str):
+    """
+    Карточка нужна только для заголовка: любая её ошибка (HTTP, таймаут,
+    дедлайн, открытый автомат) не должна ронять экран.
+    """
+    try:
+        return await fetch
+    except Exception as e:
+        logger.error("%s get failed: %r", what, e)
+        return None
+
+
+async def _schedule_with_card(
+    schedule, card, what: str
+) -> tuple[list, dict | None]:
+    """
+    Расписание и карточка независимы и грузятся параллельно: экран ждёт самый
+    медленный запрос, а не их сумму. Ошибка расписания пробрасывается.
+    """
+    return await asyncio.gather(schedule, _card_or_none(card, what))
+
+
 def _unique_lecturers_from_lessons(
     lessons: list[UserScheduleLesson],
 ) -> list[tuple[int, str]]:
@@ -96,15 +219,27 @@ def _unique_disciplines_from_lessons(
     return sorted(seen.items(), key=lambda x: (x[1].lower(), x[0]))
 
 
-async def search_teacher_list_command(bot, message, page: int, *, user_id: int) -> None:
+async def _list_lecturers():
     async with ruz_client() as client:
-        try:
-            lecturers = await client.lecturers.list_lecturers()
-        except RuzHttpError as e:
-            logger.error("lecturer list failed: %s", e)
-            return
+        return await resilience.call("directory", client.lecturers.list_lecturers)
+
+
+async def _list_disciplines():
+    async with ruz_client() as client:
+        return await resilience.call(
+            "directory", client.disciplines.list_disciplines
+        )
+
+
+async def search_teacher_list_command(bot, message, page: int, *, user_id: int) -> None:
+    try:
+        display, total, page = await cache.get_directory_page(
+            "lecturers", page, _PAGE_SIZE, _list_lecturers
+        )
+    except _BACKEND_ERRORS as e:
+        logger.error("lecturer list failed: %r", e)
+        return
 
-    total = len(lecturers)
     if total == 0:
         markup = quick_markup({"Назад": {"callback_data": "start"}}, row_width=1)
         await _edit_and_cache(
@@ -118,9 +253,6 @@ async def search_teacher_list_command(bot, message, page: int, *, user_id: int)
         return
 
     pages = max(1, math.ceil(total / _PAGE_SIZE))
-    page = page % pages
-    start = page * _PAGE_SIZE
-    display = lecturers[start : start + _PAGE_SIZE]
 
     markup = types.InlineKeyboardMarkup()
     for pair in _chunk_list(display, 2):
@@ -158,23 +290,26 @@ async def search_teacher_list_command(bot, message, page: int, *, user_id: int)
         reply_markup=markup,
         source=f"teacherPage {page}",
     )
+    cache.prefetch_lecturers([lec["id"] for lec in display], _load_lecturer)
 
 
 async def teacher_card_command(
     bot, message, lecturer_id: int, list_page: int, *, user_id: int
 ) -> None:
-    async with ruz_client() as client:
-        try:
-            lecturer = await client.lecturers.get_lecturer(lecturer_id)
-        except RuzHttpError as e:
-            logger.error("lecturer get failed: %s", e)
-            return
+    try:
+        lecturer = await _fetch_lecturer(lecturer_id)
+    except _BACKEND_ERRORS as e:
+        logger.error("lecturer get failed: %r", e)
+        return
+    if lecturer is None:
+        logger.error("lecturer not found: %s", lecturer_id)
+        return
 
     body = (
         f"👤 Преподаватель\n"
-        f"🆔 ID: {lecturer.id}\n"
-        f"📛 Имя: {lecturer.full_name}\n"
-        f"🎓 Должность: {lecturer.rank}"
+        f"🆔 ID: {lecturer.get('id')}\n"
+        f"📛 Имя: {lecturer.get('full_name', '')}\n"
+        f"🎓 Должность: {lecturer.get('rank', '')}"
     )
     markup = quick_markup(
         {
@@ -221,19 +356,17 @@ async def lecturer_day_command(
         def day_line(dd: int) -> str:
             return f"lecturerDay {lecturer_id} {dd} {list_page}"
 
-    async with ruz_client() as client:
-        target = datetime.today() + timedelta(days=day_delta)
-        try:
-            # Без group_id/sub_group: как CLI и документация — иначе часто пусто из‑за фильтра по чужой группе.
-            lessons = await client.search.lecturer_day(lecturer_id, target.date())
-        except RuzHttpError as e:
-            logger.error("lecturer day failed: %s", e)
-            return
-
-        try:
-            lecturer = await client.lecturers.get_lecturer(lecturer_id)
-        except (RuzHttpError, ValueError):
-            lecturer = None
+    target = datetime.today() + timedelta(days=day_delta)
+    try:
+        week, lecturer = await _schedule_with_card(
+            _lecturer_week(lecturer_id, target.date()),
+            _fetch_lecturer(lecturer_id),
+            "lecturer",
+        )
+    except _BACKEND_ERRORS as e:
+        logger.error("lecturer day failed: %r", e)
+        return
+    lessons = _lessons_on(week, target)
     name = ""
     if lecturer is not None:
         name = lecturer.get("full_name") or lecturer.get("short_name") or ""
@@ -291,33 +424,30 @@ async def lecturer_week_command(
         def week_line(wd: int) -> str:
             return f"lecturerWeek {lecturer_id} {wd} {list_page}"
 
-    async with ruz_client() as client:
-        base = datetime.today() + timedelta(weeks=week_delta)
-        try:
-            lessons = await client.search.lecturer_week(lecturer_id, base.date())
-        except RuzHttpError as e:
-            text = _commands_escape(
-                f"Не удалось загрузить расписание: HTTP {e.status_code}"
-            )
-            markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
-            await _edit_and_cache(
-                bot,
-                message,
-                user_id=user_id,
-                screen_name=cache.normalize_screen_key(
-                    f"lecturerWeekW {lecturer_id} {week_delta} {list_page} {uwd}"
-                    if uwd is not None
-                    else f"lecturerWeek {lecturer_id} {week_delta} {list_page}"
-                ),
-                text=text,
-                reply_markup=markup,
-            )
-            return
+    base = datetime.today() + timedelta(weeks=week_delta)
+    try:
+        lessons, lecturer = await _schedule_with_card(
+            _lecturer_week(lecturer_id, base.date()),
+            _fetch_lecturer(lecturer_id),
+            "lecturer",
+        )
+    except _BACKEND_ERRORS as e:
+        text = _commands_escape(_load_error_text(e))
+        markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
+        await _edit_and_cache(
+            bot,
+            message,
+            user_id=user_id,
+            screen_name=cache.normalize_screen_key(
+                f"lecturerWeekW {lecturer_id} {week_delta} {list_page} {uwd}"
+                if uwd is not None
+                else f"lecturerWeek {lecturer_id} {week_delta} {list_page}"
+            ),
+            text=text,
+            reply_markup=markup,
+        )
+        return
 
-        try:
-            lecturer = await client.lecturers.get_lecturer(lecturer_id)
-        except (RuzHttpError, ValueError):
-            lecturer = None
     name = ""
     if lecturer is not None:
         name = lecturer.get("full_name") or lecturer.get("short_name") or ""
@@ -365,13 +495,14 @@ async def lecturer_week_command(
 
 
 async def search_subject_list_command(bot, message, page: int, *, user_id: int) -> None:
-    async with ruz_client() as client:
-        try:
-            items = await client.disciplines.list_disciplines()
-        except RuzHttpError as e:
-            logger.error("discipline list failed: %s", e)
-            return
-    total = len(items)
+    try:
+        display, total, page = await cache.get_directory_page(
+            "disciplines", page, _PAGE_SIZE, _list_disciplines
+        )
+    except _BACKEND_ERRORS as e:
+        logger.error("discipline list failed: %r", e)
+        return
+
     if total == 0:
         markup = quick_markup({"Назад": {"callback_data": "start"}}, row_width=1)
         await _edit_and_cache(
@@ -385,9 +516,6 @@ async def search_subject_list_command(bot, message, page: int, *, user_id: int)
         return
 
     pages = max(1, math.ceil(total / _PAGE_SIZE))
-    page = page % pages
-    start = page * _PAGE_SIZE
-    display = items[start : start + _PAGE_SIZE]
 
     markup = types.InlineKeyboardMarkup()
     for pair in _chunk_list(display, 2):
@@ -420,17 +548,20 @@ async def search_subject_list_command(bot, message, page: int, *, user_id: int)
         text="Выберите предмет:",
         reply_markup=markup,
     )
+    cache.prefetch_disciplines([d["id"] for d in display], _load_discipline)
 
 
 async def subject_card_command(
     bot, message, discipline_id: int, list_page: int, *, user_id: int
 ) -> None:
-    async with ruz_client() as client:
-        try:
-            d = await client.disciplines.get_discipline(discipline_id)
-        except (RuzHttpError, ValueError) as e:
-            logger.error("discipline get failed: %s", e)
-            return
+    try:
+        d = await _fetch_discipline(discipline_id)
+    except _BACKEND_ERRORS as e:
+        logger.error("discipline get failed: %r", e)
+        return
+    if d is None:
+        logger.error("discipline not found: %s", discipline_id)
+        return
     exam = d.get("examtype") or "—"
     body = (
         f"📚 Предмет\n"
@@ -485,34 +616,31 @@ async def discipline_day_command(
         def day_line(dd: int) -> str:
             return f"disciplineDay {discipline_id} {dd} {list_page}"
 
-    async with ruz_client() as client:
-        target = datetime.today() + timedelta(days=day_delta)
-        try:
-            lessons = await client.search.discipline_day(discipline_id, target.date())
-        except RuzHttpError as e:
-            text = _commands_escape(
-                f"Не удалось загрузить расписание: HTTP {e.status_code}"
-            )
-            markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
-            await _edit_and_cache(
-                bot,
-                message,
-                user_id=user_id,
-                screen_name=cache.normalize_screen_key(
-                    f"disciplineDayW {discipline_id} {day_delta} {list_page} {uwd}"
-                    if uwd is not None
-                    else f"disciplineDay {discipline_id} {day_delta} {list_page}"
-                ),
-                text=text,
-                reply_markup=markup,
-            )
-            return
+    target = datetime.today() + timedelta(days=day_delta)
+    try:
+        week, raw = await _schedule_with_card(
+            _discipline_week(discipline_id, target.date()),
+            _fetch_discipline(discipline_id),
+            "discipline",
+        )
+    except _BACKEND_ERRORS as e:
+        text = _commands_escape(_load_error_text(e))
+        markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
+        await _edit_and_cache(
+            bot,
+            message,
+            user_id=user_id,
+            screen_name=cache.normalize_screen_key(
+                f"disciplineDayW {discipline_id} {day_delta} {list_page} {uwd}"
+                if uwd is not None
+                else f"disciplineDay {discipline_id} {day_delta} {list_page}"
+            ),
+            text=text,
+            reply_markup=markup,
+        )
+        return
 
-        raw = None
-        try:
-            raw = await client.disciplines.get_discipline(discipline_id)
-        except (RuzHttpError, ValueError) as e:
-            logger.error("discipline get failed: %s", e)
+    lessons = _lessons_on(week, target)
     title = ""
     if raw is not None:
         title = raw.get("name") or ""
@@ -570,34 +698,30 @@ async def discipline_week_command(
         def week_line(wd: int) -> str:
             return f"disciplineWeek {discipline_id} {wd} {list_page}"
 
-    async with ruz_client() as client:
-        base = datetime.today() + timedelta(weeks=week_delta)
-        try:
-            lessons = await client.search.discipline_week(discipline_id, base.date())
-        except RuzHttpError as e:
-            text = _commands_escape(
-                f"Не удалось загрузить расписание: HTTP {e.status_code}"
-            )
-            markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
-            await _edit_and_cache(
-                bot,
-                message,
-                user_id=user_id,
-                screen_name=cache.normalize_screen_key(
-                    f"disciplineWeekW {discipline_id} {week_delta} {list_page} {uwd}"
-                    if uwd is not None
-                    else f"disciplineWeek {discipline_id} {week_delta} {list_page}"
-                ),
-                text=text,
-                reply_markup=markup,
-            )
-            return
+    base = datetime.today() + timedelta(weeks=week_delta)
+    try:
+        lessons, raw = await _schedule_with_card(
+            _discipline_week(discipline_id, base.date()),
+            _fetch_discipline(discipline_id),
+            "discipline",
+        )
+    except _BACKEND_ERRORS as e:
+        text = _commands_escape(_load_error_text(e))
+        markup = quick_markup({"Назад": {"callback_data": back_cb}}, row_width=1)
+        await _edit_and_cache(
+            bot,
+            message,
+            user_id=user_id,
+            screen_name=cache.normalize_screen_key(
+                f"disciplineWeekW {discipline_id} {week_delta} {list_page} {uwd}"
+                if uwd is not None
+                else f"disciplineWeek {discipline_id} {week_delta} {list_page}"
+            ),
+            text=text,
+            reply_markup=markup,
+        )
+        return
 
-        raw = None
-        try:
-            raw = await client.disciplines.get_discipline(discipline_id)
-        except (RuzHttpError, ValueError) as e:
-            logger.error("discipline get failed: %s", e)
     title = ""
     if raw is not None:
         title = raw.get("name") or ""
@@ -647,16 +771,14 @@ async def week_teachers_list_command(
     async with ruz_client() as client:
         base = datetime.today() + timedelta(weeks=user_week_delta)
         try:
-            _, lessons = await commands.get_user_week_lessons(
+            _, lessons, deps = await commands.get_user_week_lessons(
                 client,
                 user_id,
                 base.date(),
             )
-        except RuzHttpError as e:
-            logger.error("week schedule for weekTeachersList: %s", e)
-            text = _commands_escape(
-                f"Не удалось загрузить расписание: HTTP {e.status_code}"
-            )
+        except _BACKEND_ERRORS as e:
+            logger.error("week schedule for weekTeachersList: %r", e)
+            text = _commands_escape(_load_error_text(e))
             markup = quick_markup(
                 {"Назад": {"callback_data": f"parseWeek {user_week_delta}"}},
                 row_width=1,
@@ -676,6 +798,7 @@ async def week_teachers_list_command(
         await commands.backCommand(bot, message, user_id=user_id)
         return
     lessons = lessons or []
+    deps = [cache.relative_date_dep("week", user_week_delta, base), *deps]
 
     pairs = _unique_lecturers_from_lessons(lessons)
     if not pairs:
@@ -692,6 +815,7 @@ async def week_teachers_list_command(
             ),
             text="На этой неделе нет занятий с известным преподавателем.",
             reply_markup=markup,
+            deps=deps,
         )
         return
 
@@ -734,7 +858,9 @@ async def week_teachers_list_command(
         ),
         text="Преподаватели на выбранной неделе (по вашему расписанию):",
         reply_markup=markup,
+        deps=deps,
     )
+    cache.prefetch_lecturers([lid for lid, _ in display], _load_lecturer)
 
 
 async def week_teacher_open_command(
@@ -746,15 +872,14 @@ async def week_teacher_open_command(
     *,
     user_id: int,
 ) -> None:
-    async with ruz_client() as client:
-        try:
-            lec = await client.lecturers.get_lecturer(lecturer_id)
-        except ValueError:
-            logger.error("lecturer not found: %s", lecturer_id)
-            return
-        except RuzHttpError as e:
-            logger.error("lecturer get failed: %s", e)
-            return
+    try:
+        lec = await _fetch_lecturer(lecturer_id)
+    except _BACKEND_ERRORS as e:
+        logger.error("lecturer get failed: %r", e)
+        return
+    if lec is None:
+        logger.error("lecturer not found: %s", lecturer_id)
+        return
     body = (
         f"👤 Преподаватель\n"
         f"🆔 ID: {lec.get('id')}\n"
@@ -794,16 +919,14 @@ async def week_subjects_list_command(
     async with ruz_client() as client:
         base = datetime.today() + timedelta(weeks=user_week_delta)
         try:
-            _, lessons = await commands.get_user_week_lessons(
+            _, lessons, deps = await commands.get_user_week_lessons(
                 client,
                 user_id,
                 base.date(),
             )
-        except RuzHttpError as e:
-            logger.error("week schedule for weekSubjectsList: %s", e)
-            text = _commands_escape(
-                f"Не удалось загрузить расписание: HTTP {e.status_code}"
-            )
+        except _BACKEND_ERRORS as e:
+            logger.error("week schedule for weekSubjectsList: %r", e)
+            text = _commands_escape(_load_error_text(e))
             markup = quick_markup(
                 {"Назад": {"callback_data": f"parseWeek {user_week_delta}"}},
                 row_width=1,
@@ -823,6 +946,7 @@ async def week_subjects_list_command(
         await commands.backCommand(bot, message, user_id=user_id)
         return
     lessons = lessons or []
+    deps = [cache.relative_date_dep("week", user_week_delta, base), *deps]
 
     pairs = _unique_disciplines_from_lessons(lessons)
     if not pairs:
@@ -839,6 +963,7 @@ async def week_subjects_list_command(
             ),
             text="На этой неделе нет предметов с известным ID в расписании.",
             reply_markup=markup,
+            deps=deps,
         )
         return
 
@@ -881,7 +1006,9 @@ async def week_subjects_list_command(
         ),
         text="Предметы на выбранной неделе (по вашему расписанию):",
         reply_markup=markup,
+        deps=deps,
     )
+    cache.prefetch_disciplines([did for did, _ in display], _load_discipline)
 
 
 async def week_subject_open_command(
@@ -893,12 +1020,14 @@ async def week_subject_open_command(
     *,
     user_id: int,
 ) -> None:
-    async with ruz_client() as client:
-        try:
-            d = await client.disciplines.get_discipline(discipline_id)
-        except (RuzHttpError, ValueError) as e:
-            logger.error("discipline get failed: %s", e)
-            return
+    try:
+        d = await _fetch_discipline(discipline_id)
+    except _BACKEND_ERRORS as e:
+        logger.error("discipline get failed: %r", e)
+        return
+    if d is None:
+        logger.error("discipline not found: %s", discipline_id)
+        return
     exam = d.get("examtype") or "—"
     body = (
         f"📚 Предмет\n"
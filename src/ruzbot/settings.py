@@ -6,17 +6,84 @@ load_dotenv()
 
 class Settings:
     base_url: str = os.getenv("BASE_URL")
-    timeout_s: float = 30.0
+    # Жёсткий таймаут HTTP-клиента; чтения обычно обрывает BACKEND_TIMEOUT_S раньше.
+    timeout_s: float = float(os.getenv("TIMEOUT_S", "10"))
+    handler_deadline_s: float = float(os.getenv("HANDLER_DEADLINE_S", "8"))
+    backend_timeout_s: float = float(os.getenv("BACKEND_TIMEOUT_S", "3"))
+    backend_retries: int = int(os.getenv("BACKEND_RETRIES", "2"))
+    backend_backoff_s: float = float(os.getenv("BACKEND_BACKOFF_S", "0.1"))
+    backend_backoff_max_s: float = float(os.getenv("BACKEND_BACKOFF_MAX_S", "1"))
+    backend_hedge: bool = os.getenv("BACKEND_HEDGE", "1") not in ("0", "false", "")
+    backend_hedge_min_s: float = float(os.getenv("BACKEND_HEDGE_MIN_S", "0.05"))
+    backend_endpoints: str = os.getenv("BACKEND_ENDPOINTS", "")
+    backend_breaker_failures: int = int(os.getenv("BACKEND_BREAKER_FAILURES", "5"))
+    backend_breaker_cooldown_s: float = float(
+        os.getenv("BACKEND_BREAKER_COOLDOWN_S", "30")
+    )
     token: str = os.getenv("TOKEN")
     port: int = int(os.getenv("PORT", "2201"))
+    metrics_host: str = os.getenv("METRICS_HOST", "0.0.0.0")
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", "1") not in ("0", "false", "")
     redis_url: str = os.getenv("REDIS_URL", "")
     redis_key_prefix: str = os.getenv("REDIS_KEY_PREFIX", "ruzbot")
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+    redis_socket_timeout_s: float = float(os.getenv("REDIS_SOCKET_TIMEOUT_S", "0.5"))
+    redis_connect_timeout_s: float = float(
+        os.getenv("REDIS_CONNECT_TIMEOUT_S", "0.5")
+    )
+    redis_breaker_failures: int = int(os.getenv("REDIS_BREAKER_FAILURES", "3"))
+    redis_breaker_cooldown_s: float = float(
+        os.getenv("REDIS_BREAKER_COOLDOWN_S", "30")
+    )
     redis_ttl_profile_s: int = int(os.getenv("REDIS_TTL_PROFILE_S", "1800"))
     redis_ttl_group_schedule_s: int = int(
         os.getenv("REDIS_TTL_GROUP_SCHEDULE_S", "3600")
     )
+    redis_group_schedule_stale_s: int = int(
+        os.getenv("REDIS_GROUP_SCHEDULE_STALE_S", "1800")
+    )
+    redis_ttl_jitter_ratio: float = float(os.getenv("REDIS_TTL_JITTER_RATIO", "0.1"))
     redis_ttl_user_schedule_s: int = int(os.getenv("REDIS_TTL_USER_SCHEDULE_S", "300"))
     redis_ttl_message_s: int = int(os.getenv("REDIS_TTL_MESSAGE_S", "600"))
+    redis_ttl_entity_s: int = int(os.getenv("REDIS_TTL_ENTITY_S", "86400"))
+    redis_ttl_directory_s: int = int(os.getenv("REDIS_TTL_DIRECTORY_S", "86400"))
+    directory_refresh_s: int = int(os.getenv("DIRECTORY_REFRESH_S", "3600"))
+    # Последние известные значения на случай недоступного backend.
+    redis_ttl_stale_s: int = int(os.getenv("REDIS_TTL_STALE_S", "604800"))
+    redis_ttl_negative_s: int = int(os.getenv("REDIS_TTL_NEGATIVE_S", "60"))
+    redis_codec: str = os.getenv("REDIS_CODEC", "msgpack")
+    redis_compress_min_bytes: int = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "1024"))
+    group_generation_local_ttl_s: float = float(
+        os.getenv("GROUP_GENERATION_LOCAL_TTL_S", "5")
+    )
+    admin_ids: frozenset[int] = frozenset(
+        int(part) for part in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if part
+    )
+    group_week_batch_window_s: float = float(
+        os.getenv("GROUP_WEEK_BATCH_WINDOW_S", "0.005")
+    )
+    group_week_batch_max: int = int(os.getenv("GROUP_WEEK_BATCH_MAX", "32"))
+    group_week_fanout: int = int(os.getenv("GROUP_WEEK_FANOUT", "8"))
+    prefetch_concurrency: int = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+    prefetch_max_pending: int = int(os.getenv("PREFETCH_MAX_PENDING", "64"))
+    group_catalog_refresh_s: float = float(
+        os.getenv("GROUP_CATALOG_REFRESH_S", "21600")
+    )
+    group_catalog_retry_s: float = float(os.getenv("GROUP_CATALOG_RETRY_S", "60"))
+    warmer_at: str = os.getenv("WARMER_AT", "")
+    warmer_concurrency: int = int(os.getenv("WARMER_CONCURRENCY", "4"))
+    warmer_active_days: int = int(os.getenv("WARMER_ACTIVE_DAYS", "14"))
+    local_cache_ttl_s: int = int(os.getenv("LOCAL_CACHE_TTL_S", "30"))
+    local_cache_max_profiles: int = int(os.getenv("LOCAL_CACHE_MAX_PROFILES", "2048"))
+    local_cache_max_group_weeks: int = int(
+        os.getenv("LOCAL_CACHE_MAX_GROUP_WEEKS", "512")
+    )
+    local_cache_max_subgroup_weeks: int = int(
+        os.getenv("LOCAL_CACHE_MAX_SUBGROUP_WEEKS", "1024")
+    )
+    local_cache_max_entities: int = int(os.getenv("LOCAL_CACHE_MAX_ENTITIES", "2048"))
+    local_cache_max_screens: int = int(os.getenv("LOCAL_CACHE_MAX_SCREENS", "4096"))
+    local_cache_max_renders: int = int(os.getenv("LOCAL_CACHE_MAX_RENDERS", "1024"))
     default_headers: dict[str, str] = {
         "Content-Type": "application/json",
         "Accept": "application/json",
@@ -52,14 +52,46 @@ def remove_position(lecturer_short_name: str) -> str:
     return " ".join(parts[-2:]) if len(parts) >= 2 else lecturer_short_name
 
 
-@asynccontextmanager
-async def ruz_client():
-    """Контекст с настроенным ``RuzClient`` (aiohttp)."""
-    cfg = ClientConfig(
+_shared_client: RuzClient | None = None
+
+
+def _client_config() -> ClientConfig:
+    return ClientConfig(
         base_url=settings.base_url,
         timeout_s=settings.timeout_s,
         api_key=settings.token,
         default_headers=settings.default_headers,
     )
-    async with RuzClient(cfg) as client:
+
+
+async def start_ruz_client() -> RuzClient:
+    """
+    Общий ``RuzClient`` процесса: одна aiohttp-сессия с keep-alive вместо новой
+    сессии, DNS и TLS на каждый обработчик. Вызывается при старте бота.
+    """
+    global _shared_client
+    if _shared_client is None:
+        client = RuzClient(_client_config())
+        await client.__aenter__()
+        _shared_client = client
+    return _shared_client
+
+
+async def close_ruz_client() -> None:
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.__aexit__(None, None, None)
+
+
+@asynccontextmanager
+async def ruz_client():
+    """
+    Общий клиент из :func:`start_ruz_client` (не закрывается по выходу из
+    блока); без него — отдельный клиент на блок, как в CLI-утилитах.
+    """
+    if _shared_client is not None:
+        yield _shared_client
+        return
+    async with RuzClient(_client_config()) as client:
         yield client
@@ -0,0 +1,169 @@
+"""
+Прогрев кэша: текущая и следующая неделя всех активных групп загружаются в
+``group_week_key`` до часа пик, чтобы первый студент группы не ждал backend.
+
+Запуск разово: ``python -m ruzbot.warmer``. В процессе бота прогрев идёт по
+расписанию, если задан ``WARMER_AT`` (см. :func:`run_daily`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from ruzbot import cache, resilience
+from ruzbot.settings import settings
+from ruzbot.utils import ruz_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class WarmReport:
+    # Группы, все недели которых загрузились.
+    groups: int = 0
+    weeks_warmed: int = 0
+    failures: list[tuple[int, date, str]] = field(default_factory=list)
+    duration_s: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Warmed {self.weeks_warmed} weeks for {self.groups} groups, "
+            f"{len(self.failures)} failures in {self.duration_s:.1f}s"
+        )
+
+
+async def warm_groups(
+    client,
+    group_ids: list[int],
+    *,
+    weeks: int = 2,
+    concurrency: Optional[int] = None,
+    today: Optional[date] = None,
+) -> WarmReport:
+    """Загружает ``weeks`` недель начиная с текущей для каждой группы, не больше ``concurrency`` сразу."""
+    today = today or datetime.today().date()
+    anchors = [cache.week_anchor_date(today + timedelta(weeks=i)) for i in range(weeks)]
+    slots = asyncio.Semaphore(max(1, concurrency or settings.warmer_concurrency))
+    report = WarmReport()
+    started = time.perf_counter()
+
+    async def warm_one(group_id: int, anchor: date) -> None:
+        async with slots:
+            try:
+                await cache.refresh_group_week_lessons(
+                    group_id,
+                    anchor,
+                    lambda week: resilience.call(
+                        "group_week",
+                        lambda: client.schedule.get_group_week(group_id, week),
+                    ),
+                    generation=await cache.group_generation(group_id),
+                )
+            except Exception as exc:
+                report.failures.append((group_id, anchor, str(exc) or type(exc).__name__))
+                return
+            report.weeks_warmed += 1
+
+    await asyncio.gather(
+        *(warm_one(group_id, anchor) for group_id in group_ids for anchor in anchors)
+    )
+    report.failures.sort()
+    failed = {group_id for group_id, _, _ in report.failures}
+    report.groups = len(set(group_ids) - failed)
+    report.duration_s = time.perf_counter() - started
+    return report
+
+
+async def warm_active_groups(
+    *, weeks: int = 2, concurrency: Optional[int] = None
+) -> WarmReport:
+    """Прогревает группы, расписание которых смотрели за ``WARMER_ACTIVE_DAYS`` дней."""
+    group_ids = await cache.active_group_ids(settings.warmer_active_days * 86400)
+    if not group_ids:
+        logger.info("No active groups to warm")
+        return WarmReport()
+
+    async with ruz_client() as client:
+        report = await warm_groups(
+            client, group_ids, weeks=weeks, concurrency=concurrency
+        )
+
+    logger.info(report.summary())
+    for group_id, anchor, error in report.failures:
+        logger.warning("Failed to warm group %s week %s: %s", group_id, anchor, error)
+    return report
+
+
+def parse_at(at: str) -> tuple[int, int]:
+    """``"HH:MM"`` -> ``(час, минута)``; иначе ``ValueError`` с понятным текстом."""
+    try:
+        hour, minute = (int(part) for part in at.strip().split(":"))
+    except ValueError:
+        hour = minute = -1
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"WARMER_AT must be HH:MM, got {at!r}")
+    return hour, minute
+
+
+def _seconds_until(at: str, now: Optional[datetime] = None) -> float:
+    """Секунды до ближайшего ``HH:MM`` по локальному времени."""
+    now = now or datetime.now()
+    hour, minute = parse_at(at)
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_daily(at: str) -> None:
+    """Прогревает активные группы каждый день в ``at`` (``HH:MM``); ошибки только логируются."""
+    while True:
+        await asyncio.sleep(_seconds_until(at))
+        try:
+            await warm_active_groups()
+        except Exception:
+            logger.exception("Scheduled cache warm-up failed")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ruzbot.warmer",
+        description="Прогрев недель активных групп в Redis.",
+    )
+    parser.add_argument(
+        "--weeks", type=int, default=2, help="сколько недель начиная с текущей"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.warmer_concurrency,
+        help="одновременных запросов в backend",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    if not settings.redis_url:
+        print("Задайте REDIS_URL: прогревать без Redis некуда.", file=sys.stderr)
+        return 1
+
+    report = asyncio.run(
+        warm_active_groups(weeks=args.weeks, concurrency=args.concurrency)
+    )
+    print(report.summary())
+    for group_id, anchor, error in report.failures:
+        print(f"  group {group_id} week {anchor.isoformat()}: {error}")
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Микробатчинг загрузок недель групп: промахи кэша разных групп, пришедшие в
+пределах ``GROUP_WEEK_BATCH_WINDOW_S``, уходят в backend одной пачкой.
+
+Если клиент умеет запрашивать неделю сразу нескольких групп
+(``schedule.get_groups_week(group_oids, anchor)`` -> ``{oid: lessons}``),
+пачка одной недели — один HTTP-запрос. Иначе — параллельные одиночные
+запросы, не больше ``GROUP_WEEK_FANOUT`` одновременно. Каждый вызывающий
+получает свою неделю или свою ошибку.
+
+Пачки собираются по клиенту: с общим клиентом процесса
+(:func:`ruzbot.utils.start_ruz_client`) это все обработчики сразу.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Any, Awaitable, Callable, Optional
+
+from ruzbot import resilience
+from ruzbot.settings import settings
+
+logger = logging.getLogger(__name__)
+
+FetchOne = Callable[[Any, int, date], Awaitable[Any]]
+# ``None`` — backend не умеет пачки, нужен fan-out одиночными запросами.
+FetchMany = Callable[[Any, list[int], date], Awaitable[Optional[dict[Any, Any]]]]
+
+# (id клиента, группа, неделя)
+_Key = tuple[int, int, date]
+
+
+def _consume_result(future: asyncio.Future) -> None:
+    # Если все ожидающие отменены, исключение иначе попадёт в лог как «never retrieved».
+    if not future.cancelled():
+        future.exception()
+
+
+class GroupWeekBatcher:
+    def __init__(
+        self,
+        fetch_one: FetchOne,
+        fetch_many: Optional[FetchMany] = None,
+        *,
+        window_s: float,
+        max_batch: int,
+        fanout: int,
+    ) -> None:
+        self.fetch_one = fetch_one
+        self.fetch_many = fetch_many
+        self.window_s = window_s
+        self.max_batch = max(1, max_batch)
+        self.fanout = max(1, fanout)
+        self._pending: dict[_Key, asyncio.Future] = {}
+        self._clients: dict[int, Any] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._slots: Optional[tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+
+    async def get(self, client, group_oid: int, anchor: date) -> Any:
+        """Неделя группы; одинаковые запросы в одном окне делят один результат."""
+        if self.window_s <= 0:
+            return await self.fetch_one(client, group_oid, anchor)
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Окно прежнего цикла событий уже не сработает.
+            self._loop, self._pending, self._clients = loop, {}, {}
+            self._timer = None
+        key = (id(client), group_oid, anchor)
+        future = self._pending.get(key)
+        if future is None:
+            self._clients[id(client)] = client
+            future = self._pending[key] = loop.create_future()
+            future.add_done_callback(_consume_result)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_s, self._flush)
+
+        # Пачка общая и своего дедлайна не имеет; ждём её в пределах своего.
+        left = resilience.remaining()
+        if left is None:
+            return await asyncio.shield(future)
+        if left <= 0:
+            raise resilience.DeadlineExceeded("backend deadline exceeded")
+        return await asyncio.wait_for(asyncio.shield(future), left)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        clients, self._clients = self._clients, {}
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(clients, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(self.fanout))
+        return self._slots[1]
+
+    async def _run(
+        self, clients: dict[int, Any], batch: dict[_Key, asyncio.Future]
+    ) -> None:
+        # Задача унаследовала контекст первого вызывающего, его дедлайн не общий.
+        resilience.detach()
+        by_week: dict[tuple[int, date], list[int]] = defaultdict(list)
+        for client_id, group_oid, anchor in batch:
+            by_week[(client_id, anchor)].append(group_oid)
+        await asyncio.gather(
+            *(
+                self._run_week(clients[client_id], anchor, group_oids, batch)
+                for (client_id, anchor), group_oids in by_week.items()
+            )
+        )
+
+    async def _run_week(
+        self,
+        client,
+        anchor: date,
+        group_oids: list[int],
+        batch: dict[_Key, asyncio.Future],
+    ) -> None:
+        def settle(group_oid: int, result: Any = None, error: Any = None) -> None:
+            future = batch[(id(client), group_oid, anchor)]
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        weeks: dict[Any, Any] = {}
+        if self.fetch_many is not None and len(group_oids) > 1:
+            try:
+                weeks = await self.fetch_many(client, group_oids, anchor) or {}
+            except Exception as exc:
+                # Пачка уже повторялась в resilience; fan-out лишь умножил бы нагрузку.
+                for group_oid in group_oids:
+                    settle(group_oid, error=exc)
+                return
+
+        missing = []
+        for group_oid in group_oids:
+            # JSON-ответ приходит со строковыми ключами.
+            for key in (group_oid, str(group_oid)):
+                if key in weeks:
+                    settle(group_oid, weeks[key])
+                    break
+            else:
+                missing.append(group_oid)
+
+        async def fetch(group_oid: int) -> None:
+            async with self._semaphore():
+                try:
+                    settle(group_oid, await self.fetch_one(client, group_oid, anchor))
+                except Exception as exc:
+                    settle(group_oid, error=exc)
+
+        await asyncio.gather(*(fetch(group_oid) for group_oid in missing))
+
+
+async def _fetch_group_week(client, group_oid: int, anchor: date) -> Any:
+    return await resilience.call(
+        "group_week", lambda: client.schedule.get_group_week(group_oid, anchor)
+    )
+
+
+async def _fetch_group_weeks(
+    client, group_oids: list[int], anchor: date
+) -> Optional[dict[Any, Any]]:
+    fetch_many = getattr(client.schedule, "get_groups_week", None)
+    if fetch_many is None:
+        return None
+    return await resilience.call("group_week", lambda: fetch_many(group_oids, anchor))
+
+
+_batcher: Optional[GroupWeekBatcher] = None
+
+
+def batcher() -> GroupWeekBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = GroupWeekBatcher(
+            _fetch_group_week,
+            _fetch_group_weeks,
+            window_s=settings.group_week_batch_window_s,
+            max_batch=settings.group_week_batch_max,
+            fanout=settings.group_week_fanout,
+        )
+    return _batcher
+
+
+async def fetch_group_week(client, group_oid: int, anchor: date) -> Any:
+    """Неделя группы из backend через общий батчер процесса."""
+    return await batcher().get(client, group_oid, anchor)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from ruzbot import circuit  # noqa: E402
+
+
+class CircuitBreakerTests(TestCase):
+    def _breaker(self) -> circuit.CircuitBreaker:
+        return circuit.CircuitBreaker("test", failure_threshold=2, cooldown_s=10)
+
+    def test_opens_after_consecutive_failures(self) -> None:
+        breaker = self._breaker()
+
+        with patch.object(circuit.time, "monotonic", return_value=100.0):
+            self.assertFalse(breaker.record_failure())
+            self.assertTrue(breaker.record_failure())
+
+            self.assertEqual(breaker.state, circuit.OPEN)
+            self.assertFalse(breaker.allows_requests())
+            self.assertFalse(breaker.try_begin_probe())
+
+    def test_success_resets_failure_count(self) -> None:
+        breaker = self._breaker()
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, circuit.CLOSED)
+
+    def test_single_probe_after_cooldown(self) -> None:
+        breaker = self._breaker()
+        with patch.object(circuit.time, "monotonic", return_value=100.0):
+            breaker.record_failure()
+            breaker.record_failure()
+
+        with patch.object(circuit.time, "monotonic", return_value=111.0):
+            self.assertEqual(breaker.state, circuit.HALF_OPEN)
+            self.assertTrue(breaker.try_begin_probe())
+            self.assertFalse(breaker.try_begin_probe())
+            breaker.record_success()
+
+        self.assertEqual(breaker.state, circuit.CLOSED)
+        self.assertTrue(breaker.allows_requests())
+
+    def test_failed_probe_reopens_for_another_cooldown(self) -> None:
+        breaker = self._breaker()
+        with patch.object(circuit.time, "monotonic", return_value=100.0):
+            breaker.record_failure()
+            breaker.record_failure()
+
+        with patch.object(circuit.time, "monotonic", return_value=111.0):
+            self.assertTrue(breaker.try_begin_probe())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, circuit.OPEN)
+
+        with patch.object(circuit.time, "monotonic", return_value=122.0):
+            self.assertTrue(breaker.try_begin_probe())
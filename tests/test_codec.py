@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from unittest import TestCase, skipUnless
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from ruzbot import codec  # noqa: E402
+
+
+class PayloadCodecTests(TestCase):
+    def test_json_round_trip_with_format_byte(self) -> None:
+        value = {"discipline_name": "Физика", "lesson_id": 1}
+        raw = codec.encode(value, codec.CODECS["json"], -1)
+
+        self.assertEqual(raw[0], codec.CODECS["json"].tag)
+        self.assertEqual(codec.decode(raw), value)
+
+    def test_large_payload_is_compressed(self) -> None:
+        value = [{"discipline_name": "Математический анализ"}] * 200
+        raw = codec.encode(value, codec.CODECS["json"], 1024)
+
+        self.assertTrue(raw[0] & codec.COMPRESSED_FLAG)
+        self.assertLess(len(raw), len(codec.json_dumps(value).encode("utf-8")))
+        self.assertEqual(codec.decode(raw), value)
+
+    def test_legacy_json_text_is_still_readable(self) -> None:
+        value = [{"lesson_id": 1, "discipline_name": "Физика"}]
+        legacy = codec.json_dumps(value)
+
+        self.assertEqual(codec.decode(legacy.encode("utf-8")), value)
+        self.assertEqual(codec.decode(legacy), value)
+
+    def test_corrupted_payload_is_treated_as_miss(self) -> None:
+        raw = bytes((codec.CODECS["json"].tag | codec.COMPRESSED_FLAG,)) + b"junk"
+
+        self.assertIsNone(codec.decode(raw))
+
+    def test_unknown_codec_name_falls_back_to_json(self) -> None:
+        self.assertIs(codec.codec_named("protobuf"), codec.CODECS["json"])
+
+    @skipUnless("msgpack" in codec.CODECS, "msgpack is not installed")
+    def test_msgpack_round_trip(self) -> None:
+        value = {"value": [{"lesson_id": 1}], "soft_expires_at": 1.5}
+        raw = codec.encode(value, codec.CODECS["msgpack"], -1)
+
+        self.assertEqual(codec.decode(raw), value)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import sys
-from datetime import date
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from types import ModuleType, SimpleNamespace
 from unittest import IsolatedAsyncioTestCase
@@ -100,24 +102,161 @@ ruzclient_errors.RuzHttpError = RuzHttpError
 ruzclient.errors = ruzclient_errors
 
 
-from ruzbot import cache, commands  # noqa: E402
+from ruzbot import (  # noqa: E402
+    cache,
+    cache_inspect,
+    commands,
+    group_catalog,
+    metrics,
+    resilience,
+    search_handlers,
+    warmer,
+)
 
 
 def _redis_prefix() -> str:
     return (cache.settings.redis_key_prefix or "ruzbot").strip(":")
 
 
-class FakeRedisClient:
-    def __init__(self, keys: list[str]) -> None:
-        self._keys = keys
-        self.deleted: list[str] = []
+class FakePipeline:
+    def __init__(self, client: "InMemoryRedisClient") -> None:
+        self._client = client
+        self._calls: list[tuple[str, tuple, dict]] = []
 
-    async def delete(self, *keys: str) -> None:
-        self.deleted.extend(keys)
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        self._client.round_trips += 1
+        results = [
+            getattr(self._client, f"_{name}")(*args, **kwargs)
+            for name, args, kwargs in self._calls
+        ]
+        self._calls.clear()
+        return results
+
+
+class InMemoryRedisClient:
+    """Redis в памяти: публичные методы — отдельный round trip, pipeline — один."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.ttls: dict[str, int] = {}
+        self.reads: list[str] = []
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    def register_script(self, script: str):
+        async def invalidate_user(keys, args=(), client=None):
+            self.round_trips += 1
+            members = list(self.zsets.get(keys[0], {}))
+            self._delete(*members, *keys)
+            return len(members)
+
+        return invalidate_user
+
+    def __getattr__(self, name: str):
+        impl = getattr(type(self), f"_{name}", None)
+        if impl is None:
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            self.round_trips += 1
+            return impl(self, *args, **kwargs)
+
+        return call
+
+    def _get(self, key: str):
+        self.reads.append(key)
+        return self.values.get(key)
+
+    def _pttl(self, key: str) -> int:
+        if key not in self.values:
+            return -2
+        return self.ttls.get(key, -1) * 1000
+
+    def _set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.values[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
+
+    def _incr(self, key: str) -> int:
+        value = int(self.values.get(key) or 0) + 1
+        self.values[key] = str(value).encode()
+        return value
+
+    def _delete(self, *keys: str) -> None:
+        for key in keys:
+            self.values.pop(key, None)
+            self.zsets.pop(key, None)
+            self.ttls.pop(key, None)
+
+    def _rpush(self, key: str, *items) -> int:
+        self.values.setdefault(key, []).extend(items)
+        return len(self.values[key])
+
+    def _exists(self, *keys: str) -> int:
+        return sum(key in self.values for key in keys)
+
+    def _llen(self, key: str) -> int:
+        return len(self.values.get(key) or [])
+
+    def _lrange(self, key: str, start: int, end: int) -> list:
+        return list(self.values.get(key) or [])[start : end + 1]
+
+    def _rename(self, src: str, dst: str) -> bool:
+        self.values[dst] = self.values.pop(src)
+        self.ttls.pop(dst, None)
+        if src in self.ttls:
+            self.ttls[dst] = self.ttls.pop(src)
+        return True
+
+    def _zadd(self, name: str, mapping: dict[str, float]) -> int:
+        self.zsets.setdefault(name, {}).update(mapping)
+        return len(mapping)
+
+    def _zremrangebyscore(self, name: str, min_score, max_score) -> int:
+        zset = self.zsets.get(name, {})
+        expired = [member for member, score in zset.items() if score <= max_score]
+        for member in expired:
+            del zset[member]
+        return len(expired)
+
+    def _zrangebyscore(self, name: str, min_score, max_score) -> list[str]:
+        return [
+            member
+            for member, score in self.zsets.get(name, {}).items()
+            if score >= float(min_score)
+        ]
+
+    def _zrange(self, name: str, start: int, end: int) -> list[str]:
+        return list(self.zsets.get(name, {}))
+
+    def _expire(self, name: str, seconds: int) -> bool:
+        self.ttls[name] = seconds
+        return True
+
+    def _scan(self, cursor: int = 0, match: str = "*", count: int = 10):
+        prefix = match[:-1] if match.endswith("*") else match
+        keys = sorted(key for key in self.values if key.startswith(prefix))
+        page = keys[cursor : cursor + count]
+        next_cursor = cursor + count if cursor + count < len(keys) else 0
+        return next_cursor, page
+
+    def _memory_usage(self, key: str, samples: int | None = None):
+        value = self.values.get(key)
+        return None if value is None else 50 + len(value)
 
     async def scan_iter(self, match: str):
         prefix = match[:-1] if match.endswith("*") else match
-        for key in self._keys:
+        for key in list(self.values):
             if key.startswith(prefix):
                 yield key
 
@@ -142,63 +281,79 @@ class FakeGroupClient:
 
 
 class GroupScheduleCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
     def test_group_week_key_uses_group_prefix(self) -> None:
         key = cache.group_week_key(17, date(2026, 3, 26))
         self.assertEqual(
             key,
-            f"{_redis_prefix()}:group:17:schedule:week:2026-03-23",
+            f"{_redis_prefix()}:group:17:g0:schedule:week:2026-03-23",
+        )
+        self.assertEqual(
+            cache.group_week_key(17, date(2026, 3, 26), 3),
+            f"{_redis_prefix()}:group:17:g3:schedule:week:2026-03-23",
         )
 
     async def test_invalidate_user_keeps_group_schedule(self) -> None:
-        prefix = _redis_prefix()
-        profile_key = f"{prefix}:user:42:profile"
-        screen_key = f"{prefix}:user:42:screen:start"
-        old_user_week_key = f"{prefix}:user:42:schedule:week:2026-03-23"
-        old_user_day_key = f"{prefix}:user:42:schedule:day:2026-03-26"
-        group_week_key = f"{prefix}:group:55:schedule:week:2026-03-23"
-        fake = FakeRedisClient(
-            [
-                profile_key,
-                screen_key,
-                old_user_week_key,
-                old_user_day_key,
-                group_week_key,
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 26)
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_profile(42, AsyncMock(return_value={"id": 42}))
+            await cache.store_screen_snapshot(42, "start", text="hi")
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, AsyncMock(return_value=[])
+            )
+            await cache.get_or_load_subgroup_week(
+                55, 1, anchor, AsyncMock(return_value=({}, 0))
+            )
+            user_keys = [
+                cache.profile_key(42),
+                cache.screen_key(42, "start"),
             ]
-        )
+            self.assertEqual(set(fake.zsets[cache.user_index_key(42)]), set(user_keys))
+
+            await cache.invalidate_user(42)
+
+        for key in user_keys:
+            self.assertNotIn(key, fake.values)
+        self.assertNotIn(cache.user_index_key(42), fake.zsets)
+        self.assertIn(cache.group_week_key(55, anchor), fake.values)
+        self.assertIn(cache.subgroup_week_key(55, 1, anchor), fake.values)
+
+    async def test_invalidate_user_drops_legacy_profile_without_index(self) -> None:
+        fake = InMemoryRedisClient()
+        await fake.set(cache.profile_key(42), '{"id": 42}', ex=600)
 
         with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
             await cache.invalidate_user(42)
 
-        self.assertIn(profile_key, fake.deleted)
-        self.assertIn(screen_key, fake.deleted)
-        self.assertIn(old_user_week_key, fake.deleted)
-        self.assertIn(old_user_day_key, fake.deleted)
-        self.assertNotIn(group_week_key, fake.deleted)
+        self.assertNotIn(cache.profile_key(42), fake.values)
 
     async def test_get_user_week_lessons_filters_by_subgroup(self) -> None:
         cases = [
             (
                 0,
                 [
-                    {"sub_group": 0, "lesson_id": 1},
-                    {"sub_group": 1, "lesson_id": 2},
+                    {"sub_group": 0, "lesson_id": 1, "date": "2026-03-23"},
+                    {"sub_group": 1, "lesson_id": 2, "date": "2026-03-24"},
                 ],
                 [1, 2],
             ),
             (
                 1,
                 [
-                    {"sub_group": 0, "lesson_id": 3},
-                    {"sub_group": 1, "lesson_id": 4},
+                    {"sub_group": 0, "lesson_id": 3, "date": "2026-03-23"},
+                    {"sub_group": 1, "lesson_id": 4, "date": "2026-03-23"},
                 ],
                 [3, 4],
             ),
             (
                 "2",
                 [
-                    {"sub_group": 0, "lesson_id": 5},
-                    {"sub_group": "2", "lesson_id": 6},
-                    {"sub_group": 1, "lesson_id": 7},
+                    {"sub_group": 0, "lesson_id": 5, "date": "2026-03-24"},
+                    {"sub_group": "2", "lesson_id": 6, "date": "2026-03-25"},
+                    {"sub_group": 1, "lesson_id": 7, "date": "2026-03-25"},
                 ],
                 [5, 6],
             ),
@@ -211,13 +366,15 @@ class GroupScheduleCacheTests(IsolatedAsyncioTestCase):
                 return {"group_oid": 55, "subgroup": subgroup}
 
             async def fake_get_or_load_group_week_lessons(
-                group_id, anchor_date, loader
+                group_id, anchor_date, loader, **kwargs
             ):
                 self.assertEqual(group_id, 55)
                 return await loader(cache.week_anchor_date(anchor_date))
 
-            async def fake_get_or_load_user_week_lessons(user_id, anchor_date, loader):
-                self.assertEqual(user_id, 100)
+            async def fake_get_or_load_subgroup_week(
+                group_id, subgroup_id, anchor_date, loader, **kwargs
+            ):
+                self.assertEqual(group_id, 55)
                 return await loader(cache.week_anchor_date(anchor_date))
 
             with (
@@ -229,11 +386,11 @@ class GroupScheduleCacheTests(IsolatedAsyncioTestCase):
                 ),
                 patch.object(
                     commands.cache,
-                    "get_or_load_week_lessons",
-                    side_effect=fake_get_or_load_user_week_lessons,
+                    "get_or_load_subgroup_week",
+                    side_effect=fake_get_or_load_subgroup_week,
                 ),
             ):
-                _, filtered = await commands.get_user_week_lessons(
+                _, filtered, _ = await commands.get_user_week_lessons(
                     fake_client, 100, date(2026, 3, 26)
                 )
 
@@ -284,13 +441,1543 @@ class GroupScheduleCacheTests(IsolatedAsyncioTestCase):
                 AsyncMock(return_value=fake_client),
             ),
             patch.object(commands.cache, "invalidate_user", AsyncMock()),
+            patch.object(commands.cache, "prefetch_group_weeks") as prefetch,
         ):
             saved = await commands.setGroup(fake_bot, fake_callback, 55, "Group 55")
 
         self.assertTrue(saved)
+        prefetch.assert_called_once()
+        self.assertEqual(prefetch.call_args.args[0], 55)
         fake_client.users.create_user.assert_not_awaited()
         fake_client.users.update_user.assert_awaited_once()
         _, update_payload = fake_client.users.update_user.await_args.args
         self.assertEqual(update_payload.group_oid, 55)
         self.assertEqual(update_payload.group_guid, "guid-55")
         self.assertEqual(update_payload.group_name, "Group 55")
+
+    async def test_set_group_fetches_group_and_user_concurrently(self) -> None:
+        fake_client = SimpleNamespace(
+            users=SimpleNamespace(update_user=AsyncMock(), create_user=AsyncMock())
+        )
+        fake_bot = SimpleNamespace(reply_to=AsyncMock())
+        fake_callback = SimpleNamespace(
+            from_user=SimpleNamespace(id=42, username="alice"),
+            message=SimpleNamespace(),
+        )
+        user_started = asyncio.Event()
+
+        async def fetch_group(client, group_oid):
+            # Последовательные запросы здесь бы зависли.
+            await user_started.wait()
+            return {"guid": "guid-55", "name": "Group 55"}
+
+        async def fetch_user(client, user_id):
+            user_started.set()
+            return None
+
+        with (
+            patch.object(commands, "_fetch_group", fetch_group),
+            patch.object(commands, "_fetch_user", fetch_user),
+            patch.object(
+                commands, "ruz_client", return_value=_DummyAsyncContextManager()
+            ),
+            patch.object(
+                _DummyAsyncContextManager,
+                "__aenter__",
+                AsyncMock(return_value=fake_client),
+            ),
+            patch.object(commands.cache, "invalidate_user", AsyncMock()),
+            patch.object(commands.cache, "touch_active_group", AsyncMock()),
+            patch.object(commands.cache, "prefetch_group_weeks"),
+        ):
+            saved = await asyncio.wait_for(
+                commands.setGroup(fake_bot, fake_callback, 55, "Group 55"), 1
+            )
+
+        self.assertTrue(saved)
+        fake_client.users.create_user.assert_awaited_once()
+
+
+class LocalCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_profile_is_served_from_local_cache(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value={"id": 42, "group_oid": 55})
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            first = await cache.get_or_load_profile(42, loader)
+            second = await cache.get_or_load_profile(42, loader)
+
+        self.assertEqual(first, second)
+        loader.assert_awaited_once()
+        self.assertEqual(fake.reads, [cache.profile_key(42)])
+
+    async def test_local_ttl_does_not_outlive_redis_ttl(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.group_week_key(55, date(2026, 3, 26))
+        await fake.set(key, '[{"lesson_id": 1}]', ex=1)
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(cache.settings, "local_cache_ttl_s", 60),
+            patch.object(cache.time, "monotonic", return_value=1000.0),
+        ):
+            await cache._read_json_key(key, family=cache.FAMILY_GROUP_WEEK)
+
+        local = cache._local_caches[cache.FAMILY_GROUP_WEEK]
+        with patch.object(cache.time, "monotonic", return_value=1000.5):
+            self.assertEqual(local.get(key), [{"lesson_id": 1}])
+        with patch.object(cache.time, "monotonic", return_value=1001.5):
+            self.assertIsNone(local.get(key))
+
+    async def test_local_cache_evicts_least_recently_used(self) -> None:
+        local = cache._LocalCache(2)
+        local.set("a", 1, 60)
+        local.set("b", 2, 60)
+        local.get("a")
+        local.set("c", 3, 60)
+
+        self.assertEqual(local.get("a"), 1)
+        self.assertIsNone(local.get("b"))
+        self.assertEqual(local.get("c"), 3)
+
+    async def test_invalidate_user_drops_local_entries(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value={"id": 42})
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_profile(42, loader)
+            await cache.invalidate_user(42)
+            await cache.get_or_load_profile(42, loader)
+
+        self.assertEqual(loader.await_count, 2)
+
+
+class SingleFlightTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_concurrent_misses_share_one_load(self) -> None:
+        release = asyncio.Event()
+        calls = []
+
+        async def loader(anchor):
+            calls.append(anchor)
+            await release.wait()
+            return [{"lesson_id": 1}]
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            waiters = [
+                asyncio.create_task(
+                    cache.get_or_load_group_week_lessons(55, date(2026, 3, 26), loader)
+                )
+                for _ in range(5)
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*waiters)
+
+        self.assertEqual(calls, [date(2026, 3, 23)])
+        self.assertTrue(all(result == [{"lesson_id": 1}] for result in results))
+        self.assertEqual(cache._inflight, {})
+
+    async def test_loader_exception_reaches_every_waiter(self) -> None:
+        release = asyncio.Event()
+        loader = AsyncMock(side_effect=RuzHttpError(503))
+
+        async def slow_loader():
+            await release.wait()
+            return await loader()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            waiters = [
+                asyncio.create_task(cache.get_or_load_profile(42, slow_loader))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        loader.assert_awaited_once()
+        self.assertTrue(all(isinstance(result, RuzHttpError) for result in results))
+        self.assertEqual(cache._inflight, {})
+
+
+    async def test_shared_load_is_not_bound_by_the_starters_deadline(self) -> None:
+        resilience.reset()
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return {"id": 42}
+
+        async def loader():
+            return await resilience.call("profile", request)
+
+        async def handler(budget_s):
+            with resilience.deadline(budget_s):
+                return await cache.get_or_load_profile(42, loader)
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            hurried = asyncio.create_task(handler(0.02))
+            await asyncio.sleep(0)
+            patient = asyncio.create_task(handler(5))
+            results = await asyncio.gather(hurried, patient, return_exceptions=True)
+
+        self.assertIsInstance(results[0], asyncio.TimeoutError)
+        self.assertEqual(results[1], {"id": 42})
+        self.assertEqual(calls, [1])
+        self.assertEqual(cache._inflight, {})
+
+
+class GroupWeekSoftExpiryTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_stale_week_is_served_and_refreshed_in_background(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.group_week_key(55, date(2026, 3, 26))
+        stale = {"value": [{"lesson_id": 1}], "soft_expires_at": 0}
+        await fake.set(key, cache._json_dumps(stale), ex=600)
+        loader = AsyncMock(return_value=[{"lesson_id": 2}])
+        refresh_loader = AsyncMock(return_value=[{"lesson_id": 3}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            lessons = await cache.get_or_load_group_week_lessons(
+                55, date(2026, 3, 26), loader, refresh_loader=refresh_loader
+            )
+            self.assertEqual(lessons, [{"lesson_id": 1}])
+            await asyncio.gather(*cache._inflight.values())
+            refreshed = await cache.get_or_load_group_week_lessons(
+                55, date(2026, 3, 26), loader, refresh_loader=refresh_loader
+            )
+
+        loader.assert_not_awaited()
+        refresh_loader.assert_awaited_once_with(date(2026, 3, 23))
+        self.assertEqual(refreshed, [{"lesson_id": 3}])
+        self.assertGreater(
+            fake.ttls[key], cache.settings.redis_group_schedule_stale_s
+        )
+
+    async def test_background_refresh_does_not_join_handler_batch(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.group_week_key(55, date(2026, 3, 26))
+        stale = {"value": [{"lesson_id": 1}], "soft_expires_at": 0}
+        await fake.set(key, cache._json_dumps(stale), ex=600)
+        loader = AsyncMock(return_value=[{"lesson_id": 2}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            async with cache.batch() as current:
+                await cache.get_or_load_group_week_lessons(55, date(2026, 3, 26), loader)
+                await asyncio.gather(*cache._inflight.values())
+                self.assertEqual(current.writes, {})
+
+        self.assertEqual(cache._decode_payload(fake.values[key])["value"], [{"lesson_id": 2}])
+
+    async def test_no_background_refresh_while_backend_breaker_is_open(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.group_week_key(55, date(2026, 3, 26))
+        stale = {"value": [{"lesson_id": 1}], "soft_expires_at": 0}
+        await fake.set(key, cache._json_dumps(stale), ex=600)
+        loader = AsyncMock(return_value=[{"lesson_id": 2}])
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+        for _ in range(resilience._breaker.failure_threshold):
+            resilience._breaker.record_failure()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            lessons = await cache.get_or_load_group_week_lessons(
+                55, date(2026, 3, 26), loader
+            )
+
+        self.assertEqual(lessons, [{"lesson_id": 1}])
+        self.assertEqual(cache._inflight, {})
+        loader.assert_not_awaited()
+
+    def test_jittered_ttl_stays_within_ratio(self) -> None:
+        with patch.object(cache.settings, "redis_ttl_jitter_ratio", 0.1):
+            ttls = {cache._jittered_ttl(1000) for _ in range(200)}
+
+        self.assertTrue(all(900 <= ttl <= 1100 for ttl in ttls))
+        self.assertGreater(len(ttls), 1)
+
+
+class BatchedUserViewTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_warm_user_week_reads_shared_subgroup_view(self) -> None:
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 26)
+        for user_id in (100, 101):
+            await fake.set(
+                cache.profile_key(user_id),
+                cache._json_dumps({"group_oid": 55, "subgroup": 1}),
+                ex=600,
+            )
+        await fake.set(
+            cache.subgroup_week_key(55, 1, anchor),
+            cache._json_dumps(
+                {
+                    "days": {"2026-03-26": [{"lesson_id": 1, "date": "2026-03-26"}]},
+                    "group_week_version": 1,
+                }
+            ),
+            ex=600,
+        )
+        fake.round_trips = 0
+        fake_client = FakeClient([])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            user, lessons, _ = await commands.get_user_week_lessons(
+                fake_client, 100, anchor
+            )
+            # Профиль, поколение группы и неделя подгруппы; записей нет.
+            self.assertEqual(fake.round_trips, 3)
+            _, other_lessons, _ = await commands.get_user_week_lessons(
+                fake_client, 101, anchor
+            )
+
+        self.assertEqual(user["group_oid"], 55)
+        self.assertEqual([lesson["lesson_id"] for lesson in lessons], [1])
+        self.assertEqual(other_lessons, lessons)
+        self.assertNotIn(cache.user_index_key(100), fake.zsets)
+        fake_client.schedule.get_group_week.assert_not_awaited()
+
+    async def test_subgroup_is_filtered_once_per_group_week(self) -> None:
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 26)
+        fake_client = FakeClient(
+            [
+                {"sub_group": 1, "lesson_id": 1, "date": "2026-03-24"},
+                {"sub_group": 2, "lesson_id": 2, "date": "2026-03-26"},
+            ]
+        )
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(
+                commands,
+                "_filter_lessons_for_subgroup",
+                wraps=commands._filter_lessons_for_subgroup,
+            ) as filter_lessons,
+        ):
+            for _ in range(3):
+                view, _ = await commands._subgroup_week_view(
+                    fake_client, 55, 2, anchor, 0
+                )
+
+        filter_lessons.assert_called_once()
+        self.assertEqual(list(view), ["2026-03-26"])
+        fake_client.schedule.get_group_week.assert_awaited_once()
+
+    async def test_writes_outside_batch_are_not_deferred(self) -> None:
+        fake = InMemoryRedisClient()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            async with cache.batch():
+                pass
+            await cache.get_or_load_profile(42, AsyncMock(return_value={"id": 42}))
+
+        self.assertIn(cache.profile_key(42), fake.values)
+
+
+class NegativeCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_missing_profile_is_cached_until_invalidated(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value=None)
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            self.assertIsNone(await cache.get_or_load_profile(42, loader))
+            self.assertIsNone(await cache.get_or_load_profile(42, loader))
+            loader.assert_awaited_once()
+            self.assertEqual(
+                fake.ttls[cache.profile_key(42)], cache.settings.redis_ttl_negative_s
+            )
+
+            await cache.invalidate_user(42)
+            loader.return_value = {"id": 42}
+            profile = await cache.get_or_load_profile(42, loader)
+
+        self.assertEqual(profile, {"id": 42})
+        self.assertEqual(loader.await_count, 2)
+
+    async def test_fetch_group_caches_404(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_client = FakeGroupClient(RuzHttpError(404))
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            self.assertIsNone(await commands._fetch_group(fake_client, 55))
+            self.assertIsNone(await commands._fetch_group(fake_client, 55))
+
+        fake_client.groups.get_group.assert_awaited_once_with(55)
+        self.assertTrue(
+            cache.is_negative_entry(
+                cache._decode_payload(fake.values[cache.group_meta_key(55)])
+            )
+        )
+
+
+class RenderCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    def test_render_key_uses_week_anchor_for_week_view(self) -> None:
+        self.assertEqual(
+            cache.render_key(55, 1, "week", date(2026, 3, 26)),
+            f"{_redis_prefix()}:group:55:g0:render:default:1:week:2026-03-23",
+        )
+        self.assertEqual(
+            cache.render_key(55, 1, "day", date(2026, 3, 26), "criminal"),
+            f"{_redis_prefix()}:group:55:g0:render:criminal:1:day:2026-03-26",
+        )
+
+    async def test_week_is_rendered_once_per_subgroup(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        week_view = AsyncMock(return_value=({}, 0))
+
+        async def fake_fetch_user(client, user_id):
+            return {"group_oid": 55, "subgroup": 1}
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(commands, "_fetch_user", side_effect=fake_fetch_user),
+            patch.object(commands, "_subgroup_week_view", week_view),
+            patch.object(commands.cache, "prefetch_group_weeks") as prefetch,
+        ):
+            await commands.weekCommand(fake_bot, message, "0", user_id=100)
+            await commands.weekCommand(fake_bot, message, "0", user_id=101)
+
+        week_view.assert_awaited_once()
+        self.assertEqual(prefetch.call_count, 2)
+        first, second = fake_bot.edit_message_text.await_args_list
+        # Без строки «Последнее обновление»: она добавляется на каждый запрос.
+        self.assertEqual(
+            first.kwargs["text"].rsplit("\n\n", 1)[0],
+            second.kwargs["text"].rsplit("\n\n", 1)[0],
+        )
+
+
+class RedisBreakerTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+        cache._redis_breaker.reset()
+
+    def tearDown(self) -> None:
+        cache._redis_breaker.reset()
+
+    async def test_redis_is_skipped_after_repeated_failures(self) -> None:
+        broken = SimpleNamespace(
+            get=AsyncMock(side_effect=ConnectionError("down")),
+            ping=AsyncMock(return_value=True),
+        )
+        fake_redis = SimpleNamespace(from_url=lambda *args, **kwargs: broken)
+        threshold = cache._redis_breaker.failure_threshold
+
+        with (
+            patch.object(cache, "redis", fake_redis),
+            patch.object(cache, "_redis_client", None),
+            patch.object(cache.settings, "redis_url", "redis://example"),
+        ):
+            for _ in range(threshold + 2):
+                self.assertIsNone(await cache._read_json_key("some-key"))
+            self.assertEqual(broken.get.await_count, threshold)
+
+            with patch.object(cache._redis_breaker, "cooldown_s", 0):
+                self.assertIsNone(await cache.get_redis_client())
+                await cache._redis_probe_task
+
+            self.assertIs(await cache.get_redis_client(), broken)
+        broken.ping.assert_awaited_once()
+
+    async def test_encode_errors_do_not_trip_the_breaker(self) -> None:
+        fake_client = InMemoryRedisClient()
+
+        async def fake_get_client():
+            return fake_client
+
+        with (
+            patch.object(cache, "get_redis_client", fake_get_client),
+            patch.object(cache, "_encode_payload", side_effect=TypeError("bad")),
+            self.assertLogs(cache.logger, "ERROR"),
+        ):
+            for _ in range(cache._redis_breaker.failure_threshold + 1):
+                await cache._store_json_key("some-key", {"x": 1}, 60)
+
+        self.assertTrue(cache._redis_breaker.allows_requests())
+        self.assertNotIn("some-key", fake_client.values)
+
+
+class CacheMetricsTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+        metrics.reset()
+
+    async def test_lookups_are_counted_per_family(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(
+            return_value=({"2026-03-25": [{"discipline": "Math"}]}, 0)
+        )
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_subgroup_week(7, 1, date(2026, 3, 25), loader)
+            await cache.get_or_load_subgroup_week(7, 1, date(2026, 3, 25), loader)
+
+        lookups = metrics.CACHE_LOOKUPS
+        self.assertEqual(
+            metrics.counter_value(lookups, family="subgroup_week", result="miss"), 1
+        )
+        self.assertEqual(
+            metrics.counter_value(lookups, family="subgroup_week", result="hit"), 1
+        )
+        self.assertEqual(
+            metrics.histogram_count(metrics.LOADER_SECONDS, family="subgroup_week"), 1
+        )
+        # Второй раз неделя подгруппы берётся из L1.
+        self.assertEqual(metrics.histogram_count(metrics.REDIS_SECONDS, op="read"), 1)
+        self.assertEqual(
+            metrics.counter_value(
+                metrics.CACHE_READS, family="subgroup_week", source="local", result="hit"
+            ),
+            1,
+        )
+        self.assertEqual(metrics.histogram_count(metrics.REDIS_SECONDS, op="write"), 1)
+
+
+class PrefetchTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def asyncTearDown(self) -> None:
+        await asyncio.gather(*cache._prefetch_tasks.values())
+
+    async def test_adjacent_weeks_are_loaded_once_in_background(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value=[{"lesson_id": 1}])
+        anchors = [date(2026, 3, 16), date(2026, 3, 30)]
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            cache.prefetch_group_weeks(55, anchors, loader)
+            cache.prefetch_group_weeks(55, anchors, loader)
+            self.assertEqual(len(cache._prefetch_tasks), 2)
+            await asyncio.gather(*cache._prefetch_tasks.values())
+
+            # Уже в кэше — повторно не грузится.
+            cache.prefetch_group_weeks(55, anchors, loader)
+
+        self.assertEqual(loader.await_count, 2)
+        self.assertEqual(cache._prefetch_tasks, {})
+        self.assertIn(cache.group_week_key(55, date(2026, 3, 30)), fake.values)
+
+    async def test_prefetch_queue_is_bounded(self) -> None:
+        loader = AsyncMock(return_value=[])
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=None)),
+            patch.object(cache.settings, "prefetch_max_pending", 1),
+        ):
+            cache.prefetch_group_weeks(
+                55, [date(2026, 3, 16), date(2026, 3, 30)], loader
+            )
+            self.assertEqual(len(cache._prefetch_tasks), 1)
+            await asyncio.gather(*cache._prefetch_tasks.values())
+
+        loader.assert_awaited_once()
+
+    async def test_nothing_is_scheduled_while_backend_breaker_is_open(self) -> None:
+        loader = AsyncMock(return_value=[])
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+        for _ in range(resilience._breaker.failure_threshold):
+            resilience._breaker.record_failure()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            cache.prefetch_group_weeks(55, [date(2026, 3, 16)], loader)
+
+        self.assertEqual(cache._prefetch_tasks, {})
+        loader.assert_not_awaited()
+
+    async def test_prefetch_does_not_join_handler_batch(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value=[{"lesson_id": 1}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            async with cache.batch() as current:
+                cache.prefetch_group_weeks(55, [date(2026, 3, 30)], loader)
+                await asyncio.gather(*cache._prefetch_tasks.values())
+                self.assertEqual(current.writes, {})
+
+        self.assertIn(cache.group_week_key(55, date(2026, 3, 30)), fake.values)
+
+
+class WarmerTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+        cache._active_touched.clear()
+
+    async def test_active_groups_are_tracked_and_trimmed(self) -> None:
+        fake = InMemoryRedisClient()
+        fake.zsets[cache.active_groups_key()] = {"77": 0.0}
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.touch_active_group(55)
+            await cache.touch_active_group(55)
+            group_ids = await cache.active_group_ids(86400)
+
+        self.assertEqual(group_ids, [55])
+        self.assertNotIn("77", fake.zsets[cache.active_groups_key()])
+        # Повторная отметка в пределах часа не ходит в Redis.
+        self.assertEqual(fake.round_trips, 2)
+
+    async def test_warm_groups_refreshes_current_and_next_week(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_client = FakeClient([{"lesson_id": 1}])
+        fake_client.schedule.get_group_week.side_effect = _group_week_or_503
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            report = await warmer.warm_groups(
+                fake_client, [55, 66], today=date(2026, 3, 26), concurrency=2
+            )
+
+        # 66 не загрузилась ни одной недели — прогретой не считается.
+        self.assertEqual(report.groups, 1)
+        self.assertEqual(report.weeks_warmed, 2)
+        self.assertEqual(
+            [(group_id, anchor) for group_id, anchor, _ in report.failures],
+            [(66, date(2026, 3, 23)), (66, date(2026, 3, 30))],
+        )
+        self.assertIn(cache.group_week_key(55, date(2026, 3, 23)), fake.values)
+        self.assertIn(cache.group_week_key(55, date(2026, 3, 30)), fake.values)
+
+    def test_seconds_until_wraps_to_next_day(self) -> None:
+        now = datetime(2026, 3, 26, 7, 0)
+        self.assertEqual(warmer._seconds_until("06:30", now), 23.5 * 3600)
+        self.assertEqual(warmer._seconds_until("07:30", now), 1800)
+
+    def test_parse_at_rejects_malformed_time(self) -> None:
+        self.assertEqual(warmer.parse_at("06:05"), (6, 5))
+        for bad in ("6", "24:00", "06:60", "six:30", "06:30:00"):
+            with self.assertRaisesRegex(ValueError, "WARMER_AT"):
+                warmer.parse_at(bad)
+
+
+class DirectoryCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_pages_are_served_from_redis_list(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value=[{"id": i} for i in range(14)])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            first, total, page = await cache.get_directory_page("lecturers", 0, 6, loader)
+            fake.round_trips = 0
+            last, _, last_page = await cache.get_directory_page(
+                "lecturers", -1, 6, loader
+            )
+            wrapped, _, wrapped_page = await cache.get_directory_page(
+                "lecturers", 3, 6, loader
+            )
+
+        loader.assert_awaited_once()
+        self.assertEqual((total, page), (14, 0))
+        self.assertEqual([item["id"] for item in first], [0, 1, 2, 3, 4, 5])
+        self.assertEqual(([item["id"] for item in last], last_page), ([12, 13], 2))
+        self.assertEqual(
+            ([item["id"] for item in wrapped], wrapped_page), ([0, 1, 2, 3, 4, 5], 0)
+        )
+        # Страница 0 с первого раза; -1 и 3 за концом списка — ещё по одному LRANGE.
+        self.assertEqual(fake.round_trips, 4)
+        self.assertEqual(len(fake.values[cache.directory_key("lecturers")]), 14)
+
+    async def test_old_directory_is_served_and_replaced_in_background(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.directory_key("disciplines")
+        await fake.rpush(key, cache._encode_payload({"id": 1, "name": "Old"}))
+        await fake.expire(key, cache.settings.redis_ttl_directory_s - 7200)
+        loader = AsyncMock(return_value=[{"id": 2, "name": "New"}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            items, total, _ = await cache.get_directory_page("disciplines", 0, 6, loader)
+            await cache._inflight[key]
+
+        self.assertEqual((items, total), ([{"id": 1, "name": "Old"}], 1))
+        loader.assert_awaited_once()
+        self.assertEqual(
+            [cache._decode_payload(raw) for raw in fake.values[key]],
+            [{"id": 2, "name": "New"}],
+        )
+        self.assertEqual(fake.ttls[key], cache.settings.redis_ttl_directory_s)
+        self.assertEqual([k for k in fake.values if ":tmp:" in k], [])
+
+    async def test_empty_directory_is_cached(self) -> None:
+        fake = InMemoryRedisClient()
+        loader = AsyncMock(return_value=[])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            first = await cache.get_directory_page("lecturers", 0, 6, loader)
+            again = await cache.get_directory_page("lecturers", 2, 6, loader)
+
+        loader.assert_awaited_once()
+        self.assertEqual(first, ([], 0, 0))
+        self.assertEqual(again, ([], 0, 0))
+        empty_key = f"{cache.directory_key('lecturers')}:empty"
+        self.assertEqual(fake.ttls[empty_key], cache.settings.redis_ttl_directory_s)
+        self.assertEqual(cache_inspect.classify_key(empty_key), "directory")
+
+        # Справочник снова не пуст — отметка пустоты уходит вместе с заменой.
+        loader.return_value = [{"id": 1}]
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache._load_directory(cache.directory_key("lecturers"), loader)
+        self.assertNotIn(empty_key, fake.values)
+
+    async def test_directory_without_ttl_is_refreshed(self) -> None:
+        fake = InMemoryRedisClient()
+        key = cache.directory_key("lecturers")
+        await fake.rpush(key, cache._encode_payload({"id": 1}))
+        loader = AsyncMock(return_value=[{"id": 2}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            items, _, _ = await cache.get_directory_page("lecturers", 0, 6, loader)
+            await cache._inflight[key]
+
+        self.assertEqual(items, [{"id": 1}])
+        loader.assert_awaited_once()
+        self.assertEqual(fake.ttls[key], cache.settings.redis_ttl_directory_s)
+
+    async def test_directory_without_redis_is_sliced_in_memory(self) -> None:
+        loader = AsyncMock(return_value=[{"id": i} for i in range(8)])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            items, total, page = await cache.get_directory_page("lecturers", 1, 6, loader)
+
+        self.assertEqual(([item["id"] for item in items], total, page), ([6, 7], 8, 1))
+
+
+class EntityCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_batch_lookup_reads_once_and_loads_only_misses(self) -> None:
+        fake = InMemoryRedisClient()
+        await fake.set(cache.lecturer_key(1), cache._encode_payload({"id": 1}), ex=600)
+        fake.round_trips = 0
+
+        async def load(lecturer_id):
+            return None if lecturer_id == 3 else {"id": lecturer_id}
+
+        loader = AsyncMock(side_effect=load)
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            found = await cache.get_or_load_lecturers([1, 2, 3], loader)
+            # Одно чтение всех ключей и один flush записей.
+            self.assertEqual(fake.round_trips, 2)
+            again = await cache.get_or_load_lecturers([1, 2, 3], loader)
+
+        self.assertEqual(found, {1: {"id": 1}, 2: {"id": 2}})
+        self.assertEqual(again, found)
+        self.assertEqual(
+            sorted(call.args[0] for call in loader.await_args_list), [2, 3]
+        )
+        missing = cache._decode_payload(fake.values[cache.lecturer_key(3)])
+        self.assertTrue(cache.is_negative_entry(missing))
+
+    async def test_cached_card_does_not_open_backend_client(self) -> None:
+        fake = InMemoryRedisClient()
+        await fake.set(
+            cache.lecturer_key(7),
+            cache._encode_payload({"id": 7, "full_name": "Ivanov"}),
+            ex=600,
+        )
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(search_handlers, "ruz_client") as client,
+        ):
+            await search_handlers.teacher_card_command(
+                fake_bot, message, 7, 0, user_id=42
+            )
+
+        client.assert_not_called()
+        self.assertIn("Ivanov", fake_bot.edit_message_text.await_args.kwargs["text"])
+
+
+    async def test_card_prefetch_runs_in_background_and_swallows_errors(self) -> None:
+        fake = InMemoryRedisClient()
+        await fake.set(cache.lecturer_key(1), cache._encode_payload({"id": 1}), ex=600)
+
+        async def load(lecturer_id):
+            if lecturer_id == 3:
+                raise asyncio.TimeoutError()
+            return {"id": lecturer_id}
+
+        loader = AsyncMock(side_effect=load)
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_lecturer(1, AsyncMock())
+            cache.prefetch_lecturers([1, 2, 3], loader)
+            loader.assert_not_awaited()
+            await asyncio.gather(*cache._prefetch_tasks.values())
+
+        # Закэшированная карточка 1 в пачку не попала.
+        self.assertEqual(
+            sorted(call.args[0] for call in loader.await_args_list), [2, 3]
+        )
+        self.assertEqual(cache._prefetch_tasks, {})
+
+class EntityScheduleCacheTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_lecturer_days_are_served_from_one_cached_week(self) -> None:
+        fake = InMemoryRedisClient()
+        lessons = [
+            {"lesson_id": 1, "date": "2026-03-23"},
+            {"lesson_id": 2, "date": "2026-03-26"},
+        ]
+        fake_client = SimpleNamespace(
+            search=SimpleNamespace(
+                lecturer_week=AsyncMock(return_value=lessons),
+                lecturer_day=AsyncMock(),
+            )
+        )
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(
+                search_handlers,
+                "ruz_client",
+                return_value=_DummyAsyncContextManager(),
+            ),
+            patch.object(
+                _DummyAsyncContextManager,
+                "__aenter__",
+                AsyncMock(return_value=fake_client),
+            ),
+        ):
+            days = []
+            for day in (23, 24, 26):
+                week = await search_handlers._lecturer_week(7, date(2026, 3, day))
+                days.append(
+                    search_handlers._lessons_on(week, datetime(2026, 3, day))
+                )
+
+        fake_client.search.lecturer_week.assert_awaited_once_with(
+            7, date(2026, 3, 23)
+        )
+        fake_client.search.lecturer_day.assert_not_awaited()
+        self.assertEqual(
+            [[lesson["lesson_id"] for lesson in day] for day in days], [[1], [], [2]]
+        )
+        envelope = cache._decode_payload(
+            fake.values[cache.lecturer_week_key(7, date(2026, 3, 25))]
+        )
+        self.assertIn("soft_expires_at", envelope)
+
+    async def test_week_screen_survives_card_error_and_loads_concurrently(
+        self,
+    ) -> None:
+        errors = [
+            RuzHttpError(500),
+            asyncio.TimeoutError(),
+            resilience.DeadlineExceeded("backend deadline exceeded"),
+            resilience.BackendUnavailable("backend circuit is open"),
+            # aiohttp.ClientError (или OSError, если aiohttp не установлен).
+            resilience.ClientError("connection reset"),
+        ]
+        for error in errors:
+            with self.subTest(error=type(error).__name__):
+                card_started = asyncio.Event()
+
+                async def lecturer_week(lecturer_id, anchor_date):
+                    await card_started.wait()
+                    return []
+
+                async def fetch_lecturer(lecturer_id):
+                    card_started.set()
+                    raise error
+
+                fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+                message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+                with (
+                    patch.object(
+                        cache, "get_redis_client", AsyncMock(return_value=None)
+                    ),
+                    patch.object(search_handlers, "_lecturer_week", lecturer_week),
+                    patch.object(search_handlers, "_fetch_lecturer", fetch_lecturer),
+                ):
+                    await asyncio.wait_for(
+                        search_handlers.lecturer_week_command(
+                            fake_bot, message, 7, 0, 0, user_id=42, from_user_week=0
+                        ),
+                        1,
+                    )
+
+                fake_bot.edit_message_text.assert_awaited_once()
+                text = fake_bot.edit_message_text.await_args.kwargs["text"]
+                self.assertNotIn("👤", text)
+
+    async def test_week_screen_shows_error_when_backend_times_out(self) -> None:
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+
+        async def lecturer_week(lecturer_id, anchor_date):
+            return await resilience.call("lecturer_week", lambda: asyncio.sleep(5))
+
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=None)),
+            patch.object(search_handlers, "_lecturer_week", lecturer_week),
+            patch.object(
+                search_handlers, "_fetch_lecturer", AsyncMock(return_value=None)
+            ),
+            patch.object(resilience.settings, "backend_retries", 0),
+            resilience.deadline(0.05),
+        ):
+            await asyncio.wait_for(
+                search_handlers.lecturer_week_command(
+                    fake_bot, message, 7, 0, 0, user_id=42, from_user_week=0
+                ),
+                1,
+            )
+
+        text = fake_bot.edit_message_text.await_args.kwargs["text"]
+        self.assertIn("сервер не отвечает", text)
+
+    async def test_discipline_week_misses_share_one_load(self) -> None:
+        release = asyncio.Event()
+
+        async def slow_load(anchor):
+            await release.wait()
+            return [{"lesson_id": 3, "date": anchor.isoformat()}]
+
+        loader = AsyncMock(side_effect=slow_load)
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=None)):
+            waiters = [
+                asyncio.create_task(
+                    cache.get_or_load_discipline_week(9, date(2026, 3, 25), loader)
+                )
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(*waiters)
+
+        loader.assert_awaited_once()
+        self.assertEqual(results[0], results[2])
+
+
+class GroupCatalogTests(IsolatedAsyncioTestCase):
+    GROUPS = [
+        {"oid": 1, "name": "МС-221"},
+        {"oid": 2, "name": "МС222"},
+        {"oid": 3, "name": "ИС221"},
+        {"oid": 4, "name": "МС 2231"},
+    ]
+
+    def tearDown(self) -> None:
+        group_catalog._catalog = None
+        group_catalog._failed_at = None
+
+    def test_search_ignores_case_dashes_and_latin_lookalikes(self) -> None:
+        catalog = group_catalog.GroupCatalog.build(self.GROUPS)
+
+        def oids(query):
+            return [group["oid"] for group in catalog.search(query)]
+
+        self.assertEqual(oids("mc22"), [1, 2, 4])
+        self.assertEqual(oids("мс 221"), [1])
+        self.assertEqual(oids("Mc-2231"), [4])
+        self.assertEqual(oids("ис2"), [3])
+        self.assertEqual(oids("бис"), [])
+
+    async def test_backend_is_used_only_while_catalog_is_cold(self) -> None:
+        fake_client = SimpleNamespace(
+            groups=SimpleNamespace(
+                search_groups_by_name=AsyncMock(return_value=[self.GROUPS[0]]),
+                list_groups=AsyncMock(return_value=self.GROUPS),
+            )
+        )
+
+        with (
+            patch.object(
+                group_catalog, "ruz_client", return_value=_DummyAsyncContextManager()
+            ),
+            patch.object(
+                _DummyAsyncContextManager,
+                "__aenter__",
+                AsyncMock(return_value=fake_client),
+            ),
+        ):
+            cold = await group_catalog.search_groups("МС-221")
+            await group_catalog._refresh_task
+            warm = await group_catalog.search_groups("мс221")
+            typo = await group_catalog.search_groups("мс9")
+
+        self.assertEqual(cold, [self.GROUPS[0]])
+        self.assertEqual(warm, [self.GROUPS[0]])
+        self.assertEqual(typo, [])
+        fake_client.groups.search_groups_by_name.assert_awaited_once_with("МС-221")
+        fake_client.groups.list_groups.assert_awaited_once()
+
+    async def test_failed_cold_refresh_is_not_repeated_on_every_lookup(self) -> None:
+        fake_client = SimpleNamespace(
+            groups=SimpleNamespace(
+                search_groups_by_name=AsyncMock(return_value=[self.GROUPS[0]]),
+                list_groups=AsyncMock(side_effect=RuzHttpError(503)),
+            )
+        )
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+
+        with (
+            patch.object(
+                group_catalog, "ruz_client", return_value=_DummyAsyncContextManager()
+            ),
+            patch.object(
+                _DummyAsyncContextManager,
+                "__aenter__",
+                AsyncMock(return_value=fake_client),
+            ),
+            patch.object(group_catalog.settings, "backend_retries", 0),
+        ):
+            await group_catalog.search_groups("МС-221")
+            await asyncio.gather(group_catalog._refresh_task, return_exceptions=True)
+            await group_catalog.search_groups("МС-221")
+            self.assertIsNone(group_catalog._refresh_task)
+
+            # Пауза истекла — следующий поиск снова пробует загрузить каталог.
+            group_catalog._failed_at -= group_catalog.settings.group_catalog_retry_s
+            await group_catalog.search_groups("МС-221")
+            self.assertIsNotNone(group_catalog._refresh_task)
+            await asyncio.gather(group_catalog._refresh_task, return_exceptions=True)
+
+        self.assertEqual(fake_client.groups.list_groups.await_count, 2)
+        self.assertEqual(fake_client.groups.search_groups_by_name.await_count, 3)
+
+    async def test_large_hit_list_is_paginated(self) -> None:
+        groups = [{"oid": i, "name": f"МС2{i:02d}"} for i in range(20)]
+        fake_bot = SimpleNamespace(reply_to=AsyncMock(), edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+
+        await commands.sendGroupChoices(fake_bot, message, "MC-2", groups)
+        await commands.sendGroupChoices(
+            fake_bot, message, "MC-2", groups, page=2, edit=True
+        )
+
+        first = fake_bot.reply_to.await_args.kwargs["reply_markup"].keyboard
+        self.assertEqual(len(first), commands._GROUP_PAGE_SIZE + 1)
+        self.assertEqual(
+            [button.callback_data for button in first[-1]],
+            ["groupPage 2 мс2", "groupPage 1 мс2"],
+        )
+        last = fake_bot.edit_message_text.await_args.kwargs
+        self.assertEqual(last["text"], "Выбери группу (стр. 3 из 3)")
+        self.assertEqual(len(last["reply_markup"].keyboard), 4 + 1)
+
+
+class _FakeRuzClient:
+    instances: list["_FakeRuzClient"] = []
+
+    def __init__(self, config) -> None:
+        self.config = config
+        self.entered = 0
+        self.exited = 0
+        _FakeRuzClient.instances.append(self)
+
+    async def __aenter__(self):
+        self.entered += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.exited += 1
+        return False
+
+
+def _load_real_utils() -> ModuleType:
+    """``ruzbot.utils`` заглушен выше; настоящий модуль грузим под другим именем."""
+    client_module = ModuleType("ruzclient.client")
+    client_module.ClientConfig = lambda **kwargs: SimpleNamespace(**kwargs)
+    client_module.RuzClient = _FakeRuzClient
+    spec = importlib.util.spec_from_file_location(
+        "ruzbot_real_utils", Path(cache.__file__).with_name("utils.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"ruzclient.client": client_module}):
+        spec.loader.exec_module(module)
+    return module
+
+
+class SharedRuzClientTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        _FakeRuzClient.instances = []
+        self.utils = _load_real_utils()
+
+    async def test_handlers_borrow_one_shared_client(self) -> None:
+        shared = await self.utils.start_ruz_client()
+        for _ in range(3):
+            async with self.utils.ruz_client() as client:
+                self.assertIs(client, shared)
+
+        self.assertEqual(len(_FakeRuzClient.instances), 1)
+        self.assertEqual((shared.entered, shared.exited), (1, 0))
+        self.assertIs(await self.utils.start_ruz_client(), shared)
+
+        await self.utils.close_ruz_client()
+        self.assertEqual(shared.exited, 1)
+
+    async def test_without_shared_client_each_block_gets_its_own(self) -> None:
+        async with self.utils.ruz_client() as first:
+            pass
+        async with self.utils.ruz_client() as second:
+            pass
+
+        self.assertIsNot(first, second)
+        self.assertEqual([c.exited for c in _FakeRuzClient.instances], [1, 1])
+
+
+class CacheInspectTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    def test_keys_are_classified_by_family(self) -> None:
+        anchor = date(2026, 3, 26)
+        cases = {
+            cache.profile_key(1): "profile",
+            cache.user_index_key(1): "user_index",
+            cache.screen_key(1, "start"): "screen",
+            f"{cache.user_prefix(1)}:schedule:week:2026-03-23": "legacy_user_week",
+            f"{cache.user_prefix(1)}:schedule:day:2026-03-26": "legacy_user_day",
+            cache.group_week_key(5, anchor, 2): "group_week",
+            cache.subgroup_week_key(5, 1, anchor): "subgroup_week",
+            cache.render_key(5, 1, "day", anchor): "render",
+            cache.group_generation_key(5): "generation",
+            cache.group_meta_key(5): "group_meta",
+            cache.lecturer_key(9): "lecturer",
+            cache.directory_key("lecturers"): "directory",
+            cache.active_groups_key(): "active_groups",
+            f"{_redis_prefix()}:unknown": "other",
+        }
+        for key, family in cases.items():
+            self.assertEqual(cache_inspect.classify_key(key), family, key)
+
+    async def test_report_counts_bytes_ttls_and_largest_keys(self) -> None:
+        fake = InMemoryRedisClient()
+        for user_id in range(5):
+            await fake.set(cache.profile_key(user_id), "x" * (10 * user_id), ex=900)
+        await fake.set(cache.group_week_key(5, date(2026, 3, 26)), "y" * 500, ex=7200)
+        await fake.set(cache.group_generation_key(5), "1")
+        fake.round_trips = 0
+
+        report = await cache_inspect.inspect_keyspace(fake, count=2, pause_s=0, top=2)
+
+        self.assertEqual(report.scanned, 7)
+        profiles = report.families["profile"]
+        self.assertEqual(profiles.keys, 5)
+        self.assertEqual(profiles.ttls, {"<1h": 5})
+        self.assertEqual(profiles.estimated_bytes, 5 * 50 + 100)
+        self.assertEqual([size for size, _ in sorted(profiles.largest)], [80, 90])
+        self.assertEqual(report.families["group_week"].ttls, {"<1d": 1})
+        self.assertEqual(report.families["generation"].ttls, {cache_inspect.NO_TTL: 1})
+        # Скан порциями по 2 ключа: 4 SCAN и 4 pipeline.
+        self.assertEqual(fake.round_trips, 8)
+        self.assertIn("group_week", cache_inspect.format_report(report))
+
+    async def test_max_keys_truncates_scan(self) -> None:
+        fake = InMemoryRedisClient()
+        for user_id in range(6):
+            await fake.set(cache.profile_key(user_id), "{}", ex=60)
+
+        report = await cache_inspect.inspect_keyspace(
+            fake, count=2, pause_s=0, max_keys=3
+        )
+
+        self.assertEqual(report.scanned, 3)
+        self.assertTrue(report.truncated)
+
+
+async def _group_week_or_503(group_id: int, anchor: date):
+    if group_id == 66:
+        raise RuzHttpError(503)
+    return [{"lesson_id": 1}]
+
+
+class GroupGenerationTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_bump_makes_group_and_snapshot_keys_unreachable(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        anchor = date(2026, 3, 26)
+        loader = AsyncMock(return_value=[{"lesson_id": 1}])
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            generation = await cache.group_generation(55)
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, loader, generation=generation
+            )
+            await cache.store_screen_snapshot(
+                42,
+                "parseWeek 0",
+                text="week",
+                deps=cache.group_week_deps(
+                    55,
+                    generation,
+                    anchor,
+                    await cache._group_week_version(55, generation, anchor),
+                ),
+            )
+
+            self.assertEqual(await cache.bump_group_generation(55), 1)
+            self.assertEqual(await cache.group_generation(55), 1)
+            await cache.get_or_load_group_week_lessons(55, anchor, loader, generation=1)
+            replayed = await cache.replay_screen_snapshot(
+                fake_bot, message, 42, "parseWeek 0"
+            )
+
+        self.assertEqual(generation, 0)
+        self.assertEqual(loader.await_count, 2)
+        self.assertFalse(replayed)
+        fake_bot.edit_message_text.assert_not_awaited()
+
+    async def test_generation_is_cached_locally(self) -> None:
+        fake = InMemoryRedisClient()
+        fake.values[cache.group_generation_key(55)] = b"4"
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            self.assertEqual(await cache.group_generation(55), 4)
+            self.assertEqual(await cache.group_generation(55), 4)
+
+        self.assertEqual(fake.round_trips, 1)
+
+    async def test_purge_command_is_admin_only(self) -> None:
+        fake_bot = SimpleNamespace(reply_to=AsyncMock())
+        bump = AsyncMock(return_value=3)
+
+        with (
+            patch.object(commands.settings, "admin_ids", frozenset({1})),
+            patch.object(commands.cache, "bump_group_generation", bump),
+        ):
+            await commands.purgeGroupCommand(fake_bot, object(), "55", user_id=2)
+            bump.assert_not_awaited()
+            await commands.purgeGroupCommand(fake_bot, object(), "55", user_id=1)
+
+        bump.assert_awaited_once_with(55)
+        self.assertIn("поколение 3", fake_bot.reply_to.await_args.args[1])
+
+    async def test_purge_hook_parses_group_id(self) -> None:
+        with patch.object(
+            commands.cache, "bump_group_generation", AsyncMock(return_value=2)
+        ):
+            self.assertEqual(
+                await commands.purge_group_hook("55"), (200, "group 55 generation 2\n")
+            )
+            status, _ = await commands.purge_group_hook("abc")
+
+        self.assertEqual(status, 400)
+
+
+class SnapshotDependencyTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def _store_week_snapshot(self, anchor) -> None:
+        await cache.get_or_load_group_week_lessons(
+            55, anchor, AsyncMock(return_value=[{"lesson_id": 1}])
+        )
+        await cache.store_screen_snapshot(
+            42,
+            "parseWeek 0",
+            text="week",
+            deps=cache.group_week_deps(
+                55, 0, anchor, await cache._group_week_version(55, 0, anchor)
+            ),
+        )
+
+    async def test_snapshot_is_replayed_while_group_week_is_unchanged(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        anchor = date(2026, 3, 26)
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await self._store_week_snapshot(anchor)
+            # Обновление с теми же данными не делает экран устаревшим.
+            await cache.refresh_group_week_lessons(
+                55, anchor, AsyncMock(return_value=[{"lesson_id": 1}])
+            )
+            replayed = await cache.replay_screen_snapshot(
+                fake_bot, message, 42, "parseWeek 0"
+            )
+
+        self.assertTrue(replayed)
+        fake_bot.edit_message_text.assert_awaited_once()
+
+    async def test_snapshot_is_skipped_after_group_week_changes(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        anchor = date(2026, 3, 26)
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await self._store_week_snapshot(anchor)
+            await cache.refresh_group_week_lessons(
+                55, anchor, AsyncMock(return_value=[{"lesson_id": 2}])
+            )
+            replayed = await cache.replay_screen_snapshot(
+                fake_bot, message, 42, "parseWeek 0"
+            )
+
+        self.assertFalse(replayed)
+        fake_bot.edit_message_text.assert_not_awaited()
+
+    async def test_rendered_week_keeps_version_it_was_built_from(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        anchor = cache.week_anchor_date(datetime.today())
+        # Пары другой подгруппы: текст экрана не меняется, неделя группы — да.
+        week_v1 = [{"lesson_id": 1, "sub_group": 2, "date": anchor.isoformat()}]
+        week_v2 = [{"lesson_id": 2, "sub_group": 2, "date": anchor.isoformat()}]
+
+        async def fake_fetch_user(client, user_id):
+            return {"group_oid": 55, "subgroup": 1}
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(commands, "_fetch_user", side_effect=fake_fetch_user),
+            patch.object(commands.cache, "prefetch_group_weeks"),
+        ):
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, AsyncMock(return_value=week_v1)
+            )
+            await commands.weekCommand(fake_bot, message, "0", user_id=100)
+            await cache.refresh_group_week_lessons(
+                55, anchor, AsyncMock(return_value=week_v2)
+            )
+            # Текст берётся из рендера недели v1 — snapshot не должен выдавать
+            # его за построенный из v2.
+            await commands.weekCommand(fake_bot, message, "0", user_id=101)
+            replayed = await cache.replay_screen_snapshot(
+                fake_bot, message, 101, "parseWeek 0"
+            )
+
+        self.assertFalse(replayed)
+        self.assertEqual(fake_bot.edit_message_text.await_count, 2)
+
+    async def test_relative_day_snapshot_is_skipped_after_midnight(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+        today = date.today()
+        week = [{"lesson_id": 1, "sub_group": 2, "date": today.isoformat()}]
+
+        class _Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return today + timedelta(days=1)
+
+        async def fake_fetch_user(client, user_id):
+            return {"group_oid": 55, "subgroup": 1}
+
+        with (
+            patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)),
+            patch.object(commands, "_fetch_user", side_effect=fake_fetch_user),
+            patch.object(commands.cache, "prefetch_group_weeks"),
+        ):
+            await cache.get_or_load_group_week_lessons(
+                55, today, AsyncMock(return_value=week)
+            )
+            await commands.dateCommand(fake_bot, message, "0", user_id=100)
+            self.assertTrue(
+                await cache.replay_screen_snapshot(fake_bot, message, 100, "parseDay 0")
+            )
+            # «Сегодня» сдвинулось: тот же snapshot показал бы вчерашний день.
+            with patch.object(cache, "date", _Tomorrow):
+                replayed = await cache.replay_screen_snapshot(
+                    fake_bot, message, 100, "parseDay 0"
+                )
+
+        self.assertFalse(replayed)
+        self.assertEqual(fake_bot.edit_message_text.await_count, 2)
+
+    def test_relative_week_dep_follows_week_rollover(self) -> None:
+        sunday = date(2026, 3, 29)
+        dep = cache.relative_date_dep("week", 0, sunday)
+
+        class _Monday(date):
+            @classmethod
+            def today(cls):
+                return sunday + timedelta(days=1)
+
+        self.assertEqual(dep, ["week", 0, "2026-03-23"])
+        with patch.object(cache, "date", _Monday):
+            self.assertEqual(cache._resolve_relative_date("week", 0), date(2026, 3, 30))
+            self.assertEqual(cache._resolve_relative_date("week", -1), date(2026, 3, 23))
+
+    async def test_profile_snapshot_depends_on_profile_content(self) -> None:
+        fake = InMemoryRedisClient()
+        fake_bot = SimpleNamespace(edit_message_text=AsyncMock())
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=2)
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_profile(42, AsyncMock(return_value={"subgroup": 1}))
+            await cache.store_screen_snapshot(
+                42, "showProfile", text="profile", deps=await cache.profile_deps(42)
+            )
+            self.assertTrue(
+                await cache.replay_screen_snapshot(fake_bot, message, 42, "showProfile")
+            )
+
+            # Профиль записан заново (например, другим процессом) с новой подгруппой.
+            cache.clear_local_cache()
+            await fake.set(
+                cache.profile_key(42), cache._encode_payload({"subgroup": 2}), ex=600
+            )
+            self.assertFalse(
+                await cache.replay_screen_snapshot(fake_bot, message, 42, "showProfile")
+            )
+
+
+class StaleFallbackTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        cache.clear_local_cache()
+
+    async def test_unavailable_backend_serves_stale_copy_with_marker(self) -> None:
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 23)
+        lessons = [{"lesson_id": 1, "date": "2026-03-24"}]
+        key = cache.group_week_key(55, anchor)
+        down = AsyncMock(side_effect=resilience.BackendUnavailable("open"))
+
+        @resilience.handler_scope
+        async def handler():
+            week = await cache.get_or_load_group_week_lessons(55, anchor, down)
+            return week, resilience.served_stale()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, AsyncMock(return_value=lessons)
+            )
+            self.assertIn(cache.stale_key(key), fake.values)
+            # Свежая копия истекла, устаревшая осталась.
+            del fake.values[key]
+            cache.clear_local_cache()
+
+            week, stale = await handler()
+            self.assertFalse(resilience.served_stale())
+
+        self.assertEqual(week, lessons)
+        self.assertTrue(stale)
+        # Устаревшее значение не записано обратно как свежее.
+        self.assertNotIn(key, fake.values)
+
+    async def test_handler_joining_a_stale_load_is_marked_stale(self) -> None:
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 23)
+        lessons = [{"lesson_id": 1, "date": "2026-03-24"}]
+        release = asyncio.Event()
+        down = AsyncMock(side_effect=resilience.BackendUnavailable("open"))
+
+        async def render():
+            await release.wait()
+            week = await cache.get_or_load_group_week_lessons(55, anchor, down)
+            return str(week), cache.payload_version(week)
+
+        @resilience.handler_scope
+        async def handler():
+            rendered = await cache.get_or_render(55, 0, "week", anchor, render)
+            return rendered, resilience.served_stale()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, AsyncMock(return_value=lessons)
+            )
+            del fake.values[cache.group_week_key(55, anchor)]
+            cache.clear_local_cache()
+
+            first = asyncio.create_task(handler())
+            second = asyncio.create_task(handler())
+            await asyncio.sleep(0)
+            release.set()
+            results = await asyncio.gather(first, second)
+
+        down.assert_awaited_once()
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(all(stale for _, stale in results))
+        self.assertNotIn(cache.render_key(55, 0, "week", anchor), fake.values)
+
+    async def test_invalidate_user_drops_stale_profile_copy(self) -> None:
+        fake = InMemoryRedisClient()
+        down = AsyncMock(side_effect=resilience.BackendUnavailable("open"))
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_profile(42, AsyncMock(return_value={"id": 42}))
+            self.assertIn(cache.stale_key(cache.profile_key(42)), fake.values)
+
+            await cache.invalidate_user(42)
+            self.assertNotIn(cache.stale_key(cache.profile_key(42)), fake.values)
+            # Прежняя группа не вернётся из устаревшего слоя.
+            with self.assertRaises(resilience.BackendUnavailable):
+                await cache.get_or_load_profile(42, down)
+
+    async def test_without_stale_copy_the_error_propagates(self) -> None:
+        fake = InMemoryRedisClient()
+        down = AsyncMock(side_effect=resilience.BackendUnavailable("open"))
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            with self.assertRaises(resilience.BackendUnavailable):
+                await cache.get_or_load_lecturer(7, down)
+
+    async def test_not_found_is_not_masked_by_stale_copy(self) -> None:
+        fake = InMemoryRedisClient()
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_lecturer(7, AsyncMock(return_value={"id": 7}))
+            del fake.values[cache.lecturer_key(7)]
+            cache.clear_local_cache()
+            with self.assertRaises(RuzHttpError):
+                await cache.get_or_load_lecturer(
+                    7, AsyncMock(side_effect=RuzHttpError(400))
+                )
+
+    async def test_only_values_built_from_stale_copy_are_not_stored(self) -> None:
+        fake = InMemoryRedisClient()
+        anchor = date(2026, 3, 23)
+        lessons = [{"lesson_id": 1, "sub_group": 0, "date": "2026-03-24"}]
+        down = AsyncMock(side_effect=resilience.BackendUnavailable("open"))
+
+        async def subgroup_loader(week_anchor):
+            week = await cache.get_or_load_group_week_lessons(55, week_anchor, down)
+            return {"2026-03-24": week}, cache.payload_version(week)
+
+        @resilience.handler_scope
+        async def handler():
+            await cache.get_or_load_subgroup_week(55, 1, anchor, subgroup_loader)
+            # Профиль в том же обработчике загружен из backend — он свежий.
+            await cache.get_or_load_profile(42, AsyncMock(return_value={"id": 42}))
+            await cache.store_screen_snapshot(42, "parseWeek 0", text="week")
+
+        with patch.object(cache, "get_redis_client", AsyncMock(return_value=fake)):
+            await cache.get_or_load_group_week_lessons(
+                55, anchor, AsyncMock(return_value=lessons)
+            )
+            del fake.values[cache.group_week_key(55, anchor)]
+            cache.clear_local_cache()
+
+            await handler()
+
+        self.assertIn(cache.profile_key(42), fake.values)
+        self.assertNotIn(cache.subgroup_week_key(55, 1, anchor), fake.values)
+        self.assertNotIn(cache.screen_key(42, "parseWeek 0"), fake.values)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from ruzbot import metrics  # noqa: E402
+
+
+class MetricsRenderTests(TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def test_counters_are_rendered_with_sorted_labels(self) -> None:
+        metrics.inc(metrics.CACHE_LOOKUPS, family="profile", result="hit")
+        metrics.inc(metrics.CACHE_LOOKUPS, family="profile", result="hit")
+
+        text = metrics.render_latest()
+
+        self.assertIn(f"# TYPE {metrics.CACHE_LOOKUPS} counter", text)
+        self.assertIn(
+            f'{metrics.CACHE_LOOKUPS}{{family="profile",result="hit"}} 2', text
+        )
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        metrics.observe(metrics.REDIS_SECONDS, 0.003, op="read")
+        metrics.observe(metrics.REDIS_SECONDS, 0.2, op="read")
+
+        text = metrics.render_latest()
+
+        self.assertIn(f'{metrics.REDIS_SECONDS}_bucket{{op="read",le="0.001"}} 0', text)
+        self.assertIn(f'{metrics.REDIS_SECONDS}_bucket{{op="read",le="0.005"}} 1', text)
+        self.assertIn(f'{metrics.REDIS_SECONDS}_bucket{{op="read",le="+Inf"}} 2', text)
+        self.assertIn(f'{metrics.REDIS_SECONDS}_count{{op="read"}} 2', text)
+
+
+class MetricsHttpTests(IsolatedAsyncioTestCase):
+    async def test_metrics_endpoint_serves_text_format(self) -> None:
+        metrics.reset()
+        metrics.inc(metrics.CACHE_WRITES, family="screen")
+        server = await metrics.start_http_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = (await reader.read()).decode("utf-8")
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn(f'{metrics.CACHE_WRITES}{{family="screen"}} 1', response)
+
+    async def test_post_hook_receives_path_suffix(self) -> None:
+        calls: list[str] = []
+
+        async def hook(rest: str) -> tuple[int, str]:
+            calls.append(rest)
+            return 200, "ok\n"
+
+        metrics.add_post_hook("/purge/group/", hook)
+        server = await metrics.start_http_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /purge/group/55 HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = (await reader.read()).decode("utf-8")
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+            metrics._post_hooks.clear()
+
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertEqual(calls, ["55"])
+
+    async def test_silent_client_is_disconnected(self) -> None:
+        server = await metrics.start_http_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            with patch.object(metrics, "_REQUEST_READ_TIMEOUT_S", 0.05):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                # Ничего не отправляем: сервер сам закрывает соединение.
+                response = await asyncio.wait_for(reader.read(), 2)
+                writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertEqual(response, b"")
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from collections import deque
+from pathlib import Path
+from types import ModuleType
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+if "dotenv" not in sys.modules:
+    dotenv = ModuleType("dotenv")
+    dotenv.load_dotenv = lambda *args, **kwargs: None
+    sys.modules["dotenv"] = dotenv
+
+from ruzbot import metrics, resilience  # noqa: E402
+
+
+class HttpError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+class FlakyBackend:
+    """Отвечает по сценарию: исключение, задержка в секундах или значение."""
+
+    def __init__(self, *script) -> None:
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, BaseException):
+            raise step
+        if isinstance(step, float):
+            try:
+                await asyncio.sleep(step)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            return f"slept {step}"
+        return step
+
+
+class PolicyTests(TestCase):
+    def setUp(self) -> None:
+        resilience.reset()
+
+    def tearDown(self) -> None:
+        resilience.reset()
+
+    def test_endpoint_overrides_apply_on_top_of_defaults(self) -> None:
+        with (
+            patch.object(resilience.settings, "backend_timeout_s", 3.0),
+            patch.object(resilience.settings, "backend_retries", 2),
+            patch.object(
+                resilience.settings,
+                "backend_endpoints",
+                "group_week:timeout=5,retries=0; lecturer:hedge=0,bogus=1",
+            ),
+        ):
+            group_week = resilience.policy("group_week")
+            lecturer = resilience.policy("lecturer")
+            profile = resilience.policy("profile")
+
+        self.assertEqual((group_week.timeout_s, group_week.retries), (5.0, 0))
+        self.assertFalse(lecturer.hedge)
+        self.assertEqual(lecturer.retries, 2)
+        self.assertEqual((profile.timeout_s, profile.retries), (3.0, 2))
+
+    def test_full_lists_are_not_hedged_by_default(self) -> None:
+        with patch.object(resilience.settings, "backend_endpoints", ""):
+            self.assertFalse(resilience.policy("directory").hedge)
+
+
+class CallTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        resilience.reset()
+        metrics.reset()
+        patcher = patch.multiple(
+            resilience.settings,
+            backend_timeout_s=1.0,
+            backend_retries=2,
+            backend_backoff_s=0.0,
+            backend_backoff_max_s=0.0,
+            backend_hedge=True,
+            backend_hedge_min_s=0.01,
+            backend_endpoints="",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(resilience.reset)
+
+    async def test_transient_errors_are_retried(self) -> None:
+        backend = FlakyBackend(HttpError(503), ConnectionResetError(), "week")
+
+        result = await resilience.call("group_week", backend)
+
+        self.assertEqual(result, "week")
+        self.assertEqual(backend.calls, 3)
+        self.assertEqual(
+            metrics.counter_value(
+                metrics.BACKEND_EVENTS, endpoint="group_week", event="retry"
+            ),
+            2,
+        )
+
+    async def test_client_errors_are_not_retried(self) -> None:
+        backend = FlakyBackend(HttpError(404), "week")
+
+        with self.assertRaises(HttpError):
+            await resilience.call("group_week", backend)
+
+        self.assertEqual(backend.calls, 1)
+
+    async def test_retries_stop_after_limit(self) -> None:
+        backend = FlakyBackend(HttpError(502))
+
+        with self.assertRaises(HttpError):
+            await resilience.call("group_week", backend)
+
+        self.assertEqual(backend.calls, 3)
+
+    async def test_deadline_covers_the_whole_chain(self) -> None:
+        backend = FlakyBackend(5.0)
+
+        with resilience.deadline(0.05):
+            with self.assertRaises(asyncio.TimeoutError):
+                await resilience.call("group_week", backend)
+            # Бюджет обработчика исчерпан: следующий запрос даже не уходит.
+            with self.assertRaises(resilience.DeadlineExceeded):
+                await resilience.call("profile", backend)
+
+        self.assertEqual(backend.calls, 1)
+        self.assertIsNone(resilience.remaining())
+
+    async def test_nested_deadline_does_not_extend_outer(self) -> None:
+        with resilience.deadline(0.5):
+            with resilience.deadline(60):
+                self.assertLessEqual(resilience.remaining(), 0.5)
+            with resilience.deadline(0.1):
+                self.assertLessEqual(resilience.remaining(), 0.1)
+
+    async def test_background_task_drops_handler_deadline(self) -> None:
+        async def background():
+            resilience.detach()
+            return resilience.remaining()
+
+        with resilience.deadline(0.5):
+            self.assertIsNone(await asyncio.ensure_future(background()))
+            self.assertIsNotNone(resilience.remaining())
+
+    async def test_slow_request_is_hedged_after_p95(self) -> None:
+        resilience._latencies["lecturer"] = deque(
+            [0.01] * 30, maxlen=resilience._LATENCY_WINDOW
+        )
+        backend = FlakyBackend(5.0, "card")
+
+        result = await asyncio.wait_for(resilience.call("lecturer", backend), 1)
+
+        self.assertEqual(result, "card")
+        self.assertEqual(backend.calls, 2)
+        await asyncio.sleep(0)
+        self.assertEqual(backend.cancelled, 1)
+        self.assertEqual(
+            metrics.counter_value(
+                metrics.BACKEND_EVENTS, endpoint="lecturer", event="hedge_won"
+            ),
+            1,
+        )
+
+    async def test_no_hedge_without_enough_samples(self) -> None:
+        backend = FlakyBackend(0.05, "card")
+
+        result = await resilience.call("lecturer", backend)
+
+        self.assertEqual(result, "slept 0.05")
+        self.assertEqual(backend.calls, 1)
+
+
+class BackendBreakerTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        resilience.reset()
+        patcher = patch.multiple(
+            resilience.settings,
+            backend_retries=0,
+            backend_hedge=False,
+            backend_endpoints="",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(resilience.reset)
+        self.breaker = resilience._breaker
+        self.addCleanup(setattr, self.breaker, "failure_threshold", 5)
+        self.breaker.failure_threshold = 2
+
+    async def test_open_breaker_rejects_without_calling_backend(self) -> None:
+        backend = FlakyBackend(HttpError(503))
+        for _ in range(2):
+            with self.assertRaises(HttpError):
+                await resilience.call("group_week", backend)
+
+        with self.assertRaises(resilience.BackendUnavailable):
+            await resilience.call("profile", backend)
+
+        self.assertEqual(backend.calls, 2)
+
+    async def test_single_probe_after_cooldown_closes_breaker(self) -> None:
+        with patch.object(resilience._breaker, "cooldown_s", 0):
+            for _ in range(2):
+                with self.assertRaises(HttpError):
+                    await resilience.call("group_week", FlakyBackend(HttpError(503)))
+
+            release = asyncio.Event()
+
+            async def slow_ok():
+                await release.wait()
+                return "week"
+
+            probe = asyncio.ensure_future(resilience.call("group_week", slow_ok))
+            await asyncio.sleep(0)
+            # Пока идёт проба, остальные запросы в backend не уходят.
+            with self.assertRaises(resilience.BackendUnavailable):
+                await resilience.call("group_week", FlakyBackend("other"))
+            release.set()
+            self.assertEqual(await probe, "week")
+
+        self.assertEqual(await resilience.call("group_week", FlakyBackend("ok")), "ok")
+
+    async def test_handler_deadline_does_not_open_breaker(self) -> None:
+        self.breaker.failure_threshold = 5
+        healthy = FlakyBackend(0.2)
+
+        for _ in range(5):
+            with resilience.deadline(0.01):
+                with self.assertRaises(resilience.DeadlineExceeded):
+                    await resilience.call("group_week", healthy)
+
+        self.assertTrue(self.breaker.allows_requests())
+        self.assertEqual(self.breaker.failures, 0)
+
+    async def test_probe_cut_by_handler_deadline_is_retried_by_next_call(self) -> None:
+        with patch.object(resilience._breaker, "cooldown_s", 0):
+            for _ in range(2):
+                with self.assertRaises(HttpError):
+                    await resilience.call("group_week", FlakyBackend(HttpError(503)))
+
+            with resilience.deadline(0.01):
+                with self.assertRaises(resilience.DeadlineExceeded):
+                    await resilience.call("group_week", FlakyBackend(0.2))
+            # Проба не получила ответа: следующий вызов снова может пробовать.
+            self.assertEqual(
+                await resilience.call("group_week", FlakyBackend("ok")), "ok"
+            )
+
+        self.assertTrue(self.breaker.allows_requests())
+
+    async def test_endpoint_timeout_still_counts_as_failure(self) -> None:
+        with patch.object(resilience.settings, "backend_timeout_s", 0.01):
+            for _ in range(2):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await resilience.call("group_week", FlakyBackend(0.2))
+
+        self.assertFalse(self.breaker.allows_requests())
+
+    async def test_not_found_does_not_count_as_failure(self) -> None:
+        for _ in range(3):
+            with self.assertRaises(HttpError):
+                await resilience.call("lecturer", FlakyBackend(HttpError(404)))
+
+        self.assertEqual(await resilience.call("lecturer", FlakyBackend("ok")), "ok")
+
+    async def test_stale_marks_are_shared_by_handler_tasks_only(self) -> None:
+        @resilience.handler_scope
+        async def handler():
+            async def child():
+                resilience.note_stale("key")
+
+            async def background():
+                resilience.detach()
+                return resilience.served_stale()
+
+            await asyncio.gather(child())
+            return resilience.served_stale(), await asyncio.ensure_future(
+                background()
+            )
+
+        self.assertEqual(await handler(), (True, False))
+        self.assertFalse(resilience.served_stale())
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+if "dotenv" not in sys.modules:
+    dotenv = ModuleType("dotenv")
+    dotenv.load_dotenv = lambda *args, **kwargs: None
+    sys.modules["dotenv"] = dotenv
+
+from ruzbot import resilience, week_batcher  # noqa: E402
+
+ANCHOR = date(2026, 3, 23)
+
+
+class HttpError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+class StubSchedule:
+    """Backend недель групп в памяти: считает запросы и одновременность."""
+
+    def __init__(self, *, multi: bool, failing: frozenset[int] = frozenset()) -> None:
+        self.failing = failing
+        self.single_calls: list[int] = []
+        self.multi_calls: list[list[int]] = []
+        self.active = 0
+        self.max_active = 0
+        if multi:
+            self.get_groups_week = self._get_groups_week
+
+    def _week(self, group_oid: int, anchor: date) -> list[dict]:
+        return [{"lesson_id": group_oid, "date": anchor.isoformat()}]
+
+    async def get_group_week(self, group_oid: int, anchor: date) -> list[dict]:
+        self.single_calls.append(group_oid)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.active -= 1
+        if group_oid in self.failing:
+            raise HttpError(503)
+        return self._week(group_oid, anchor)
+
+    async def _get_groups_week(self, group_oids: list[int], anchor: date) -> dict:
+        self.multi_calls.append(sorted(group_oids))
+        # Как в JSON-ответе: ключи строками; «пропавшие» группы не возвращаются.
+        return {
+            str(oid): self._week(oid, anchor)
+            for oid in group_oids
+            if oid not in self.failing
+        }
+
+
+class GroupWeekBatcherTests(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        resilience.reset()
+        patcher = patch.multiple(
+            resilience.settings, backend_retries=0, backend_hedge=False
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(resilience.reset)
+
+    def _batcher(self, **kwargs) -> week_batcher.GroupWeekBatcher:
+        options = {"window_s": 0.01, "max_batch": 32, "fanout": 2}
+        options.update(kwargs)
+        return week_batcher.GroupWeekBatcher(
+            week_batcher._fetch_group_week, week_batcher._fetch_group_weeks, **options
+        )
+
+    async def test_concurrent_misses_go_out_as_one_multi_group_request(self) -> None:
+        schedule = StubSchedule(multi=True)
+        client = SimpleNamespace(schedule=schedule)
+        batcher = self._batcher()
+
+        weeks = await asyncio.gather(
+            *(batcher.get(client, oid, ANCHOR) for oid in (1, 2, 3, 2))
+        )
+
+        self.assertEqual(schedule.multi_calls, [[1, 2, 3]])
+        self.assertEqual(schedule.single_calls, [])
+        self.assertEqual([week[0]["lesson_id"] for week in weeks], [1, 2, 3, 2])
+
+    async def test_groups_missing_from_multi_response_are_fetched_singly(self) -> None:
+        schedule = StubSchedule(multi=True, failing=frozenset({2}))
+        client = SimpleNamespace(schedule=schedule)
+        batcher = self._batcher()
+
+        results = await asyncio.gather(
+            *(batcher.get(client, oid, ANCHOR) for oid in (1, 2)),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(results[0][0]["lesson_id"], 1)
+        self.assertIsInstance(results[1], HttpError)
+        self.assertEqual(schedule.single_calls, [2])
+
+    async def test_without_multi_support_fan_out_is_bounded(self) -> None:
+        schedule = StubSchedule(multi=False, failing=frozenset({4}))
+        client = SimpleNamespace(schedule=schedule)
+        batcher = self._batcher(fanout=2)
+
+        results = await asyncio.gather(
+            *(batcher.get(client, oid, ANCHOR) for oid in range(1, 7)),
+            return_exceptions=True,
+        )
+
+        self.assertEqual(sorted(schedule.single_calls), [1, 2, 3, 4, 5, 6])
+        self.assertLessEqual(schedule.max_active, 2)
+        self.assertIsInstance(results[3], HttpError)
+        self.assertEqual(
+            [week[0]["lesson_id"] for i, week in enumerate(results) if i != 3],
+            [1, 2, 3, 5, 6],
+        )
+
+    async def test_full_batch_is_sent_before_the_window_ends(self) -> None:
+        schedule = StubSchedule(multi=True)
+        client = SimpleNamespace(schedule=schedule)
+        batcher = self._batcher(window_s=60, max_batch=2)
+
+        weeks = await asyncio.wait_for(
+            asyncio.gather(*(batcher.get(client, oid, ANCHOR) for oid in (1, 2))), 1
+        )
+
+        self.assertEqual(len(weeks), 2)
+        self.assertEqual(schedule.multi_calls, [[1, 2]])
+
+    async def test_different_weeks_are_separate_requests(self) -> None:
+        schedule = StubSchedule(multi=True)
+        client = SimpleNamespace(schedule=schedule)
+        batcher = self._batcher()
+        next_week = date(2026, 3, 30)
+
+        await asyncio.gather(
+            batcher.get(client, 1, ANCHOR),
+            batcher.get(client, 2, ANCHOR),
+            batcher.get(client, 1, next_week),
+        )
+
+        self.assertEqual(schedule.multi_calls, [[1, 2]])
+        self.assertEqual(schedule.single_calls, [1])